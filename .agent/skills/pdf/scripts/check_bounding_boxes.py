@@ -1,3 +1,4 @@
+from collections import defaultdict
 from dataclasses import dataclass
 import json
 import sys
@@ -14,57 +15,116 @@ class RectAndField:
     field: dict
 
 
-# Returns a list of messages that are printed to stdout for Claude to read.
-def get_bounding_box_messages(fields_json_stream) -> list[str]:
-    messages = []
-    fields = json.load(fields_json_stream)
-    messages.append(f"Read {len(fields['form_fields'])} fields")
+MAX_MESSAGES = 20
+
 
-    def rects_intersect(r1, r2):
-        disjoint_horizontal = r1[0] >= r2[2] or r1[2] <= r2[0]
-        disjoint_vertical = r1[1] >= r2[3] or r1[3] <= r2[1]
-        return not (disjoint_horizontal or disjoint_vertical)
+def rects_intersect(r1, r2):
+    disjoint_horizontal = r1[0] >= r2[2] or r1[2] <= r2[0]
+    disjoint_vertical = r1[1] >= r2[3] or r1[3] <= r2[1]
+    return not (disjoint_horizontal or disjoint_vertical)
 
+
+# Returns (i, j) index pairs, i < j, of intersecting rectangles on the same page.
+# Rectangles are bucketed by page, then swept left to right: each one is only
+# compared with the rectangles whose horizontal extent it can still overlap.
+def find_intersections(rects_and_fields: list[RectAndField]) -> list[tuple[int, int]]:
+    by_page = defaultdict(list)
+    for i, rf in enumerate(rects_and_fields):
+        by_page[rf.field["page_number"]].append(i)
+
+    pairs = []
+    for indices in by_page.values():
+        indices.sort(key=lambda i: rects_and_fields[i].rect[0])
+        active = []
+        for i in indices:
+            rect = rects_and_fields[i].rect
+            active = [j for j in active if rects_and_fields[j].rect[2] > rect[0]]
+            for j in active:
+                if rects_intersect(rects_and_fields[j].rect, rect):
+                    pairs.append((min(i, j), max(i, j)))
+            active.append(i)
+    return sorted(pairs)
+
+
+# Returns every problem found in the fields as a machine-readable dict, in the
+# order the fields and their rectangles appear in the file.
+def find_bounding_box_problems(fields: dict) -> list[dict]:
     rects_and_fields = []
     for f in fields["form_fields"]:
         rects_and_fields.append(RectAndField(f["label_bounding_box"], "label", f))
         rects_and_fields.append(RectAndField(f["entry_bounding_box"], "entry", f))
 
-    has_error = False
-    for i, ri in enumerate(rects_and_fields):
-        # This is O(N^2); we can optimize if it becomes a problem.
-        for j in range(i + 1, len(rects_and_fields)):
-            rj = rects_and_fields[j]
-            if ri.field["page_number"] == rj.field["page_number"] and rects_intersect(ri.rect, rj.rect):
-                has_error = True
-                if ri.field is rj.field:
-                    messages.append(f"FAILURE: intersection between label and entry bounding boxes for `{ri.field['description']}` ({ri.rect}, {rj.rect})")
-                else:
-                    messages.append(f"FAILURE: intersection between {ri.rect_type} bounding box for `{ri.field['description']}` ({ri.rect}) and {rj.rect_type} bounding box for `{rj.field['description']}` ({rj.rect})")
-                if len(messages) >= 20:
-                    messages.append("Aborting further checks; fix bounding boxes and try again")
-                    return messages
-        if ri.rect_type == "entry":
-            if "entry_text" in ri.field:
-                font_size = ri.field["entry_text"].get("font_size", 14)
-                entry_height = ri.rect[3] - ri.rect[1]
-                if entry_height < font_size:
-                    has_error = True
-                    messages.append(f"FAILURE: entry bounding box height ({entry_height}) for `{ri.field['description']}` is too short for the text content (font size: {font_size}). Increase the box height or decrease the font size.")
-                    if len(messages) >= 20:
-                        messages.append("Aborting further checks; fix bounding boxes and try again")
-                        return messages
-
-    if not has_error:
+    def describe(rf):
+        return {"description": rf.field["description"], "rect_type": rf.rect_type, "rect": rf.rect}
+
+    keyed_problems = []
+    for i, j in find_intersections(rects_and_fields):
+        ri, rj = rects_and_fields[i], rects_and_fields[j]
+        keyed_problems.append(((i, j), {
+            "type": "intersection",
+            "page_number": ri.field["page_number"],
+            "same_field": ri.field is rj.field,
+            "boxes": [describe(ri), describe(rj)],
+        }))
+
+    for i, rf in enumerate(rects_and_fields):
+        if rf.rect_type == "entry" and "entry_text" in rf.field:
+            font_size = rf.field["entry_text"].get("font_size", 14)
+            entry_height = rf.rect[3] - rf.rect[1]
+            if entry_height < font_size:
+                keyed_problems.append(((i, len(rects_and_fields)), {
+                    "type": "entry_too_short",
+                    "page_number": rf.field["page_number"],
+                    "description": rf.field["description"],
+                    "rect": rf.rect,
+                    "height": entry_height,
+                    "font_size": font_size,
+                }))
+
+    keyed_problems.sort(key=lambda kp: kp[0])
+    return [problem for _, problem in keyed_problems]
+
+
+def format_problem(problem: dict) -> str:
+    if problem["type"] == "entry_too_short":
+        return f"FAILURE: entry bounding box height ({problem['height']}) for `{problem['description']}` is too short for the text content (font size: {problem['font_size']}). Increase the box height or decrease the font size."
+    first, second = problem["boxes"]
+    if problem["same_field"]:
+        return f"FAILURE: intersection between label and entry bounding boxes for `{first['description']}` ({first['rect']}, {second['rect']})"
+    return f"FAILURE: intersection between {first['rect_type']} bounding box for `{first['description']}` ({first['rect']}) and {second['rect_type']} bounding box for `{second['description']}` ({second['rect']})"
+
+
+# Returns a list of messages that are printed to stdout for Claude to read.
+# Output stops after MAX_MESSAGES messages; use find_bounding_box_problems
+# (or --json) to get all of them.
+def get_bounding_box_messages(fields_json_stream) -> list[str]:
+    messages = []
+    fields = json.load(fields_json_stream)
+    messages.append(f"Read {len(fields['form_fields'])} fields")
+
+    problems = find_bounding_box_problems(fields)
+    for problem in problems:
+        messages.append(format_problem(problem))
+        if len(messages) >= MAX_MESSAGES:
+            messages.append(f"Aborting further output ({len(problems)} problems found in total); fix bounding boxes and try again")
+            return messages
+
+    if not problems:
         messages.append("SUCCESS: All bounding boxes are valid")
     return messages
 
 if __name__ == "__main__":
-    if len(sys.argv) != 2:
-        print("Usage: check_bounding_boxes.py [fields.json]")
+    args = [arg for arg in sys.argv[1:] if arg != "--json"]
+    if len(args) != 1:
+        print("Usage: check_bounding_boxes.py [fields.json] [--json]")
         sys.exit(1)
     # Input file should be in the `fields.json` format described in forms.md.
-    with open(sys.argv[1]) as f:
-        messages = get_bounding_box_messages(f)
-    for msg in messages:
-        print(msg)
+    with open(args[0]) as f:
+        if "--json" in sys.argv:
+            # Every problem, uncapped, for tools rather than for reading
+            fields = json.load(f)
+            problems = find_bounding_box_problems(fields)
+            print(json.dumps({"field_count": len(fields["form_fields"]), "problems": problems}, indent=2))
+        else:
+            for msg in get_bounding_box_messages(f):
+                print(msg)
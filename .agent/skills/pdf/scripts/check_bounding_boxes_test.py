@@ -1,7 +1,14 @@
 import unittest
 import json
 import io
-from check_bounding_boxes import get_bounding_box_messages
+import random
+from check_bounding_boxes import (
+    RectAndField,
+    find_bounding_box_problems,
+    find_intersections,
+    get_bounding_box_messages,
+    rects_intersect,
+)
 
 
 # Currently this is not run automatically in CI; it's just for documentation and manual checking.
@@ -221,6 +228,68 @@ class TestGetBoundingBoxMessages(unittest.TestCase):
         self.assertTrue(any("SUCCESS" in msg for msg in messages))
         self.assertFalse(any("FAILURE" in msg for msg in messages))
     
+    def test_all_problems_reported_beyond_message_limit(self):
+        """Test that the machine-readable report is not capped like the messages"""
+        fields = []
+        for i in range(25):
+            fields.append({
+                "description": f"Field{i}",
+                "page_number": 1,
+                "label_bounding_box": [10, 10, 50, 30],  # All overlap
+                "entry_bounding_box": [20, 15, 60, 35]   # All overlap
+            })
+        
+        problems = find_bounding_box_problems({"form_fields": fields})
+        # 50 mutually overlapping boxes
+        self.assertEqual(len(problems), 50 * 49 // 2)
+        self.assertTrue(all(p["type"] == "intersection" for p in problems))
+        
+        messages = get_bounding_box_messages(self.create_json_stream({"form_fields": fields}))
+        self.assertTrue(any(f"{len(problems)} problems" in msg for msg in messages))
+    
+    def test_problem_structure(self):
+        """Test the machine-readable description of each kind of problem"""
+        data = {
+            "form_fields": [
+                {
+                    "description": "Name",
+                    "page_number": 2,
+                    "label_bounding_box": [10, 10, 60, 30],
+                    "entry_bounding_box": [50, 10, 150, 20],  # Overlaps label, too short
+                    "entry_text": {"font_size": 14}
+                }
+            ]
+        }
+        
+        intersection, too_short = find_bounding_box_problems(data)
+        self.assertEqual(intersection["type"], "intersection")
+        self.assertEqual(intersection["page_number"], 2)
+        self.assertTrue(intersection["same_field"])
+        self.assertEqual([b["rect_type"] for b in intersection["boxes"]], ["label", "entry"])
+        self.assertEqual(too_short["type"], "entry_too_short")
+        self.assertEqual(too_short["height"], 10)
+        self.assertEqual(too_short["font_size"], 14)
+    
+    def test_sweep_matches_pairwise_check(self):
+        """Test that the sweep finds exactly the pairs a pairwise comparison finds"""
+        rng = random.Random(0)
+        rects_and_fields = []
+        for i in range(300):
+            x, y = rng.randint(0, 500), rng.randint(0, 700)
+            rect = [x, y, x + rng.randint(0, 60), y + rng.randint(0, 30)]
+            field = {"description": f"Field{i}", "page_number": rng.randint(1, 3)}
+            rects_and_fields.append(RectAndField(rect, "entry", field))
+        
+        expected = [
+            (i, j)
+            for i in range(len(rects_and_fields))
+            for j in range(i + 1, len(rects_and_fields))
+            if rects_and_fields[i].field["page_number"] == rects_and_fields[j].field["page_number"]
+            and rects_intersect(rects_and_fields[i].rect, rects_and_fields[j].rect)
+        ]
+        self.assertGreater(len(expected), 0)
+        self.assertEqual(find_intersections(rects_and_fields), expected)
+    
 
 if __name__ == '__main__':
     unittest.main()
@@ -1,29 +1,89 @@
 import os
 import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 
 from pdf2image import convert_from_path
+from PIL import Image
+from pypdf import PdfReader
 
 
 # Converts each page of a PDF to a PNG image.
+#
+# Pages are rendered in batches of consecutive pages by parallel pdftoppm
+# processes, directly at the final size, and written straight to disk, so memory
+# use stays flat even for very long scanned PDFs.
 
 
-def convert(pdf_path, output_dir, max_dim=1000):
-    images = convert_from_path(pdf_path, dpi=200)
+DPI = 200
+PAGES_PER_BATCH = 10
+RENDER_WORKERS = min(4, os.cpu_count() or 1)
 
-    for i, image in enumerate(images):
-        # Scale image if needed to keep width/height under `max_dim`
-        width, height = image.size
-        if width > max_dim or height > max_dim:
-            scale_factor = min(max_dim / width, max_dim / height)
-            new_width = int(width * scale_factor)
-            new_height = int(height * scale_factor)
-            image = image.resize((new_width, new_height))
-        
-        image_path = os.path.join(output_dir, f"page_{i+1}.png")
-        image.save(image_path)
-        print(f"Saved page {i+1} as {image_path} (size: {image.size})")
 
-    print(f"Converted {len(images)} pages to PNG images")
+def page_render_sizes(pdf_path, max_dim):
+    # For each page, the `size` to pass to pdf2image: `max_dim` if the page would
+    # be larger than `max_dim` at DPI (pdftoppm then scales it to fit a
+    # max_dim x max_dim box), or None to render at DPI unscaled.
+    sizes = []
+    for page in PdfReader(pdf_path).pages:
+        box = page.mediabox  # pdftoppm renders the media box unless use_cropbox is set
+        longest = max(float(box.width), float(box.height)) * DPI / 72
+        sizes.append(max_dim if longest > max_dim else None)
+    return sizes
+
+
+def page_batches(sizes, pages_per_batch=PAGES_PER_BATCH):
+    # Groups consecutive pages rendered with the same size into
+    # (first_page, last_page, size) batches, 1-based and inclusive.
+    batches = []
+    for page_number, size in enumerate(sizes, start=1):
+        if batches and batches[-1][2] == size and batches[-1][1] - batches[-1][0] + 1 < pages_per_batch:
+            first, _, _ = batches[-1]
+            batches[-1] = (first, page_number, size)
+        else:
+            batches.append((page_number, page_number, size))
+    return batches
+
+
+def render_batch(pdf_path, output_dir, first_page, last_page, size):
+    # Has pdftoppm write the batch's pages as PNGs, then gives them their final
+    # page_N.png names. Returns the output paths in page order.
+    with tempfile.TemporaryDirectory(dir=output_dir) as batch_dir:
+        paths = convert_from_path(
+            pdf_path,
+            dpi=DPI,
+            size=size,
+            first_page=first_page,
+            last_page=last_page,
+            fmt="png",
+            output_folder=batch_dir,
+            paths_only=True,
+        )
+        output_paths = []
+        for page_number, path in enumerate(sorted(paths), start=first_page):
+            image_path = os.path.join(output_dir, f"page_{page_number}.png")
+            os.replace(path, image_path)
+            output_paths.append(image_path)
+    return output_paths
+
+
+def convert(pdf_path, output_dir, max_dim=1000, workers=RENDER_WORKERS):
+    batches = page_batches(page_render_sizes(pdf_path, max_dim))
+
+    page_count = 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(render_batch, pdf_path, output_dir, first, last, size)
+            for first, last, size in batches
+        ]
+        # Report in page order; later batches keep rendering meanwhile
+        for (first, _, _), future in zip(batches, futures):
+            for page_number, image_path in enumerate(future.result(), start=first):
+                with Image.open(image_path) as image:
+                    print(f"Saved page {page_number} as {image_path} (size: {image.size})")
+                page_count += 1
+
+    print(f"Converted {page_count} pages to PNG images")
 
 
 if __name__ == "__main__":
@@ -1,11 +1,49 @@
 import json
+import math
+import os
+import re
 import sys
+from concurrent.futures import ThreadPoolExecutor
 
-from PIL import Image, ImageDraw
+from PIL import Image, ImageDraw, ImageFont
 
 
 # Creates "validation" images with rectangles for the bounding box information that
 # Claude creates when determining where to add text annotations in PDFs. See forms.md.
+#
+# In batch mode fields.json is read once, fields are grouped by page, and every
+# page image (the page_N.png files written by convert_pdf_to_images.py) is drawn
+# in parallel. Each page is opened only by the worker drawing it, and only a
+# small thumbnail of it is kept for the optional contact sheet, which shows all
+# pages in one grid image.
+
+
+DRAW_WORKERS = min(4, os.cpu_count() or 1)
+THUMBNAIL_WIDTH = 300  # Width of each page in the contact sheet
+GRID_PADDING = 20  # Padding between contact sheet pages
+LABEL_FONT_SIZE = 24
+
+
+def fields_by_page(data):
+    # Groups the `form_fields` of a fields.json payload by page number
+    pages = {}
+    for field in data["form_fields"]:
+        pages.setdefault(field["page_number"], []).append(field)
+    return pages
+
+
+def draw_field_boxes(img, fields, scale=1.0):
+    # Draw red rectangle over entry bounding box and blue rectangle over the label.
+    # Returns the number of rectangles drawn.
+    draw = ImageDraw.Draw(img)
+    num_boxes = 0
+    for field in fields:
+        entry_box = [v * scale for v in field['entry_bounding_box']]
+        label_box = [v * scale for v in field['label_bounding_box']]
+        draw.rectangle(entry_box, outline='red', width=2)
+        draw.rectangle(label_box, outline='blue', width=2)
+        num_boxes += 2
+    return num_boxes
 
 
 def create_validation_image(page_number, fields_json_path, input_path, output_path):
@@ -13,26 +51,125 @@ def create_validation_image(page_number, fields_json_path, input_path, output_pa
     with open(fields_json_path, 'r') as f:
         data = json.load(f)
 
-        img = Image.open(input_path)
-        draw = ImageDraw.Draw(img)
-        num_boxes = 0
-        
-        for field in data["form_fields"]:
-            if field["page_number"] == page_number:
-                entry_box = field['entry_bounding_box']
-                label_box = field['label_bounding_box']
-                # Draw red rectangle over entry bounding box and blue rectangle over the label.
-                draw.rectangle(entry_box, outline='red', width=2)
-                draw.rectangle(label_box, outline='blue', width=2)
-                num_boxes += 2
-        
+    with Image.open(input_path) as img:
+        num_boxes = draw_field_boxes(img, fields_by_page(data).get(page_number, []))
         img.save(output_path)
-        print(f"Created validation image at {output_path} with {num_boxes} bounding boxes")
+    print(f"Created validation image at {output_path} with {num_boxes} bounding boxes")
+
+
+def page_images(images_dir):
+    # Maps page number -> path for the page_N.png files in `images_dir`
+    pages = {}
+    for name in os.listdir(images_dir):
+        match = re.fullmatch(r"page_(\d+)\.png", name)
+        if match:
+            pages[int(match.group(1))] = os.path.join(images_dir, name)
+    return pages
+
+
+def _draw_page(fields, input_path, output_path, thumbnail_width):
+    # Draws one page's validation image. Returns (number of boxes, thumbnail or
+    # None); the thumbnail gets its own boxes so they stay visible when scaled.
+    with Image.open(input_path) as page:
+        img = page.convert("RGB")
+    thumbnail = None
+    if thumbnail_width:
+        scale = min(1.0, thumbnail_width / img.width)
+        thumbnail = img.resize(
+            (max(1, round(img.width * scale)), max(1, round(img.height * scale))),
+            Image.Resampling.LANCZOS,
+        )
+        draw_field_boxes(thumbnail, fields, scale)
+    num_boxes = draw_field_boxes(img, fields)
+    img.save(output_path)
+    return num_boxes, thumbnail
+
+
+def create_validation_images(fields_json_path, images_dir, output_dir, contact_sheet_path=None, workers=DRAW_WORKERS):
+    # Writes validation_page_N.png in `output_dir` for every page_N.png in
+    # `images_dir`, and optionally a contact sheet of all pages. Returns the
+    # number of pages drawn.
+    with open(fields_json_path, 'r') as f:
+        fields = fields_by_page(json.load(f))
+    images = page_images(images_dir)
+    for page_number in sorted(set(fields) - set(images)):
+        print(f"Warning: no image page_{page_number}.png in {images_dir} for fields on page {page_number}")
+
+    os.makedirs(output_dir, exist_ok=True)
+    page_numbers = sorted(images)
+    thumbnail_width = THUMBNAIL_WIDTH if contact_sheet_path else None
+    thumbnails = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(
+                _draw_page,
+                fields.get(page_number, []),
+                images[page_number],
+                os.path.join(output_dir, f"validation_page_{page_number}.png"),
+                thumbnail_width,
+            )
+            for page_number in page_numbers
+        ]
+        # Report in page order; later pages keep drawing meanwhile
+        for page_number, future in zip(page_numbers, futures):
+            num_boxes, thumbnail = future.result()
+            output_path = os.path.join(output_dir, f"validation_page_{page_number}.png")
+            print(f"Created validation image at {output_path} with {num_boxes} bounding boxes")
+            if thumbnail is not None:
+                thumbnails.append((page_number, thumbnail))
+
+    if contact_sheet_path and thumbnails:
+        create_contact_sheet(thumbnails, contact_sheet_path)
+        print(f"Created contact sheet of {len(thumbnails)} pages at {contact_sheet_path}")
+    return len(page_numbers)
+
+
+def create_contact_sheet(thumbnails, output_path, cols=None):
+    # Lays out (page number, image) pairs in a labeled grid, like the pptx
+    # thumbnail grids. Defaults to a roughly square grid.
+    cols = cols or math.ceil(math.sqrt(len(thumbnails)))
+    rows = math.ceil(len(thumbnails) / cols)
+    cell_w = max(img.width for _, img in thumbnails)
+    cell_h = max(img.height for _, img in thumbnails)
+    label_h = LABEL_FONT_SIZE + GRID_PADDING // 2
+
+    try:
+        font = ImageFont.load_default(size=LABEL_FONT_SIZE)
+    except Exception:
+        # Fall back to basic default font if size parameter not supported
+        font = ImageFont.load_default()
+
+    sheet = Image.new(
+        "RGB",
+        (cols * cell_w + (cols + 1) * GRID_PADDING, rows * (cell_h + label_h) + (rows + 1) * GRID_PADDING),
+        "white",
+    )
+    draw = ImageDraw.Draw(sheet)
+    for i, (page_number, img) in enumerate(thumbnails):
+        row, col = i // cols, i % cols
+        x = col * cell_w + (col + 1) * GRID_PADDING
+        y = row * (cell_h + label_h) + (row + 1) * GRID_PADDING
+        label = f"{page_number}"
+        bbox = draw.textbbox((0, 0), label, font=font)
+        draw.text((x + (cell_w - (bbox[2] - bbox[0])) // 2, y), label, fill="black", font=font)
+        sheet.paste(img, (x, y + label_h))
+        draw.rectangle([x - 1, y + label_h - 1, x + img.width, y + label_h + img.height], outline="gray", width=1)
+    sheet.save(output_path)
 
 
 if __name__ == "__main__":
+    if len(sys.argv) in (5, 7) and sys.argv[1] == "--batch":
+        contact_sheet = None
+        if len(sys.argv) == 7:
+            if sys.argv[5] != "--contact-sheet":
+                print("Usage: create_validation_image.py --batch [fields.json file] [page images directory] [output directory] [--contact-sheet image path]")
+                sys.exit(1)
+            contact_sheet = sys.argv[6]
+        create_validation_images(sys.argv[2], sys.argv[3], sys.argv[4], contact_sheet)
+        sys.exit(0)
     if len(sys.argv) != 5:
         print("Usage: create_validation_image.py [page number] [fields.json file] [input image path] [output image path]")
+        print("       create_validation_image.py --batch [fields.json file] [page images directory] [output directory] [--contact-sheet image path]")
         sys.exit(1)
     page_number = int(sys.argv[1])
     fields_json_path = sys.argv[2]
@@ -1,5 +1,10 @@
+import hashlib
 import json
+import os
 import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
 
 from pypdf import PdfReader
 
@@ -8,25 +13,81 @@ from pypdf import PdfReader
 # Claude uses to fill the fields. See forms.md.
 
 
-# This matches the format used by PdfReader `get_fields` and `update_page_form_field_values` methods.
-def get_full_annotation_field_id(annotation):
-    components = []
-    while annotation:
-        field_name = annotation.get('/T')
-        if field_name:
-            components.append(field_name)
-        annotation = annotation.get('/Parent')
-    return ".".join(reversed(components)) if components else None
+# Field catalogs (get_field_info results) are cached here, keyed by a hash of
+# the PDF's contents, so filling the same blank form repeatedly skips extraction.
+FIELD_CATALOG_DIR = Path(
+    os.environ.get("PDF_FIELD_CATALOG_DIR", "~/.cache/pdf-field-catalog")
+).expanduser()
+# Bump when get_field_info output changes, to invalidate existing catalogs.
+FIELD_CATALOG_VERSION = 1
 
+PAGE_WORKERS = min(4, os.cpu_count() or 1)
+# Below this many pages, starting worker processes costs more than it saves.
+PARALLEL_PAGE_THRESHOLD = 200
 
-def make_field_dict(field, field_id):
+
+def _object_key(obj):
+    ref = getattr(obj, "indirect_reference", None)
+    return (ref.idnum, ref.generation) if ref is not None else id(obj)
+
+
+def _resolve(obj):
+    return obj.get_object() if obj is not None else None
+
+
+class FieldTree:
+    """Full names and inherited /FT of field dictionaries, memoized per object.
+
+    Widgets of the same form share most of their /Parent chain, so each parent
+    is only visited once however many widgets hang off it.
+    """
+
+    def __init__(self):
+        self._info = {}
+
+    # Returns (full_name, field_type) for a field or widget dictionary. The name
+    # matches the format used by PdfReader `get_fields` and
+    # `update_page_form_field_values` methods.
+    def info(self, node):
+        key = _object_key(node)
+        if key in self._info:
+            return self._info[key]
+        self._info[key] = (None, None)  # Guards against /Parent cycles
+
+        parent = _resolve(node.get("/Parent"))
+        parent_name, parent_type = self.info(parent) if parent is not None else (None, None)
+        name = node.get("/T")
+        if name and parent_name:
+            name = f"{parent_name}.{name}"
+        result = (name or parent_name, node.get("/FT", parent_type))
+        self._info[key] = result
+        return result
+
+
+def get_full_annotation_field_id(annotation, field_tree=None):
+    return (field_tree or FieldTree()).info(annotation)[0]
+
+
+def _field_states(field, field_type):
+    # Equivalent of the "/_States_" entry PdfReader `get_fields` adds.
+    if field_type == "/Ch":
+        return list(field.get("/Opt") or [])
+    if field_type == "/Btn" and "/AP" in field:
+        normal = _resolve(_resolve(field["/AP"]).get("/N"))
+        states = list(normal.keys()) if isinstance(normal, dict) else []
+        if "/Off" not in states:
+            states.append("/Off")
+        return states
+    return []
+
+
+def make_field_dict(field_id, field_type, states):
     field_dict = {"field_id": field_id}
-    ft = field.get('/FT')
+    ft = field_type
     if ft == "/Tx":
         field_dict["type"] = "text"
     elif ft == "/Btn":
         field_dict["type"] = "checkbox"  # radio groups handled separately
-        states = field.get("/_States_", [])
         if len(states) == 2:
             # "/Off" seems to always be the unchecked value, as suggested by
             # https://opensource.adobe.com/dc-acrobat-sdk-docs/standards/pdfstandards/pdf/PDF32000_2008.pdf#page=448
@@ -40,7 +101,6 @@ def make_field_dict(field, field_id):
                 field_dict["unchecked_value"] = states[1]
     elif ft == "/Ch":
         field_dict["type"] = "choice"
-        states = field.get("/_States_", [])
         field_dict["choice_options"] = [{
             "value": state[0],
             "text": state[1],
@@ -50,45 +110,36 @@ def make_field_dict(field, field_id):
     return field_dict
 
 
-# Returns a list of fillable PDF fields:
-# [
-#   {
-#     "field_id": "name",
-#     "page": 1,
-#     "type": ("text", "checkbox", "radio_group", or "choice")
-#     // Per-type additional fields described in forms.md
-#   },
-# ]
-def get_field_info(reader: PdfReader):
-    fields = reader.get_fields()
-
-    field_info_by_id = {}
-    possible_radio_names = set()
-
-    for field_id, field in fields.items():
-        # Skip if this is a container field with children, except that it might be
-        # a parent group for radio button options.
-        if field.get("/Kids"):
-            if field.get("/FT") == "/Btn":
-                possible_radio_names.add(field_id)
-            continue
-        field_info_by_id[field_id] = make_field_dict(field, field_id)
-
-    # Bounding rects are stored in annotations in page objects.
-
-    # Radio button options have a separate annotation for each choice;
-    # all choices have the same field name.
-    # See https://westhealth.github.io/exploring-fillable-forms-with-pdfrw.html
-    radio_fields_by_id = {}
-
-    for page_index, page in enumerate(reader.pages):
-        annotations = page.get('/Annots', [])
+# Reads the widget annotations of pages [first, last) in a single pass.
+# Returns records in page order:
+#   ("field", field_dict)  for a widget of a terminal field, with "page" and "rect"
+#   ("radio", field_id, page, {"value": ..., "rect": ...})  for a radio button option
+def scan_pages(reader: PdfReader, first: int, last: int, field_tree=None):
+    field_tree = field_tree or FieldTree()
+    records = []
+    for page_index in range(first, last):
+        annotations = _resolve(reader.pages[page_index].get('/Annots')) or []
         for ann in annotations:
-            field_id = get_full_annotation_field_id(ann)
-            if field_id in field_info_by_id:
-                field_info_by_id[field_id]["page"] = page_index + 1
-                field_info_by_id[field_id]["rect"] = ann.get('/Rect')
-            elif field_id in possible_radio_names:
+            ann = _resolve(ann)
+            if ann.get("/Subtype") != "/Widget":
+                continue
+            field_id, field_type = field_tree.info(ann)
+            if not field_id:
+                continue
+            # The widget is its own field unless it is one of several kids of a field.
+            field = ann if "/T" in ann else _resolve(ann.get("/Parent"))
+            if field is None:
+                continue
+
+            if not field.get("/Kids"):
+                field_dict = make_field_dict(field_id, field_type, _field_states(field, field_type))
+                field_dict["page"] = page_index + 1
+                field_dict["rect"] = ann.get('/Rect')
+                records.append(("field", field_dict))
+            elif field_type == "/Btn":
+                # Radio button options have a separate annotation for each choice;
+                # all choices have the same field name.
+                # See https://westhealth.github.io/exploring-fillable-forms-with-pdfrw.html
                 try:
                     # ann['/AP']['/N'] should have two items. One of them is '/Off',
                     # the other is the active value.
@@ -96,31 +147,70 @@ def get_field_info(reader: PdfReader):
                 except KeyError:
                     continue
                 if len(on_values) == 1:
-                    rect = ann.get("/Rect")
-                    if field_id not in radio_fields_by_id:
-                        radio_fields_by_id[field_id] = {
-                            "field_id": field_id,
-                            "type": "radio_group",
-                            "page": page_index + 1,
-                            "radio_options": [],
-                        }
                     # Note: at least on macOS 15.7, Preview.app doesn't show selected
                     # radio buttons correctly. (It does if you remove the leading slash
                     # from the value, but that causes them not to appear correctly in
                     # Chrome/Firefox/Acrobat/etc).
-                    radio_fields_by_id[field_id]["radio_options"].append({
+                    records.append(("radio", field_id, page_index + 1, {
                         "value": on_values[0],
-                        "rect": rect,
-                    })
-
-    # Some PDFs have form field definitions without corresponding annotations,
-    # so we can't tell where they are. Ignore these fields for now.
-    fields_with_location = []
-    for field_info in field_info_by_id.values():
-        if "page" in field_info:
-            fields_with_location.append(field_info)
+                        "rect": ann.get("/Rect"),
+                    }))
+    # Plain Python values, so records can be returned from worker processes
+    return json.loads(json.dumps(records))
+
+
+def _scan_page_range(pdf_path, first, last):
+    return scan_pages(PdfReader(pdf_path), first, last)
+
+
+def _scan_all_pages(reader: PdfReader, pdf_path=None, workers=PAGE_WORKERS):
+    page_count = len(reader.pages)
+    if pdf_path is None or workers <= 1 or page_count < PARALLEL_PAGE_THRESHOLD:
+        return scan_pages(reader, 0, page_count)
+
+    # Several page ranges per worker so one dense range doesn't hold up the rest
+    chunk = -(-page_count // (workers * 4))
+    starts = list(range(0, page_count, chunk))
+    ends = [min(start + chunk, page_count) for start in starts]
+    records = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for chunk_records in executor.map(_scan_page_range, [pdf_path] * len(starts), starts, ends):
+            records.extend(chunk_records)
+    return records
+
+
+# Returns a list of fillable PDF fields:
+# [
+#   {
+#     "field_id": "name",
+#     "page": 1,
+#     "type": ("text", "checkbox", "radio_group", or "choice")
+#     // Per-type additional fields described in forms.md
+#   },
+# ]
+#
+# Fields are found through the widget annotations on each page (which is also
+# where their bounding rects are stored), so fields without an annotation are
+# skipped. If `pdf_path` is given, large documents are scanned by parallel
+# worker processes.
+def get_field_info(reader: PdfReader, pdf_path=None, workers=PAGE_WORKERS):
+    field_info_by_id = {}
+    radio_fields_by_id = {}
+
+    for record in _scan_all_pages(reader, pdf_path, workers):
+        if record[0] == "field":
+            field_dict = record[1]
+            field_info_by_id[field_dict["field_id"]] = field_dict
         else:
-            print(f"Unable to determine location for field id: {field_info.get('field_id')}, ignoring")
+            _, field_id, page, option = record
+            if field_id not in radio_fields_by_id:
+                radio_fields_by_id[field_id] = {
+                    "field_id": field_id,
+                    "type": "radio_group",
+                    "page": page,
+                    "radio_options": [],
+                }
+            radio_fields_by_id[field_id]["radio_options"].append(option)
 
     # Sort by page number, then Y position (flipped in PDF coordinate system), then X.
     def sort_key(f):
@@ -131,15 +221,54 @@ def get_field_info(reader: PdfReader):
         adjusted_position = [-rect[1], rect[0]]
         return [f.get("page"), adjusted_position]
     
-    sorted_fields = fields_with_location + list(radio_fields_by_id.values())
+    sorted_fields = list(field_info_by_id.values()) + list(radio_fields_by_id.values())
     sorted_fields.sort(key=sort_key)
 
     return sorted_fields
 
 
+def pdf_content_hash(pdf_path) -> str:
+    sha = hashlib.sha256()
+    with open(pdf_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+# Returns get_field_info() for the PDF, from the catalog cache if this exact file
+# has been analyzed before. Pass `catalog_dir=None` to bypass the cache.
+def load_field_catalog(pdf_path, reader: PdfReader = None, catalog_dir=FIELD_CATALOG_DIR):
+    if catalog_dir is None:
+        return get_field_info(reader or PdfReader(pdf_path), pdf_path)
+
+    catalog_path = Path(catalog_dir) / f"{pdf_content_hash(pdf_path)}.json"
+    try:
+        with open(catalog_path) as f:
+            catalog = json.load(f)
+        if catalog.get("version") == FIELD_CATALOG_VERSION:
+            return catalog["fields"]
+    except (OSError, ValueError):
+        pass
+
+    field_info = get_field_info(reader or PdfReader(pdf_path), pdf_path)
+    # The catalog is only a cache: failing to write it must not fail the fill
+    tmp_path = None
+    try:
+        catalog_path.parent.mkdir(parents=True, exist_ok=True)
+        # Write-then-rename so concurrent fills never read a partial catalog
+        fd, tmp_path = tempfile.mkstemp(dir=catalog_path.parent, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump({"version": FIELD_CATALOG_VERSION, "fields": field_info}, f)
+        os.replace(tmp_path, catalog_path)
+    except (OSError, TypeError, ValueError) as e:
+        print(f"Warning: could not write field catalog {catalog_path}: {e}")
+        if tmp_path is not None and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return field_info
+
+
 def write_field_info(pdf_path: str, json_output_path: str):
-    reader = PdfReader(pdf_path)
-    field_info = get_field_info(reader)
+    field_info = load_field_catalog(pdf_path)
     with open(json_output_path, "w") as f:
         json.dump(field_info, f, indent=2)
     print(f"Wrote {len(field_info)} fields to {json_output_path}")
@@ -3,48 +3,87 @@ import sys
 
 from pypdf import PdfReader, PdfWriter
 
-from extract_form_field_info import get_field_info
+from extract_form_field_info import load_field_catalog
+from incremental_update import incremental_writer, write_incremental
 
 
 # Fills fillable form fields in a PDF. See forms.md.
 
 
-def fill_pdf_fields(input_pdf_path: str, fields_json_path: str, output_pdf_path: str):
+def fill_pdf_fields(input_pdf_path: str, fields_json_path: str, output_pdf_path: str, incremental=False):
     with open(fields_json_path) as f:
         fields = json.load(f)
-    # Group by page number.
-    fields_by_page = {}
-    for field in fields:
-        if "value" in field:
-            field_id = field["field_id"]
-            page = field["page"]
-            if page not in fields_by_page:
-                fields_by_page[page] = {}
-            fields_by_page[page][field_id] = field["value"]
     
     reader = PdfReader(input_pdf_path)
 
-    has_error = False
-    field_info = get_field_info(reader)
+    errors = validation_errors(fields, load_field_catalog(input_pdf_path, reader))
+    if errors:
+        for err in errors:
+            print(err)
+        sys.exit(1)
+
+    write_filled_pdf(reader, fields, output_pdf_path, input_pdf_path if incremental else None)
+
+
+# Fills one template with many sets of field values. The template is parsed and
+# its field catalog loaded once; each job is a (field_values.json, output pdf)
+# pair. Jobs with invalid values are reported and skipped. Returns the number of
+# jobs that failed.
+def fill_pdf_fields_batch(input_pdf_path: str, jobs, incremental=False) -> int:
+    reader = PdfReader(input_pdf_path)
+    field_info = load_field_catalog(input_pdf_path, reader)
+
+    failed = 0
+    for fields_json_path, output_pdf_path in jobs:
+        with open(fields_json_path) as f:
+            fields = json.load(f)
+        errors = validation_errors(fields, field_info)
+        if errors:
+            failed += 1
+            for err in errors:
+                print(f"{fields_json_path}: {err}")
+            continue
+        write_filled_pdf(reader, fields, output_pdf_path, input_pdf_path if incremental else None)
+        print(f"Wrote {output_pdf_path}")
+    return failed
+
+
+def validation_errors(fields, field_info) -> list[str]:
+    errors = []
     fields_by_ids = {f["field_id"]: f for f in field_info}
     for field in fields:
         existing_field = fields_by_ids.get(field["field_id"])
         if not existing_field:
-            has_error = True
-            print(f"ERROR: `{field['field_id']}` is not a valid field ID")
+            errors.append(f"ERROR: `{field['field_id']}` is not a valid field ID")
         elif field["page"] != existing_field["page"]:
-            has_error = True
-            print(f"ERROR: Incorrect page number for `{field['field_id']}` (got {field['page']}, expected {existing_field['page']})")
+            errors.append(f"ERROR: Incorrect page number for `{field['field_id']}` (got {field['page']}, expected {existing_field['page']})")
         else:
             if "value" in field:
                 err = validation_error_for_field_value(existing_field, field["value"])
                 if err:
-                    print(err)
-                    has_error = True
-    if has_error:
-        sys.exit(1)
+                    errors.append(err)
+    return errors
+
+
+# If `incremental_from` is the path `reader` was read from, the output is that
+# file plus an incremental update holding only the changed objects.
+def write_filled_pdf(reader: PdfReader, fields, output_pdf_path: str, incremental_from=None):
+    # Group by page number.
+    fields_by_page = {}
+    for field in fields:
+        if "value" in field:
+            field_id = field["field_id"]
+            page = field["page"]
+            if page not in fields_by_page:
+                fields_by_page[page] = {}
+            fields_by_page[page][field_id] = field["value"]
 
-    writer = PdfWriter(clone_from=reader)
+    writer = incremental_writer(reader) if incremental_from else None
+    if writer is None:
+        # Cloning from an already-parsed reader reuses its resolved objects, so
+        # batch fills don't re-read the source file.
+        writer = PdfWriter(clone_from=reader)
+        incremental_from = None
     for page, field_values in fields_by_page.items():
         writer.update_page_form_field_values(writer.pages[page - 1], field_values, auto_regenerate=False)
 
@@ -52,10 +91,22 @@ def fill_pdf_fields(input_pdf_path: str, fields_json_path: str, output_pdf_path:
     # It may cause the viewer to show a "save changes" dialog even if the user doesn't make any changes.
     writer.set_need_appearances_writer(True)
     
+    if incremental_from:
+        write_incremental(writer, incremental_from, output_pdf_path)
+        return
     with open(output_pdf_path, "wb") as f:
         writer.write(f)
 
 
+def read_batch_jobs(jobs_path: str):
+    # One job per line: {"values": "field_values.json", "output": "filled.pdf"}
+    with open(jobs_path) as f:
+        for line in f:
+            if line.strip():
+                job = json.loads(line)
+                yield job["values"], job["output"]
+
+
 def validation_error_for_field_value(field_info, field_value):
     field_type = field_info["type"]
     field_id = field_info["field_id"]
@@ -104,11 +155,20 @@ def monkeypatch_pydpf_method():
 
 
 if __name__ == "__main__":
-    if len(sys.argv) != 4:
-        print("Usage: fill_fillable_fields.py [input pdf] [field_values.json] [output pdf]")
+    # --incremental appends the changes to a copy of the input instead of rewriting it
+    incremental = "--incremental" in sys.argv
+    args = [arg for arg in sys.argv if arg != "--incremental"]
+    if len(args) == 4 and args[1] == "--batch":
+        monkeypatch_pydpf_method()
+        failed = fill_pdf_fields_batch(args[2], read_batch_jobs(args[3]), incremental)
+        sys.exit(1 if failed else 0)
+    if len(args) != 4:
+        print("Usage: fill_fillable_fields.py [input pdf] [field_values.json] [output pdf] [--incremental]")
+        print("       fill_fillable_fields.py --batch [input pdf] [jobs.jsonl] [--incremental]")
+        print('         (one {"values": "field_values.json", "output": "filled.pdf"} per line)')
         sys.exit(1)
     monkeypatch_pydpf_method()
-    input_pdf = sys.argv[1]
-    fields_json = sys.argv[2]
-    output_pdf = sys.argv[3]
-    fill_pdf_fields(input_pdf, fields_json, output_pdf)
+    input_pdf = args[1]
+    fields_json = args[2]
+    output_pdf = args[3]
+    fill_pdf_fields(input_pdf, fields_json, output_pdf, incremental)
@@ -1,9 +1,13 @@
 import json
+import os
 import sys
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
 
 from pypdf import PdfReader, PdfWriter
 from pypdf.annotations import FreeText
 
+from incremental_update import incremental_writer, write_incremental
+
 
 # Fills a PDF by adding text annotations defined in `fields.json`. See forms.md.
 
@@ -25,84 +29,183 @@ def transform_coordinates(bbox, image_width, image_height, pdf_width, pdf_height
     return left, bottom, right, top
 
 
-def fill_pdf_form(input_pdf_path, fields_json_path, output_pdf_path):
+FILL_WORKERS = min(4, os.cpu_count() or 1)
+
+
+class FormTemplate:
+    """A parsed template PDF that can be filled repeatedly from fields.json payloads"""
+
+    def __init__(self, input_pdf_path):
+        self.input_pdf_path = input_pdf_path
+        self.reader = PdfReader(input_pdf_path)
+        # Get PDF dimensions for each page
+        self.pdf_dimensions = {}
+        for i, page in enumerate(self.reader.pages):
+            mediabox = page.mediabox
+            self.pdf_dimensions[i + 1] = [mediabox.width, mediabox.height]
+        self._transforms = {}
+
+    def page_transform(self, page_info):
+        """(image_width, image_height, pdf_width, pdf_height) for a page image,
+        the page arguments of transform_coordinates(), cached across payloads"""
+        page_num = page_info["page_number"]
+        key = (page_num, page_info["image_width"], page_info["image_height"])
+        if key not in self._transforms:
+            pdf_width, pdf_height = self.pdf_dimensions[page_num]
+            self._transforms[key] = key[1:] + (pdf_width, pdf_height)
+        return self._transforms[key]
+
+    def annotations(self, fields_data):
+        """Yield (page_number, FreeText annotation) for each non-empty field"""
+        pages = {p["page_number"]: p for p in fields_data["pages"]}
+        for field in fields_data["form_fields"]:
+            # Skip empty fields
+            if "entry_text" not in field or "text" not in field["entry_text"]:
+                continue
+            entry_text = field["entry_text"]
+            text = entry_text["text"]
+            if not text:
+                continue
+
+            page_num = field["page_number"]
+            transformed_entry_box = transform_coordinates(
+                field["entry_bounding_box"], *self.page_transform(pages[page_num])
+            )
+
+            font_name = entry_text.get("font", "Arial")
+            font_size = str(entry_text.get("font_size", 14)) + "pt"
+            font_color = entry_text.get("font_color", "000000")
+
+            # Font size/color seems to not work reliably across viewers:
+            # https://github.com/py-pdf/pypdf/issues/2084
+            annotation = FreeText(
+                text=text,
+                rect=transformed_entry_box,
+                font=font_name,
+                font_size=font_size,
+                font_color=font_color,
+                border_color=None,
+                background_color=None,
+            )
+            yield page_num, annotation
+
+    def fill(self, fields_data, output_pdf_path, incremental=False):
+        """Write a filled copy of the template; returns the number of annotations added
+
+        With `incremental`, the output is the template's bytes plus an
+        incremental update holding only the annotations and modified pages.
+        """
+        writer = incremental_writer(self.reader) if incremental else None
+        if writer is None:
+            # Cloning from the already-parsed reader reuses its resolved objects
+            writer = PdfWriter(clone_from=self.reader)
+            incremental = False
+        count = 0
+        for page_num, annotation in self.annotations(fields_data):
+            # page_number is 0-based for pypdf
+            writer.add_annotation(page_number=page_num - 1, annotation=annotation)
+            count += 1
+
+        # Save the filled PDF
+        if incremental:
+            write_incremental(writer, self.input_pdf_path, output_pdf_path)
+        else:
+            with open(output_pdf_path, "wb") as output:
+                writer.write(output)
+        return count
+
+
+def fill_pdf_form(input_pdf_path, fields_json_path, output_pdf_path, incremental=False):
     """Fill the PDF form with data from fields.json"""
     
     # `fields.json` format described in forms.md.
     with open(fields_json_path, "r") as f:
         fields_data = json.load(f)
     
-    # Open the PDF
-    reader = PdfReader(input_pdf_path)
-    writer = PdfWriter()
-    
-    # Copy all pages to writer
-    writer.append(reader)
-    
-    # Get PDF dimensions for each page
-    pdf_dimensions = {}
-    for i, page in enumerate(reader.pages):
-        mediabox = page.mediabox
-        pdf_dimensions[i + 1] = [mediabox.width, mediabox.height]
-    
-    # Process each form field
-    annotations = []
-    for field in fields_data["form_fields"]:
-        page_num = field["page_number"]
-        
-        # Get page dimensions and transform coordinates.
-        page_info = next(p for p in fields_data["pages"] if p["page_number"] == page_num)
-        image_width = page_info["image_width"]
-        image_height = page_info["image_height"]
-        pdf_width, pdf_height = pdf_dimensions[page_num]
-        
-        transformed_entry_box = transform_coordinates(
-            field["entry_bounding_box"],
-            image_width, image_height,
-            pdf_width, pdf_height
-        )
-        
-        # Skip empty fields
-        if "entry_text" not in field or "text" not in field["entry_text"]:
-            continue
-        entry_text = field["entry_text"]
-        text = entry_text["text"]
-        if not text:
-            continue
-        
-        font_name = entry_text.get("font", "Arial")
-        font_size = str(entry_text.get("font_size", 14)) + "pt"
-        font_color = entry_text.get("font_color", "000000")
-
-        # Font size/color seems to not work reliably across viewers:
-        # https://github.com/py-pdf/pypdf/issues/2084
-        annotation = FreeText(
-            text=text,
-            rect=transformed_entry_box,
-            font=font_name,
-            font_size=font_size,
-            font_color=font_color,
-            border_color=None,
-            background_color=None,
-        )
-        annotations.append(annotation)
-        # page_number is 0-based for pypdf
-        writer.add_annotation(page_number=page_num - 1, annotation=annotation)
-        
-    # Save the filled PDF
-    with open(output_pdf_path, "wb") as output:
-        writer.write(output)
+    count = FormTemplate(input_pdf_path).fill(fields_data, output_pdf_path, incremental)
     
     print(f"Successfully filled PDF form and saved to {output_pdf_path}")
-    print(f"Added {len(annotations)} text annotations")
+    print(f"Added {count} text annotations")
+
+
+_worker_template = None
+
+
+def _init_worker(input_pdf_path):
+    global _worker_template
+    _worker_template = FormTemplate(input_pdf_path)
+
+
+def _fill_job(fields, output_pdf_path, incremental):
+    # `fields` is a fields.json payload or the path to one
+    if isinstance(fields, str):
+        with open(fields, "r") as f:
+            fields = json.load(f)
+    return _worker_template.fill(fields, output_pdf_path, incremental)
+
+
+def fill_pdf_forms(input_pdf_path, jobs, workers=FILL_WORKERS, incremental=False):
+    """
+    Fill one template PDF many times, e.g. for a mail merge
+
+    `jobs` is an iterable of (fields, output_pdf_path) pairs, where fields is a
+    fields.json payload (dict) or a path to one. Each worker process parses the
+    template once. Jobs are consumed lazily, so the iterable can be a generator
+    over any number of payloads.
+
+    Yields (output_pdf_path, annotation_count or exception) in completion order.
+    """
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(input_pdf_path,)) as executor:
+        pending = {}
+        jobs = iter(jobs)
+        while True:
+            # Keep a bounded number of jobs in flight
+            while len(pending) < workers * 4:
+                job = next(jobs, None)
+                if job is None:
+                    break
+                fields, output_pdf_path = job
+                pending[executor.submit(_fill_job, fields, output_pdf_path, incremental)] = output_pdf_path
+            if not pending:
+                return
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                output_pdf_path = pending.pop(future)
+                try:
+                    yield output_pdf_path, future.result()
+                except Exception as e:
+                    yield output_pdf_path, e
+
+
+def read_batch_jobs(jobs_path):
+    # One job per line: {"fields": "fields.json", "output": "filled.pdf"}
+    with open(jobs_path) as f:
+        for line in f:
+            if line.strip():
+                job = json.loads(line)
+                yield job["fields"], job["output"]
 
 
 if __name__ == "__main__":
-    if len(sys.argv) != 4:
-        print("Usage: fill_pdf_form_with_annotations.py [input pdf] [fields.json] [output pdf]")
+    # --incremental appends the annotations to a copy of the input instead of rewriting it
+    incremental = "--incremental" in sys.argv
+    args = [arg for arg in sys.argv if arg != "--incremental"]
+    if len(args) == 4 and args[1] == "--batch":
+        failed = 0
+        for output_pdf, result in fill_pdf_forms(args[2], read_batch_jobs(args[3]), incremental=incremental):
+            if isinstance(result, Exception):
+                failed += 1
+                print(f"ERROR: {output_pdf}: {result}")
+            else:
+                print(f"Wrote {output_pdf} ({result} text annotations)")
+        sys.exit(1 if failed else 0)
+    if len(args) != 4:
+        print("Usage: fill_pdf_form_with_annotations.py [input pdf] [fields.json] [output pdf] [--incremental]")
+        print("       fill_pdf_form_with_annotations.py --batch [input pdf] [jobs.jsonl] [--incremental]")
+        print('         (one {"fields": "fields.json", "output": "filled.pdf"} per line)')
         sys.exit(1)
-    input_pdf = sys.argv[1]
-    fields_json = sys.argv[2]
-    output_pdf = sys.argv[3]
+    input_pdf = args[1]
+    fields_json = args[2]
+    output_pdf = args[3]
     
-    fill_pdf_form(input_pdf, fields_json, output_pdf)
\ No newline at end of file
+    fill_pdf_form(input_pdf, fields_json, output_pdf, incremental)
@@ -0,0 +1,55 @@
+import os
+import shutil
+
+from pypdf import PdfReader, PdfWriter
+
+
+# Saves filled forms as PDF incremental updates: the original file's bytes are
+# left untouched and only the new and modified objects, a new cross-reference
+# section and trailer are appended. Used by fill_fillable_fields.py and
+# fill_pdf_form_with_annotations.py with --incremental. See forms.md.
+
+
+# Returns a PdfWriter in incremental mode for `reader`, or None if the document
+# can't be updated incrementally (pypdf doesn't write encrypted increments).
+def incremental_writer(reader: PdfReader):
+    if reader.is_encrypted:
+        return None
+    return PdfWriter(reader, incremental=True)
+
+
+class _AppendOnlyStream:
+    # pypdf writes an incremental PDF as the original bytes followed by the
+    # update. This stream drops the first `skip` bytes (already in the file) and
+    # appends the rest, while reporting offsets as if it had written everything.
+
+    def __init__(self, f, skip):
+        self.f = f
+        self.skip = skip
+        self.position = 0
+
+    def write(self, data):
+        start = max(0, self.skip - self.position)
+        if start < len(data):
+            self.f.write(data[start:])
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        self.f.flush()
+
+
+# Writes the update made with `writer` (from incremental_writer) for the PDF at
+# `input_pdf_path`. If `output_pdf_path` is the input itself only the update is
+# written; otherwise the original is copied as-is and the update appended.
+def write_incremental(writer: PdfWriter, input_pdf_path, output_pdf_path):
+    original_size = os.path.getsize(input_pdf_path)
+    if not os.path.exists(output_pdf_path) or not os.path.samefile(input_pdf_path, output_pdf_path):
+        shutil.copyfile(input_pdf_path, output_pdf_path)
+    with open(output_pdf_path, "r+b") as f:
+        f.seek(original_size)
+        f.truncate()
+        writer.write_stream(_AppendOnlyStream(f, original_size))
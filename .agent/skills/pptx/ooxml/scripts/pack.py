@@ -15,6 +15,11 @@ import defusedxml.minidom
 import zipfile
 from pathlib import Path
 
+try:
+    from office_service import OfficeError, shared_service
+except ImportError:  # Imported as ooxml.scripts.pack (e.g. from docx/scripts)
+    from .office_service import OfficeError, shared_service
+
 
 def main():
     parser = argparse.ArgumentParser(description="Pack a directory into an Office file")
@@ -87,8 +92,23 @@ def pack_document(input_dir, output_file, validate=False):
     return True
 
 
-def validate_document(doc_path):
-    """Validate document by converting to HTML with soffice."""
+def validate_document(doc_path, service=None):
+    """Validate document by converting to HTML with soffice.
+
+    Uses `service` (an office_service OfficePool/OfficeClient) or the shared
+    daemon from $OFFICE_SERVICE_DIR when available, instead of a cold soffice.
+    """
+    service = service or shared_service()
+    if service is not None:
+        try:
+            if service.validate(doc_path):
+                return True
+            print("Validation error: Document validation failed", file=sys.stderr)
+            return False
+        except OfficeError as e:
+            print(f"Validation error: {e}", file=sys.stderr)
+            return False
+
     # Determine the correct filter based on file extension
     match doc_path.suffix.lower():
         case ".docx":
@@ -0,0 +1,409 @@
+#!/usr/bin/env python3
+"""
+Assemble a PowerPoint deck from slides of several source presentations.
+
+Usage:
+    python assemble.py output.pptx library-a.pptx:0 library-b.pptx:12 library-a.pptx:3
+
+Each slide reference is SOURCE:INDEX (0-based). The first source (or --base)
+provides slide size, theme and masters, exactly as in rearrange.py. Slides from
+other sources are imported together with their layout and master; layouts,
+masters and media that already exist in the output with identical content are
+reused instead of being copied again. Every source is opened once and the
+result is written in a single save.
+"""
+
+import argparse
+import hashlib
+import re
+import shutil
+import sys
+from copy import deepcopy
+from pathlib import Path
+
+from lxml import etree
+from pptx import Presentation
+from pptx.opc.constants import RELATIONSHIP_TYPE as RT
+from pptx.opc.package import PartFactory
+from pptx.opc.packuri import PackURI
+from pptx.oxml import parse_xml
+from pptx.oxml.ns import qn
+from pptx.oxml.xmlchemy import OxmlElement
+from rearrange import MediaRegistry, is_media_rel, plan_slides
+
+R_NS = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Assemble a presentation from slides of several source decks.",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python assemble.py output.pptx intro.pptx:0 library.pptx:34 library.pptx:34 outro.pptx:2
+    Creates output.pptx with slide 0 of intro.pptx, slide 34 of library.pptx
+    (twice) and slide 2 of outro.pptx, using intro.pptx as the base
+
+  python assemble.py output.pptx a.pptx:1 b.pptx:4 --base brand.pptx
+    Uses brand.pptx for slide size and theme; all slides are imported
+
+Note: Slide indices are 0-based (first slide is 0, second is 1, etc.)
+        """,
+    )
+
+    parser.add_argument("output", help="Path for output PPTX file")
+    parser.add_argument(
+        "slides", nargs="+", help="Slide references in SOURCE:INDEX form (0-based)"
+    )
+    parser.add_argument(
+        "--base",
+        help="PPTX providing slide size, theme and masters (default: first source)",
+    )
+
+    args = parser.parse_args()
+
+    # Parse the slide references
+    try:
+        slide_refs = [parse_slide_ref(ref) for ref in args.slides]
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    # Check sources exist
+    for source in {source for source, _ in slide_refs} | (
+        {Path(args.base)} if args.base else set()
+    ):
+        if not source.exists():
+            print(f"Error: Source file not found: {source}")
+            sys.exit(1)
+
+    # Create output directory if needed
+    output_path = Path(args.output)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+
+    try:
+        assemble_presentation(slide_refs, output_path, args.base)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"Error processing presentation: {e}")
+        sys.exit(1)
+
+
+def parse_slide_ref(ref):
+    """Parse a SOURCE:INDEX reference into a (Path, int) pair."""
+    source, sep, index = ref.rpartition(":")
+    if not sep or not source:
+        raise ValueError(f"Invalid slide reference '{ref}'. Use SOURCE:INDEX")
+    try:
+        return Path(source), int(index)
+    except ValueError:
+        raise ValueError(f"Invalid slide index in '{ref}'. Use SOURCE:INDEX")
+
+
+def remap_rids(element, rid_map):
+    """Rewrite r:id/r:embed/... attributes under `element` using `rid_map`."""
+    for el in element.iter():
+        for key, value in el.attrib.items():
+            if key.startswith(R_NS) and value in rid_map:
+                el.set(key, rid_map[value])
+
+
+class PartImporter:
+    """Copy parts from source packages into the output package.
+
+    Media parts are shared through a MediaRegistry. Layouts are identified by a
+    content hash of the layout, its master and theme, so a layout that already
+    exists in the output is reused and each distinct master is imported once.
+    """
+
+    def __init__(self, prs, media_registry):
+        self._prs = prs
+        self._package = prs.part.package
+        self._media = media_registry
+        self._copied = {}  # id(source part) -> output part
+        self._digests = {}  # id(part) -> content digest
+        self._layouts = {}  # layout signature -> output SlideLayout
+        self._taken = {str(part.partname) for part in self._package.iter_parts()}
+        self._counters = {}  # partname template -> last number tried
+        self._slides = {}  # id(source slide part) -> imported slide part
+        self._slide_links = []  # (slide part, placeholder r:id, source target)
+
+        # Register existing layouts and the next free master/layout id
+        ids = [2147483647]
+        for el in prs.part._element.iter(qn("p:sldMasterId")):
+            ids.append(int(el.get("id")))
+        for master in prs.slide_masters:
+            for el in master.element.iter(qn("p:sldLayoutId")):
+                ids.append(int(el.get("id")))
+            for layout in master.slide_layouts:
+                self._layouts.setdefault(self._layout_signature(layout.part), layout)
+        self._next_id = max(ids) + 1
+
+    def layout_for(self, source_layout):
+        """Return the output layout matching `source_layout`, importing if needed."""
+        signature = self._layout_signature(source_layout.part)
+        if signature not in self._layouts:
+            self._import_master(source_layout.slide_master)
+        return self._layouts[signature]
+
+    def register_slide(self, source_part, slide_part):
+        """Record that `slide_part` is the imported copy of `source_part`."""
+        self._slides[id(source_part)] = slide_part
+
+    def link_slide(self, slide_part, target):
+        """Return a placeholder r:id for a link from `slide_part` to `target`.
+
+        The link can only be resolved once it is known whether `target` is
+        imported as well; see resolve_slide_links().
+        """
+        placeholder = f"slideLink{len(self._slide_links) + 1}"
+        self._slide_links.append((slide_part, placeholder, target))
+        return placeholder
+
+    def resolve_slide_links(self):
+        """Point placeholder slide links at the imported slides.
+
+        Links to slides that were not imported are removed.
+        """
+        for slide_part, placeholder, target in self._slide_links:
+            new_target = self._slides.get(id(target))
+            if new_target is not None:
+                rId = slide_part.relate_to(new_target, RT.SLIDE)
+                remap_rids(slide_part._element, {placeholder: rId})
+                continue
+            for el in list(slide_part._element.iter()):
+                for key, value in el.attrib.items():
+                    if key.startswith(R_NS) and value == placeholder:
+                        if el.tag in (qn("a:hlinkClick"), qn("a:hlinkHover")):
+                            el.getparent().remove(el)
+                        else:
+                            del el.attrib[key]
+                        break
+        self._slide_links = []
+
+    def import_media(self, part):
+        """Return an output part with the same bytes as `part`, adding it if new."""
+        existing = self._media.lookup(part.blob)
+        if existing is not None:
+            return existing
+        new_part = PartFactory(
+            partname=self._next_partname(part.partname),
+            content_type=part.content_type,
+            package=self._package,
+            blob=part.blob,
+        )
+        return self._media.canonical(new_part)
+
+    def _digest(self, part):
+        """Hash a part's bytes together with the bytes of the media it uses."""
+        key = id(part)
+        if key not in self._digests:
+            sha = hashlib.sha1(part.blob)
+            for rel in sorted(part.rels.values(), key=lambda r: r.rId):
+                if is_media_rel(rel):
+                    sha.update(hashlib.sha1(rel._target.blob).digest())
+            self._digests[key] = sha.hexdigest()
+        return self._digests[key]
+
+    def _layout_signature(self, layout_part):
+        master_part = layout_part.part_related_by(RT.SLIDE_MASTER)
+        theme_part = master_part.part_related_by(RT.THEME)
+        return (
+            self._digest(layout_part),
+            self._digest(master_part),
+            self._digest(theme_part),
+        )
+
+    def _next_partname(self, partname):
+        """Allocate an unused partname shaped like `partname` (e.g. image%d.png)."""
+        partname = str(partname)
+        tmpl = re.sub(r"\d*(\.\w+)$", r"%d\1", partname)
+        n = self._counters.get(tmpl, 0)
+        while True:
+            n += 1
+            candidate = tmpl % n
+            if candidate not in self._taken:
+                break
+        self._counters[tmpl] = n
+        self._taken.add(candidate)
+        return PackURI(candidate)
+
+    def _copy_part(self, part):
+        """Copy `part` and everything it relates to (except slides) into the output."""
+        key = id(part)
+        if key in self._copied:
+            return self._copied[key]
+
+        new_part = PartFactory(
+            partname=self._next_partname(part.partname),
+            content_type=part.content_type,
+            package=self._package,
+            blob=part.blob,
+        )
+        self._copied[key] = new_part
+
+        rid_map = {}
+        for rId, rel in part.rels.items():
+            if rel.is_external:
+                new_rId = new_part.relate_to(
+                    rel.target_ref, rel.reltype, is_external=True
+                )
+            elif is_media_rel(rel):
+                new_rId = new_part.relate_to(
+                    self.import_media(rel._target), rel.reltype
+                )
+            elif rel.reltype == RT.SLIDE:
+                continue
+            else:
+                new_rId = new_part.relate_to(self._copy_part(rel._target), rel.reltype)
+            rid_map[rId] = new_rId
+
+        if rid_map:
+            if hasattr(new_part, "_element"):
+                remap_rids(new_part._element, rid_map)
+            else:
+                # Parts python-pptx keeps as raw bytes (e.g. theme)
+                element = parse_xml(new_part.blob)
+                remap_rids(element, rid_map)
+                new_part._blob = etree.tostring(
+                    element, encoding="UTF-8", standalone=True
+                )
+        return new_part
+
+    def _import_master(self, source_master):
+        """Copy a slide master with its layouts and theme into the output."""
+        master_part = self._copy_part(source_master.part)
+
+        # Layout ids share one number space across all masters in the package
+        for el in master_part._element.iter(qn("p:sldLayoutId")):
+            el.set("id", str(self._next_id))
+            self._next_id += 1
+
+        rId = self._prs.part.relate_to(master_part, RT.SLIDE_MASTER)
+        sldMasterId = OxmlElement("p:sldMasterId")
+        sldMasterId.set("id", str(self._next_id))
+        sldMasterId.set(qn("r:id"), rId)
+        self._next_id += 1
+        self._prs.part._element.get_or_add_sldMasterIdLst().append(sldMasterId)
+
+        for source_layout in source_master.slide_layouts:
+            layout = self._copy_part(source_layout.part).slide_layout
+            self._layouts.setdefault(self._layout_signature(source_layout.part), layout)
+        print(f"  Imported slide master '{source_master.name or master_part.partname}'")
+
+
+def import_slide(prs, source, importer):
+    """Append a copy of `source` (a slide from another presentation) to `prs`."""
+    layout = importer.layout_for(source.slide_layout)
+    new_slide = prs.slides.add_slide(layout)
+
+    # CRITICAL: Clear placeholder shapes to avoid duplicates
+    for shape in list(new_slide.shapes):
+        sp = shape.element
+        sp.getparent().remove(sp)
+
+    # Re-create the slide's relationships in the output package. Layout and
+    # notes are not carried over; links to other slides are resolved once all
+    # slides are in place.
+    rid_map = {}
+    for rId, rel in source.part.rels.items():
+        if rel.is_external:
+            rid_map[rId] = new_slide.part.relate_to(
+                rel.target_ref, rel.reltype, is_external=True
+            )
+        elif is_media_rel(rel):
+            rid_map[rId] = new_slide.part.relate_to(
+                importer.import_media(rel._target), rel.reltype
+            )
+        elif rel.reltype in (RT.SLIDE_LAYOUT, RT.NOTES_SLIDE):
+            continue
+        elif rel.reltype == RT.SLIDE:
+            rid_map[rId] = importer.link_slide(new_slide.part, rel._target)
+        else:
+            # Charts, OLE objects, diagrams, tags, ...
+            rid_map[rId] = new_slide.part.relate_to(
+                importer._copy_part(rel._target), rel.reltype
+            )
+
+    # Copy all shapes from source
+    for shape in source.shapes:
+        new_el = deepcopy(shape.element)
+        remap_rids(new_el, rid_map)
+        new_slide.shapes._spTree.insert_element_before(new_el, "p:extLst")
+
+    importer.register_slide(source.part, new_slide.part)
+    return new_slide
+
+
+def assemble_presentation(slide_refs, output_path, base_path=None):
+    """
+    Create a new presentation from slides of several source presentations.
+
+    Args:
+        slide_refs: List of (source_pptx, slide_index) pairs, slide_index 0-based
+        output_path: Path for output PPTX file
+        base_path: Optional PPTX providing dimensions and theme (default: first source)
+    """
+    if not slide_refs:
+        raise ValueError("No slides to assemble")
+
+    base_path = Path(base_path) if base_path else Path(slide_refs[0][0])
+
+    # Copy base to preserve dimensions and theme
+    if base_path.resolve() != Path(output_path).resolve():
+        shutil.copy2(base_path, output_path)
+        prs = Presentation(output_path)
+    else:
+        prs = Presentation(base_path)
+
+    # Open every other source exactly once and validate indices
+    base_key = base_path.resolve()
+    sources = {}
+    for source_path, idx in slide_refs:
+        key = Path(source_path).resolve()
+        if key == base_key:
+            total_slides = len(prs.slides)
+        else:
+            if key not in sources:
+                sources[key] = Presentation(str(source_path))
+            total_slides = len(sources[key].slides)
+        if idx < 0 or idx >= total_slides:
+            raise ValueError(
+                f"Slide index {idx} out of range for {source_path} (0-{total_slides - 1})"
+            )
+
+    media_registry = MediaRegistry()
+    media_registry.dedupe(prs)
+    importer = PartImporter(prs, media_registry)
+
+    # Base slides keep their original on first use and repeats are duplicated;
+    # slides of other sources are imported
+    plan = []
+    for source_path, idx in slide_refs:
+        key = Path(source_path).resolve()
+        label = f"slide {idx} from {source_path}"
+        if key == base_key:
+            plan.append((idx, label))
+        else:
+            source = sources[key].slides[idx]
+            add_slide = lambda source=source: import_slide(prs, source, importer)
+            plan.append((add_slide, label))
+
+    print(f"Assembling {len(slide_refs)} slides from {len(sources) + 1} source(s)...")
+    plan_slides(prs, plan, media_registry)
+    importer.resolve_slide_links()
+
+    # Share one part per distinct image/media blob; orphaned parts are not saved
+    merged = media_registry.dedupe(prs)
+    if merged:
+        print(f"Merged {merged} duplicate media part(s)")
+
+    prs.save(output_path)
+    print(f"\nSaved assembled presentation to: {output_path}")
+    print(f"Final presentation has {len(prs.slides)} slides")
+
+
+if __name__ == "__main__":
+    main()
@@ -16,7 +16,9 @@ Classes:
 
 Main Functions:
     extract_text_inventory: Extract all text from a presentation
+    iter_text_inventory: Extract text one slide at a time
     save_inventory: Save extracted data to JSON
+    save_inventory_ndjson: Stream extracted data to newline-delimited JSON
 
 Usage:
     python inventory.py input.pptx output.json
@@ -28,11 +30,10 @@ import platform
 import sys
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple, Union
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
 
 from PIL import Image, ImageDraw, ImageFont
 from pptx import Presentation
-from pptx.enum.text import PP_ALIGN
 from pptx.shapes.base import BaseShape
 
 # Type aliases for cleaner signatures
@@ -46,6 +47,28 @@ InventoryData = Dict[
 ]  # Dict of slide_id -> {shape_id -> ShapeData}
 InventoryDict = Dict[str, Dict[str, ShapeDict]]  # JSON-serializable inventory
 
+DRAWINGML_NS = "{http://schemas.openxmlformats.org/drawingml/2006/main}"
+
+# <a:schemeClr val="..."> values mapped to MSO_THEME_COLOR member names
+THEME_COLOR_NAMES = {
+    "accent1": "ACCENT_1",
+    "accent2": "ACCENT_2",
+    "accent3": "ACCENT_3",
+    "accent4": "ACCENT_4",
+    "accent5": "ACCENT_5",
+    "accent6": "ACCENT_6",
+    "bg1": "BACKGROUND_1",
+    "bg2": "BACKGROUND_2",
+    "dk1": "DARK_1",
+    "dk2": "DARK_2",
+    "folHlink": "FOLLOWED_HYPERLINK",
+    "hlink": "HYPERLINK",
+    "lt1": "LIGHT_1",
+    "lt2": "LIGHT_2",
+    "tx1": "TEXT_1",
+    "tx2": "TEXT_2",
+}
+
 
 def main():
     """Main entry point for command-line usage."""
@@ -60,6 +83,9 @@ Examples:
   python inventory.py presentation.pptx inventory.json --issues-only
     Extracts only text shapes that have overflow or overlap issues
 
+  python inventory.py presentation.pptx inventory.ndjson --ndjson
+    Streams one JSON line per slide, keeping memory bounded for huge decks
+
 The output JSON includes:
   - All text content organized by slide and shape
   - Correct absolute positions for shapes in groups
@@ -76,6 +102,11 @@ The output JSON includes:
         action="store_true",
         help="Include only text shapes that have overflow or overlap issues",
     )
+    parser.add_argument(
+        "--ndjson",
+        action="store_true",
+        help="Stream output as newline-delimited JSON (one slide per line) for large decks",
+    )
 
     args = parser.parse_args()
 
@@ -94,17 +125,27 @@ The output JSON includes:
             print(
                 "Filtering to include only text shapes with issues (overflow/overlap)"
             )
-        inventory = extract_text_inventory(input_path, issues_only=args.issues_only)
-
         output_path = Path(args.output)
         output_path.parent.mkdir(parents=True, exist_ok=True)
-        save_inventory(inventory, output_path)
+
+        if args.ndjson:
+            total_slides, total_shapes = save_inventory_ndjson(
+                iter_text_inventory(
+                    input_path, issues_only=args.issues_only, detach_shapes=True
+                ),
+                output_path,
+            )
+        else:
+            inventory = extract_text_inventory(
+                input_path, issues_only=args.issues_only, detach_shapes=True
+            )
+            save_inventory(inventory, output_path)
+            total_slides = len(inventory)
+            total_shapes = sum(len(shapes) for shapes in inventory.values())
 
         print(f"Output saved to: {args.output}")
 
         # Report statistics
-        total_slides = len(inventory)
-        total_shapes = sum(len(shapes) for shapes in inventory.values())
         if args.issues_only:
             if total_shapes > 0:
                 print(
@@ -137,6 +178,23 @@ class ShapeWithPosition:
 class ParagraphData:
     """Data structure for paragraph properties extracted from a PowerPoint paragraph."""
 
+    __slots__ = (
+        "text",
+        "bullet",
+        "level",
+        "alignment",
+        "space_before",
+        "space_after",
+        "font_name",
+        "font_size",
+        "bold",
+        "italic",
+        "underline",
+        "color",
+        "theme_color",
+        "line_spacing",
+    )
+
     def __init__(self, paragraph: Any):
         """Initialize from a PowerPoint paragraph object.
 
@@ -165,24 +223,24 @@ class ParagraphData:
             and paragraph._p.pPr is not None
         ):
             pPr = paragraph._p.pPr
-            ns = "{http://schemas.openxmlformats.org/drawingml/2006/main}"
             if (
-                pPr.find(f"{ns}buChar") is not None
-                or pPr.find(f"{ns}buAutoNum") is not None
+                pPr.find(f"{DRAWINGML_NS}buChar") is not None
+                or pPr.find(f"{DRAWINGML_NS}buAutoNum") is not None
             ):
                 self.bullet = True
-                if hasattr(paragraph, "level"):
-                    self.level = paragraph.level
+                # Read lvl directly; paragraph.level goes through get_or_add_pPr()
+                self.level = int(pPr.get("lvl", "0"))
 
-        # Add alignment if not LEFT (default)
-        if hasattr(paragraph, "alignment") and paragraph.alignment is not None:
+        # Add alignment if not LEFT (default); paragraph.alignment adds a <a:pPr>
+        pPr = getattr(paragraph._p, "pPr", None)
+        if pPr is not None and pPr.get("algn") is not None:
             alignment_map = {
-                PP_ALIGN.CENTER: "CENTER",
-                PP_ALIGN.RIGHT: "RIGHT",
-                PP_ALIGN.JUSTIFY: "JUSTIFY",
+                "ctr": "CENTER",
+                "r": "RIGHT",
+                "just": "JUSTIFY",
             }
-            if paragraph.alignment in alignment_map:
-                self.alignment = alignment_map[paragraph.alignment]
+            if pPr.get("algn") in alignment_map:
+                self.alignment = alignment_map[pPr.get("algn")]
 
         # Add spacing properties if set
         if hasattr(paragraph, "space_before") and paragraph.space_before:
@@ -192,32 +250,7 @@ class ParagraphData:
 
         # Extract font properties from first run
         if paragraph.runs:
-            first_run = paragraph.runs[0]
-            if hasattr(first_run, "font"):
-                font = first_run.font
-                if font.name:
-                    self.font_name = font.name
-                if font.size:
-                    self.font_size = font.size.pt
-                if font.bold is not None:
-                    self.bold = font.bold
-                if font.italic is not None:
-                    self.italic = font.italic
-                if font.underline is not None:
-                    self.underline = font.underline
-
-                # Handle color - both RGB and theme colors
-                try:
-                    # Try RGB color first
-                    if font.color.rgb:
-                        self.color = str(font.color.rgb)
-                except (AttributeError, TypeError):
-                    # Fall back to theme color
-                    try:
-                        if font.color.theme_color:
-                            self.theme_color = font.color.theme_color.name
-                    except (AttributeError, TypeError):
-                        pass
+            self._read_run_properties(paragraph.runs[0])
 
         # Add line spacing if set
         if hasattr(paragraph, "line_spacing") and paragraph.line_spacing is not None:
@@ -228,6 +261,43 @@ class ParagraphData:
                 font_size = self.font_size if self.font_size else 12.0
                 self.line_spacing = round(paragraph.line_spacing * font_size, 2)
 
+    def _read_run_properties(self, run: Any) -> None:
+        """Read font properties from a run's <a:rPr> element.
+
+        This inspects the XML directly instead of going through run.font, whose
+        getters add an empty <a:rPr> and <a:solidFill/> to the run. Keeping the
+        read path side-effect free lets inventory run on a live presentation.
+        """
+        rPr = getattr(run._r, "rPr", None)
+        if rPr is None:
+            return
+
+        latin = rPr.find(f"{DRAWINGML_NS}latin")
+        if latin is not None and latin.get("typeface"):
+            self.font_name = latin.get("typeface")
+        if sz := rPr.get("sz"):
+            self.font_size = int(sz) / 100.0
+        if (b := rPr.get("b")) is not None:
+            self.bold = b in ("1", "true")
+        if (i := rPr.get("i")) is not None:
+            self.italic = i in ("1", "true")
+        if (u := rPr.get("u")) is not None:
+            self.underline = u != "none"
+
+        # Handle color - both RGB and theme colors
+        solid_fill = rPr.find(f"{DRAWINGML_NS}solidFill")
+        if solid_fill is None:
+            return
+        srgb = solid_fill.find(f"{DRAWINGML_NS}srgbClr")
+        sys_clr = solid_fill.find(f"{DRAWINGML_NS}sysClr")
+        scheme = solid_fill.find(f"{DRAWINGML_NS}schemeClr")
+        if srgb is not None and srgb.get("val"):
+            self.color = srgb.get("val").upper()
+        elif sys_clr is not None and sys_clr.get("lastClr"):
+            self.color = sys_clr.get("lastClr").upper()
+        elif scheme is not None and scheme.get("val") in THEME_COLOR_NAMES:
+            self.theme_color = THEME_COLOR_NAMES[scheme.get("val")]
+
     def to_dict(self) -> ParagraphDict:
         """Convert to dictionary for JSON serialization, excluding None values."""
         result: ParagraphDict = {"text": self.text}
@@ -264,7 +334,34 @@ class ParagraphData:
 
 
 class ShapeData:
-    """Data structure for shape properties extracted from a PowerPoint shape."""
+    """Data structure for shape properties extracted from a PowerPoint shape.
+
+    The python-pptx shape reference (and with it the slide's lxml tree) is kept
+    until detach() is called, after which paragraphs are served from a snapshot.
+    """
+
+    __slots__ = (
+        "shape",
+        "shape_id",
+        "slide_width_emu",
+        "slide_height_emu",
+        "placeholder_type",
+        "default_font_size",
+        "left",
+        "top",
+        "width",
+        "height",
+        "left_emu",
+        "top_emu",
+        "width_emu",
+        "height_emu",
+        "frame_overflow_bottom",
+        "slide_overflow_right",
+        "slide_overflow_bottom",
+        "overlapping_shapes",
+        "warnings",
+        "_paragraphs",
+    )
 
     @staticmethod
     def emu_to_inches(emu: int) -> float:
@@ -400,8 +497,9 @@ class ShapeData:
             absolute_top: Absolute top position in EMUs (for shapes in groups)
             slide: Optional slide object to get dimensions and layout information
         """
-        self.shape = shape  # Store reference to original shape
+        self.shape: Optional[BaseShape] = shape  # Store reference to original shape
         self.shape_id: str = ""  # Will be set after sorting
+        self._paragraphs: Optional[List[ParagraphData]] = None  # Set by detach()
 
         # Get slide dimensions from slide object
         self.slide_width_emu, self.slide_height_emu = (
@@ -468,6 +566,8 @@ class ShapeData:
     @property
     def paragraphs(self) -> List[ParagraphData]:
         """Calculate paragraphs from the shape's text frame."""
+        if self._paragraphs is not None:
+            return self._paragraphs
         if not self.shape or not hasattr(self.shape, "text_frame"):
             return []
 
@@ -477,6 +577,17 @@ class ShapeData:
                 paragraphs.append(ParagraphData(paragraph))
         return paragraphs
 
+    def detach(self) -> None:
+        """Snapshot paragraphs and drop the reference to the python-pptx shape.
+
+        Use this once extraction is finished and the shape itself is no longer
+        needed (e.g. when only to_dict() output is wanted), so the inventory
+        does not keep the presentation's XML tree alive.
+        """
+        if self.shape is not None:
+            self._paragraphs = self.paragraphs
+            self.shape = None
+
     def _get_default_font_size(self) -> int:
         """Get default font size from theme text styles or use conservative default."""
         try:
@@ -911,24 +1022,25 @@ def detect_overlaps(shapes: List[ShapeData]) -> None:
                 shape2.overlapping_shapes[shape1.shape_id] = overlap_area
 
 
-def extract_text_inventory(
-    pptx_path: Path, prs: Optional[Any] = None, issues_only: bool = False
-) -> InventoryData:
-    """Extract text content from all slides in a PowerPoint presentation.
+def iter_text_inventory(
+    pptx_path: Path,
+    prs: Optional[Any] = None,
+    issues_only: bool = False,
+    detach_shapes: bool = False,
+) -> Iterator[Tuple[str, Dict[str, "ShapeData"]]]:
+    """Extract text content slide by slide.
 
     Args:
         pptx_path: Path to the PowerPoint file
         prs: Optional Presentation object to use. If not provided, will load from pptx_path.
         issues_only: If True, only include shapes that have overflow or overlap issues
+        detach_shapes: If True, call ShapeData.detach() so results hold no shape references
 
-    Returns a nested dictionary: {slide-N: {shape-N: ShapeData}}
-    Shapes are sorted by visual position (top-to-bottom, left-to-right).
-    The ShapeData objects contain the full shape information and can be
-    converted to dictionaries for JSON serialization using to_dict().
+    Yields (slide-N, {shape-N: ShapeData}) tuples for every slide with text,
+    so callers can process or write each slide before the next is extracted.
     """
     if prs is None:
         prs = Presentation(str(pptx_path))
-    inventory: InventoryData = {}
 
     for slide_idx, slide in enumerate(prs.slides):
         # Collect all valid shapes from this slide with absolute positions
@@ -966,12 +1078,36 @@ def extract_text_inventory(
         if not sorted_shapes:
             continue
 
+        if detach_shapes:
+            for shape_data in sorted_shapes:
+                shape_data.detach()
+
         # Create slide inventory using the stable shape IDs
-        inventory[f"slide-{slide_idx}"] = {
+        yield f"slide-{slide_idx}", {
             shape_data.shape_id: shape_data for shape_data in sorted_shapes
         }
 
-    return inventory
+
+def extract_text_inventory(
+    pptx_path: Path,
+    prs: Optional[Any] = None,
+    issues_only: bool = False,
+    detach_shapes: bool = False,
+) -> InventoryData:
+    """Extract text content from all slides in a PowerPoint presentation.
+
+    Args:
+        pptx_path: Path to the PowerPoint file
+        prs: Optional Presentation object to use. If not provided, will load from pptx_path.
+        issues_only: If True, only include shapes that have overflow or overlap issues
+        detach_shapes: If True, drop shape references once each slide is extracted
+
+    Returns a nested dictionary: {slide-N: {shape-N: ShapeData}}
+    Shapes are sorted by visual position (top-to-bottom, left-to-right).
+    The ShapeData objects contain the full shape information and can be
+    converted to dictionaries for JSON serialization using to_dict().
+    """
+    return dict(iter_text_inventory(pptx_path, prs, issues_only, detach_shapes))
 
 
 def get_inventory_as_dict(pptx_path: Path, issues_only: bool = False) -> InventoryDict:
@@ -988,7 +1124,9 @@ def get_inventory_as_dict(pptx_path: Path, issues_only: bool = False) -> Invento
     Returns:
         Nested dictionary with all data serialized for JSON
     """
-    inventory = extract_text_inventory(pptx_path, issues_only=issues_only)
+    inventory = extract_text_inventory(
+        pptx_path, issues_only=issues_only, detach_shapes=True
+    )
 
     # Convert ShapeData objects to dictionaries
     dict_inventory: InventoryDict = {}
@@ -1016,5 +1154,36 @@ def save_inventory(inventory: InventoryData, output_path: Path) -> None:
         json.dump(json_inventory, f, indent=2, ensure_ascii=False)
 
 
+def save_inventory_ndjson(
+    slides: Iterable[Tuple[str, Dict[str, "ShapeData"]]], output_path: Path
+) -> Tuple[int, int]:
+    """Stream inventory to a newline-delimited JSON file, one slide per line.
+
+    Each line is a one-key object {"slide-N": {shape-N: {...}}}, so merging
+    all lines yields the same structure as save_inventory(). Only the slide
+    currently being written is held in memory when `slides` is a generator
+    such as iter_text_inventory().
+
+    Returns:
+        Tuple of (slides written, shapes written)
+    """
+    total_slides = 0
+    total_shapes = 0
+    with open(output_path, "w", encoding="utf-8") as f:
+        for slide_key, shapes in slides:
+            line = {
+                slide_key: {
+                    shape_key: shape_data.to_dict()
+                    for shape_key, shape_data in shapes.items()
+                }
+            }
+            f.write(json.dumps(line, ensure_ascii=False))
+            f.write("\n")
+            total_slides += 1
+            total_shapes += len(shapes)
+
+    return total_slides, total_shapes
+
+
 if __name__ == "__main__":
     main()
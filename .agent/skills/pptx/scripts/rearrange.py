@@ -10,8 +10,10 @@ Slides can be repeated (e.g., 34 appears twice).
 """
 
 import argparse
+import hashlib
 import shutil
 import sys
+from collections import Counter
 from copy import deepcopy
 from pathlib import Path
 
@@ -72,8 +74,62 @@ Note: Slide indices are 0-based (first slide is 0, second is 1, etc.)
         sys.exit(1)
 
 
-def duplicate_slide(pres, index):
-    """Duplicate a slide in the presentation."""
+def is_media_rel(rel):
+    """Check if a relationship points to an internal image or media part."""
+    if rel.is_external:
+        return False
+    return any(kind in rel.reltype for kind in ("image", "media", "video", "audio"))
+
+
+class MediaRegistry:
+    """Content-hash registry of image/media parts in an output package.
+
+    Parts with identical bytes map to a single canonical part. python-pptx only
+    writes parts reachable through relationships, so once every relationship
+    points at the canonical part the duplicates are pruned on save.
+    """
+
+    def __init__(self):
+        self._parts_by_hash = {}
+        self._hash_by_partname = {}
+
+    def canonical(self, part):
+        """Return the registered part with the same content as `part`."""
+        partname = str(part.partname)
+        digest = self._hash_by_partname.get(partname)
+        if digest is None:
+            digest = hashlib.sha1(part.blob).hexdigest()
+            self._hash_by_partname[partname] = digest
+        return self._parts_by_hash.setdefault(digest, part)
+
+    def lookup(self, blob):
+        """Return the registered part whose bytes equal `blob`, or None."""
+        return self._parts_by_hash.get(hashlib.sha1(blob).hexdigest())
+
+    def dedupe(self, pres):
+        """Point every media relationship in the package at its canonical part.
+
+        Returns the number of distinct media parts that are no longer referenced.
+        """
+        orphaned = set()
+        for part in list(pres.part.package.iter_parts()):
+            for rel in part.rels.values():
+                if not is_media_rel(rel):
+                    continue
+                target = rel._target
+                canonical = self.canonical(target)
+                if canonical is not target:
+                    rel._target = canonical
+                    orphaned.add(str(target.partname))
+        return len(orphaned)
+
+
+def duplicate_slide(pres, index, media_registry=None):
+    """Duplicate a slide in the presentation.
+
+    If `media_registry` is given, image/media relationships on the new slide
+    point at the registry's canonical part for identical content.
+    """
     source = pres.slides[index]
 
     # Use source's layout to preserve formatting
@@ -85,6 +141,11 @@ def duplicate_slide(pres, index):
         if "image" in rel.reltype or "media" in rel.reltype:
             image_rels[rel_id] = rel
 
+    def target_for(rel):
+        if media_registry is None or rel.is_external:
+            return rel._target
+        return media_registry.canonical(rel._target)
+
     # CRITICAL: Clear placeholder shapes to avoid duplicates
     for shape in new_slide.shapes:
         sp = shape.element
@@ -109,7 +170,7 @@ def duplicate_slide(pres, index):
                 old_rel = image_rels[old_rId]
                 # get_or_add returns the rId directly, or adds and returns new rId
                 new_rId = new_slide.part.rels.get_or_add(
-                    old_rel.reltype, old_rel._target
+                    old_rel.reltype, target_for(old_rel)
                 )
                 # Update the blip's embed reference to use the new relationship ID
                 blip.set(
@@ -120,30 +181,57 @@ def duplicate_slide(pres, index):
     # Copy any additional image/media relationships that might be referenced elsewhere
     for rel_id, rel in image_rels.items():
         try:
-            new_slide.part.rels.get_or_add(rel.reltype, rel._target)
+            new_slide.part.rels.get_or_add(rel.reltype, target_for(rel))
         except Exception:
             pass  # Relationship might already exist
 
     return new_slide
 
 
-def delete_slide(pres, index):
-    """Delete a slide from the presentation."""
-    rId = pres.slides._sldIdLst[index].rId
-    pres.part.drop_rel(rId)
-    del pres.slides._sldIdLst[index]
-
-
-def reorder_slides(pres, slide_index, target_index):
-    """Move a slide from one position to another."""
-    slides = pres.slides._sldIdLst
+def plan_slides(prs, plan, media_registry):
+    """
+    Rearrange the slides of `prs` into `plan` with a single pass over it.
+
+    Each plan item is an (item, label) pair. `item` is either the 0-based index
+    of a slide already in `prs` or a callable that appends a new slide to `prs`
+    (e.g. one imported from another presentation). The first use of an existing
+    slide keeps the original; every further use duplicates it exactly once. New
+    slides are appended at the end of sldIdLst, so original indices stay valid
+    throughout. Slides of `prs` that the plan does not use are removed.
+    """
+    sld_id_lst = prs.slides._sldIdLst
+    original_ids = list(sld_id_lst)
+    remaining = Counter(item for item, _ in plan if not callable(item))
+    used = set()
+    final_order = []
+
+    for i, (item, label) in enumerate(plan):
+        if callable(item):
+            item()
+            final_order.append(sld_id_lst[-1])
+            print(f"  [{i}] Imported {label}")
+        elif item not in used:
+            used.add(item)
+            final_order.append(original_ids[item])
+            count = remaining[item] - 1
+            if count:
+                print(f"  [{i}] Using original {label}, creating {count} duplicate(s)")
+            else:
+                print(f"  [{i}] Using original {label}")
+        else:
+            duplicate_slide(prs, item, media_registry)
+            final_order.append(sld_id_lst[-1])
+            print(f"  [{i}] Using duplicate of {label}")
 
-    # Remove slide element from current position
-    slide_element = slides[slide_index]
-    slides.remove(slide_element)
+    # Drop relationships to unused slides in bulk
+    unused = [sld_id for idx, sld_id in enumerate(original_ids) if idx not in used]
+    print(f"\nDeleting {len(unused)} unused slides...")
+    for sld_id in unused:
+        prs.part.drop_rel(sld_id.rId)
 
-    # Insert at target position
-    slides.insert(target_index, slide_element)
+    # Write the final order in one assignment (also removes unused sldId entries)
+    print(f"Reordering {len(final_order)} slides to final sequence...")
+    sld_id_lst[:] = final_order
 
 
 def rearrange_presentation(template_path, output_path, slide_sequence):
@@ -169,57 +257,16 @@ def rearrange_presentation(template_path, output_path, slide_sequence):
         if idx < 0 or idx >= total_slides:
             raise ValueError(f"Slide index {idx} out of range (0-{total_slides - 1})")
 
-    # Track original slides and their duplicates
-    slide_map = []  # List of actual slide indices for final presentation
-    duplicated = {}  # Track duplicates: original_idx -> [duplicate_indices]
-
-    # Step 1: DUPLICATE repeated slides
+    media_registry = MediaRegistry()
     print(f"Processing {len(slide_sequence)} slides from template...")
-    for i, template_idx in enumerate(slide_sequence):
-        if template_idx in duplicated and duplicated[template_idx]:
-            # Already duplicated this slide, use the duplicate
-            slide_map.append(duplicated[template_idx].pop(0))
-            print(f"  [{i}] Using duplicate of slide {template_idx}")
-        elif slide_sequence.count(template_idx) > 1 and template_idx not in duplicated:
-            # First occurrence of a repeated slide - create duplicates
-            slide_map.append(template_idx)
-            duplicates = []
-            count = slide_sequence.count(template_idx) - 1
-            print(
-                f"  [{i}] Using original slide {template_idx}, creating {count} duplicate(s)"
-            )
-            for _ in range(count):
-                duplicate_slide(prs, template_idx)
-                duplicates.append(len(prs.slides) - 1)
-            duplicated[template_idx] = duplicates
-        else:
-            # Unique slide or first occurrence already handled, use original
-            slide_map.append(template_idx)
-            print(f"  [{i}] Using original slide {template_idx}")
-
-    # Step 2: DELETE unwanted slides (work backwards)
-    slides_to_keep = set(slide_map)
-    print(f"\nDeleting {len(prs.slides) - len(slides_to_keep)} unused slides...")
-    for i in range(len(prs.slides) - 1, -1, -1):
-        if i not in slides_to_keep:
-            delete_slide(prs, i)
-            # Update slide_map indices after deletion
-            slide_map = [idx - 1 if idx > i else idx for idx in slide_map]
-
-    # Step 3: REORDER to final sequence
-    print(f"Reordering {len(slide_map)} slides to final sequence...")
-    for target_pos in range(len(slide_map)):
-        # Find which slide should be at target_pos
-        current_pos = slide_map[target_pos]
-        if current_pos != target_pos:
-            reorder_slides(prs, current_pos, target_pos)
-            # Update slide_map: the move shifts other slides
-            for i in range(len(slide_map)):
-                if slide_map[i] > current_pos and slide_map[i] <= target_pos:
-                    slide_map[i] -= 1
-                elif slide_map[i] < current_pos and slide_map[i] >= target_pos:
-                    slide_map[i] += 1
-            slide_map[target_pos] = target_pos
+    plan_slides(
+        prs, [(idx, f"slide {idx}") for idx in slide_sequence], media_registry
+    )
+
+    # Share one part per distinct image/media blob; orphaned parts are not saved
+    merged = media_registry.dedupe(prs)
+    if merged:
+        print(f"Merged {merged} duplicate media part(s)")
 
     # Save the presentation
     prs.save(output_path)
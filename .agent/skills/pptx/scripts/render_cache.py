@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Content-addressed on-disk cache of rendered slide images.
+
+Each slide image is stored under a hash of everything that affects how the
+slide renders: the slide XML, the parts it references (images, media, charts),
+its layout, master and theme, the slide size and the render settings. A deck
+that was only partly edited therefore re-renders just the changed slides.
+
+The cache is bounded by total bytes; least recently used images are evicted
+first (a cache hit refreshes the file's modification time).
+
+Used by thumbnail.py via --cache-dir. Can also be run directly to inspect or
+trim a cache:
+    python render_cache.py [cache_dir] [--max-bytes N]
+"""
+
+import argparse
+import hashlib
+import os
+import shutil
+from pathlib import Path
+
+from pptx.opc.constants import RELATIONSHIP_TYPE as RT
+
+DEFAULT_CACHE_DIR = Path(
+    os.environ.get("PPTX_RENDER_CACHE", "~/.cache/pptx-render")
+).expanduser()
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024  # 512 MB
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Inspect or trim the slide render cache used by thumbnail.py."
+    )
+    parser.add_argument(
+        "cache_dir",
+        nargs="?",
+        default=str(DEFAULT_CACHE_DIR),
+        help=f"Cache directory (default: {DEFAULT_CACHE_DIR})",
+    )
+    parser.add_argument(
+        "--max-bytes",
+        type=int,
+        default=DEFAULT_MAX_BYTES,
+        help=f"Evict least recently used images above this size (default: {DEFAULT_MAX_BYTES})",
+    )
+    args = parser.parse_args()
+
+    cache = SlideRenderCache(Path(args.cache_dir), args.max_bytes)
+    removed = cache.evict()
+    entries = cache.entries()
+    total = sum(size for _, _, size in entries)
+    print(f"Cache: {cache.cache_dir}")
+    print(f"  Images: {len(entries)} ({total / 1024 / 1024:.1f} MB)")
+    print(f"  Evicted: {removed}")
+
+
+class SlideRenderCache:
+    """Rendered slide images keyed by content hash, with LRU eviction by bytes."""
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+
+    def path_for(self, key):
+        """Return where the image for `key` is (or would be) stored."""
+        return self.cache_dir / key[:2] / f"{key}.jpg"
+
+    def get(self, key):
+        """Return the cached image path for `key` and mark it as recently used."""
+        path = self.path_for(key)
+        if not path.exists():
+            return None
+        os.utime(path)
+        return path
+
+    def put(self, key, image_path):
+        """Store a copy of `image_path` under `key` and return the cached path."""
+        path = self.path_for(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        shutil.copyfile(image_path, tmp_path)
+        os.replace(tmp_path, path)
+        return path
+
+    def entries(self):
+        """Return (mtime, path, size) for every cached image."""
+        if not self.cache_dir.exists():
+            return []
+        result = []
+        for path in self.cache_dir.glob("*/*.jpg"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            result.append((stat.st_mtime, path, stat.st_size))
+        return result
+
+    def evict(self, keep=()):
+        """Delete least recently used images until the cache fits in max_bytes.
+
+        Images whose keys are in `keep` are never evicted. Returns the number
+        of images removed.
+        """
+        entries = sorted(self.entries())
+        total = sum(size for _, _, size in entries)
+        keep_paths = {self.path_for(key) for key in keep}
+        removed = 0
+        for _, path, size in entries:
+            if total <= self.max_bytes:
+                break
+            if path in keep_paths:
+                continue
+            try:
+                path.unlink()
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        return removed
+
+
+def slide_keys(prs, render_settings):
+    """Return one content hash per slide of `prs`.
+
+    render_settings is any string describing how images are produced (e.g.
+    DPI or target width); it is part of every key.
+    """
+    part_digests = {}  # partname -> digest, shared by slides using the same parts
+    tree_digests = {}  # partname -> digest of a layout/master and its related parts
+
+    def part_digest(part):
+        partname = str(part.partname)
+        if partname not in part_digests:
+            part_digests[partname] = hashlib.sha1(part.blob).hexdigest()
+        return part_digests[partname]
+
+    def tree_digest(part):
+        # A layout or master together with the parts it uses (images, theme,
+        # ...); links between layouts and masters are followed separately
+        partname = str(part.partname)
+        if partname not in tree_digests:
+            sha = hashlib.sha1(part_digest(part).encode())
+            for rel in sorted(part.rels.values(), key=lambda r: r.rId):
+                if rel.reltype in (RT.SLIDE_LAYOUT, RT.SLIDE_MASTER):
+                    continue
+                sha.update(f"|{rel.rId}|{rel.reltype}|".encode())
+                if rel.is_external:
+                    sha.update(rel.target_ref.encode())
+                else:
+                    sha.update(part_digest(rel.target_part).encode())
+            tree_digests[partname] = sha.hexdigest()
+        return tree_digests[partname]
+
+    base = f"{render_settings}|{prs.slide_width}x{prs.slide_height}"
+    keys = []
+    for idx, slide in enumerate(prs.slides):
+        sha = hashlib.sha1(base.encode())
+        blob = slide.part.blob
+        sha.update(blob)
+
+        # Slide number fields render the slide's position
+        if b'type="slidenum"' in blob:
+            sha.update(f"|pos={idx}".encode())
+
+        for rel in sorted(slide.part.rels.values(), key=lambda r: r.rId):
+            if rel.reltype == RT.NOTES_SLIDE:
+                continue
+            sha.update(f"|{rel.rId}|{rel.reltype}|".encode())
+            if rel.is_external:
+                sha.update(rel.target_ref.encode())
+            elif rel.reltype == RT.SLIDE_LAYOUT:
+                sha.update(tree_digest(rel.target_part).encode())
+            else:
+                sha.update(part_digest(rel.target_part).encode())
+
+        # The master's related parts include its theme
+        sha.update(tree_digest(slide.slide_layout.slide_master.part).encode())
+        keys.append(sha.hexdigest())
+
+    return keys
+
+
+def write_render_deck(prs, slide_indices, output_path):
+    """Save a copy of `prs` in which only `slide_indices` (0-based) are visible.
+
+    Other slides are hidden rather than removed, so LibreOffice exports just the
+    requested slides while slide numbers and cross-slide links stay intact.
+    Modifies `prs`.
+    """
+    wanted = set(slide_indices)
+    for idx, slide in enumerate(prs.slides):
+        if idx in wanted:
+            if slide.element.get("show") == "0":
+                del slide.element.attrib["show"]
+        else:
+            slide.element.set("show", "0")
+    prs.save(str(output_path))
+
+
+if __name__ == "__main__":
+    main()
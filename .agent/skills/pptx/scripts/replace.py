@@ -5,6 +5,8 @@ Usage:
     python replace.py <input.pptx> <replacements.json> <output.pptx>
 
 The replacements JSON should have the structure output by inventory.py.
+Newline-delimited files (.ndjson/.jsonl, as written by inventory.py --ndjson)
+are also accepted and read one slide per line.
 ALL text shapes identified by inventory.py will have their text cleared
 unless "paragraphs" is specified in the replacements for that shape.
 """
@@ -12,7 +14,7 @@ unless "paragraphs" is specified in the replacements for that shape.
 import json
 import sys
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Dict, Iterator, List, Tuple
 
 from inventory import InventoryData, extract_text_inventory
 from pptx import Presentation
@@ -211,6 +213,31 @@ def check_duplicate_keys(pairs):
     return result
 
 
+def iter_replacements(json_file: str) -> Iterator[Tuple[str, Dict]]:
+    """Yield (slide_key, shapes) pairs from a replacements file.
+
+    Files ending in .ndjson or .jsonl are read one line at a time, in the
+    format written by inventory.py --ndjson (one {"slide-N": {...}} object
+    per line). Any other file is parsed as a single JSON object.
+    """
+    if Path(json_file).suffix.lower() not in (".ndjson", ".jsonl"):
+        with open(json_file, "r") as f:
+            yield from json.load(f, object_pairs_hook=check_duplicate_keys).items()
+        return
+
+    with open(json_file, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield from json.loads(
+                    line, object_pairs_hook=check_duplicate_keys
+                ).items()
+
+
+def load_replacements(json_file: str) -> Dict:
+    """Load replacement data, rejecting duplicate keys within and across lines."""
+    return check_duplicate_keys(iter_replacements(json_file))
+
+
 def apply_replacements(pptx_file: str, json_file: str, output_file: str):
     """Apply text replacements from JSON to PowerPoint presentation."""
 
@@ -225,8 +252,7 @@ def apply_replacements(pptx_file: str, json_file: str, output_file: str):
     original_overflow = detect_frame_overflow(inventory)
 
     # Load replacement data with duplicate key detection
-    with open(json_file, "r") as f:
-        replacements = json.load(f, object_pairs_hook=check_duplicate_keys)
+    replacements = load_replacements(json_file)
 
     # Validate replacements
     errors = validate_replacements(inventory, replacements)
@@ -289,19 +315,12 @@ def apply_replacements(pptx_file: str, json_file: str, output_file: str):
                 apply_paragraph_properties(p, para_data)
 
     # Check for issues after replacements
-    # Save to a temporary file and reload to avoid modifying the presentation during inventory
-    # (extract_text_inventory accesses font.color which adds empty <a:solidFill/> elements)
-    import tempfile
-
-    with tempfile.NamedTemporaryFile(suffix=".pptx", delete=False) as tmp:
-        tmp_path = Path(tmp.name)
-        prs.save(str(tmp_path))
-
-    try:
-        updated_inventory = extract_text_inventory(tmp_path)
-        updated_overflow = detect_frame_overflow(updated_inventory)
-    finally:
-        tmp_path.unlink()  # Clean up temp file
+    # Inventory reads formatting straight from the XML without side effects,
+    # so it can run on the live presentation instead of a saved-and-reloaded copy
+    updated_inventory = extract_text_inventory(
+        Path(pptx_file), prs, detach_shapes=True
+    )
+    updated_overflow = detect_frame_overflow(updated_inventory)
 
     # Check if any text overflow got worse
     overflow_errors = []
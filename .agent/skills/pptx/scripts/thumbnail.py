@@ -20,6 +20,7 @@ Grid limits by column count:
 
 Usage:
     python thumbnail.py input.pptx [output_prefix] [--cols N] [--outline-placeholders]
+                        [--render-at-size] [--cache-dir [DIR]] [--workers N]
 
 Examples:
     python thumbnail.py presentation.pptx
@@ -38,24 +39,46 @@ Examples:
 
     python thumbnail.py template.pptx analysis --outline-placeholders
     # Creates thumbnail grids with red outlines around text placeholders
+
+    python thumbnail.py large-deck.pptx grid --render-at-size
+    # Renders each slide at thumbnail width instead of full DPI (much less CPU and memory)
+
+    python thumbnail.py deck.pptx review --cache-dir
+    # Re-renders only slides that changed since the last run (see render_cache.py)
 """
 
 import argparse
+import os
 import subprocess
 import sys
 import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
-from inventory import extract_text_inventory
 from PIL import Image, ImageDraw, ImageFont
 from pptx import Presentation
 
+# office_service.py lives in this skill's ooxml/scripts directory
+sys.path.append(str(Path(__file__).resolve().parent.parent / "ooxml" / "scripts"))
+
+from inventory import extract_text_inventory
+from office_service import OfficeError, shared_service
+from render_cache import (
+    DEFAULT_CACHE_DIR,
+    DEFAULT_MAX_BYTES,
+    SlideRenderCache,
+    slide_keys,
+    write_render_deck,
+)
+
 # Constants
 THUMBNAIL_WIDTH = 300  # Fixed thumbnail width in pixels
 CONVERSION_DPI = 100  # DPI for PDF to image conversion
 MAX_COLS = 6  # Maximum number of columns
 DEFAULT_COLS = 5  # Default number of columns
 JPEG_QUALITY = 95  # JPEG compression quality
+RENDER_WORKERS = min(4, os.cpu_count() or 1)  # Concurrent pdftoppm processes
+PAGES_PER_RANGE = 10  # Max PDF pages rendered per pdftoppm invocation
 
 # Grid layout constants
 GRID_PADDING = 20  # Padding between thumbnails
@@ -86,6 +109,29 @@ def main():
         action="store_true",
         help="Outline text placeholders with a colored border",
     )
+    parser.add_argument(
+        "--render-at-size",
+        action="store_true",
+        help="Render slides directly at thumbnail width instead of CONVERSION_DPI (much faster)",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        nargs="?",
+        const=str(DEFAULT_CACHE_DIR),
+        help=f"Reuse rendered slides from a content-addressed cache (default dir: {DEFAULT_CACHE_DIR})",
+    )
+    parser.add_argument(
+        "--cache-max-bytes",
+        type=int,
+        default=DEFAULT_MAX_BYTES,
+        help=f"Evict least recently used cached images above this size (default: {DEFAULT_MAX_BYTES})",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=RENDER_WORKERS,
+        help=f"Number of concurrent pdftoppm workers (default: {RENDER_WORKERS})",
+    )
 
     args = parser.parse_args()
 
@@ -94,6 +140,11 @@ def main():
     if args.cols > MAX_COLS:
         print(f"Warning: Columns limited to {MAX_COLS} (requested {args.cols})")
 
+    # Validate workers
+    if args.workers < 1:
+        print(f"Error: --workers must be at least 1 (got {args.workers})")
+        sys.exit(1)
+
     # Validate input
     input_path = Path(args.input)
     if not input_path.exists() or input_path.suffix.lower() != ".pptx":
@@ -118,13 +169,35 @@ def main():
                 if placeholder_regions:
                     print(f"Found placeholders on {len(placeholder_regions)} slides")
 
-            # Convert slides to images
-            slide_images = convert_to_images(input_path, Path(temp_dir), CONVERSION_DPI)
-            if not slide_images:
+            # Convert slides to images; grids consume pages while rendering continues
+            total_slides, hidden_slides = analyze_slides(input_path)
+            if not total_slides:
                 print("Error: No slides found")
                 sys.exit(1)
 
-            print(f"Found {len(slide_images)} slides")
+            print(f"Found {total_slides} slides")
+
+            scale_to_width = THUMBNAIL_WIDTH if args.render_at_size else None
+            if args.cache_dir:
+                slide_images = cached_slide_images(
+                    input_path,
+                    Path(temp_dir),
+                    CONVERSION_DPI,
+                    hidden_slides,
+                    SlideRenderCache(Path(args.cache_dir), args.cache_max_bytes),
+                    args.workers,
+                    scale_to_width,
+                )
+            else:
+                slide_images = iter_slide_images(
+                    input_path,
+                    Path(temp_dir),
+                    CONVERSION_DPI,
+                    total_slides,
+                    hidden_slides,
+                    args.workers,
+                    scale_to_width,
+                )
 
             # Create grids (max cols×(cols+1) images per grid)
             grid_files = create_grids(
@@ -134,6 +207,7 @@ def main():
                 output_path,
                 placeholder_regions,
                 slide_dimensions,
+                total_slides,
             )
 
             # Print saved files
@@ -165,7 +239,7 @@ def get_placeholder_regions(pptx_path):
     slide_dimensions is a tuple of (width_inches, height_inches).
     """
     prs = Presentation(str(pptx_path))
-    inventory = extract_text_inventory(pptx_path, prs)
+    inventory = extract_text_inventory(pptx_path, prs, detach_shapes=True)
     placeholder_regions = {}
 
     # Get actual slide dimensions in inches (EMU to inches conversion)
@@ -194,9 +268,8 @@ def get_placeholder_regions(pptx_path):
     return placeholder_regions, (slide_width_inches, slide_height_inches)
 
 
-def convert_to_images(pptx_path, temp_dir, dpi):
-    """Convert PowerPoint to images via PDF, handling hidden slides."""
-    # Detect hidden slides
+def analyze_slides(pptx_path):
+    """Return (total_slides, hidden_slides) with hidden slides as 1-based numbers."""
     print("Analyzing presentation...")
     prs = Presentation(str(pptx_path))
     total_slides = len(prs.slides)
@@ -212,9 +285,26 @@ def convert_to_images(pptx_path, temp_dir, dpi):
     if hidden_slides:
         print(f"Hidden slides: {sorted(hidden_slides)}")
 
+    return total_slides, hidden_slides
+
+
+def convert_to_pdf(pptx_path, temp_dir, service=None):
+    """Convert PowerPoint to PDF with LibreOffice (hidden slides are skipped).
+
+    Uses `service` (an office_service OfficePool/OfficeClient) or the shared
+    daemon from $OFFICE_SERVICE_DIR when available, instead of a cold soffice.
+    """
     pdf_path = temp_dir / f"{pptx_path.stem}.pdf"
 
-    # Convert to PDF
+    service = service or shared_service()
+    if service is not None:
+        print("Converting to PDF (office service)...")
+        try:
+            service.convert(pptx_path, pdf_path)
+        except OfficeError as e:
+            raise RuntimeError(f"PDF conversion failed: {e}")
+        return pdf_path
+
     print("Converting to PDF...")
     result = subprocess.run(
         [
@@ -232,45 +322,216 @@ def convert_to_images(pptx_path, temp_dir, dpi):
     if result.returncode != 0 or not pdf_path.exists():
         raise RuntimeError("PDF conversion failed")
 
-    # Convert PDF to images
-    print(f"Converting to images at {dpi} DPI...")
+    return pdf_path
+
+
+def render_page_range(pdf_path, temp_dir, dpi, first, last, scale_to_width=None):
+    """Render PDF pages first..last (1-based, inclusive) and return their paths in order.
+
+    With scale_to_width, pdftoppm renders each page directly at that pixel width
+    (height follows the aspect ratio) instead of at `dpi`.
+    """
+    prefix = temp_dir / f"slide-{first:05d}"
+    if scale_to_width:
+        size_args = ["-scale-to-x", str(scale_to_width), "-scale-to-y", "-1"]
+    else:
+        size_args = ["-r", str(dpi)]
     result = subprocess.run(
-        ["pdftoppm", "-jpeg", "-r", str(dpi), str(pdf_path), str(temp_dir / "slide")],
+        [
+            "pdftoppm",
+            "-jpeg",
+            *size_args,
+            "-f",
+            str(first),
+            "-l",
+            str(last),
+            str(pdf_path),
+            str(prefix),
+        ],
         capture_output=True,
         text=True,
     )
     if result.returncode != 0:
         raise RuntimeError("Image conversion failed")
 
-    visible_images = sorted(temp_dir.glob("slide-*.jpg"))
+    return sorted(temp_dir.glob(f"{prefix.name}-*.jpg"))
 
-    # Create full list with placeholders for hidden slides
-    all_images = []
-    visible_idx = 0
 
-    # Get placeholder dimensions from first visible slide
-    if visible_images:
-        with Image.open(visible_images[0]) as img:
-            placeholder_size = img.size
-    else:
-        placeholder_size = (1920, 1080)
+def render_pdf_pages(
+    pdf_path, temp_dir, dpi, page_count, workers=RENDER_WORKERS, scale_to_width=None
+):
+    """Render PDF pages with concurrent pdftoppm workers, yielding paths in page order.
+
+    Pages are split into ranges of at most PAGES_PER_RANGE so the first ranges
+    finish early and downstream consumers can start while the rest render.
+    """
+    if page_count <= 0:
+        return
+
+    range_size = max(1, min(PAGES_PER_RANGE, -(-page_count // workers)))
+    ranges = [
+        (first, min(first + range_size - 1, page_count))
+        for first in range(1, page_count + 1, range_size)
+    ]
+
+    size = f"{scale_to_width}px wide" if scale_to_width else f"{dpi} DPI"
+    print(f"Converting to images at {size} with {workers} worker(s)...")
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(
+                render_page_range, pdf_path, temp_dir, dpi, first, last, scale_to_width
+            )
+            for first, last in ranges
+        ]
+        for future in futures:
+            yield from future.result()
+
+
+def iter_slide_images(
+    pptx_path,
+    temp_dir,
+    dpi,
+    total_slides,
+    hidden_slides,
+    workers=RENDER_WORKERS,
+    scale_to_width=None,
+):
+    """Yield one image path per slide, in slide order, as pages finish rendering.
+
+    Hidden slides get a crossed-out placeholder image the size of the first
+    visible slide. scale_to_width renders pages directly at that width.
+    """
+    pdf_path = convert_to_pdf(pptx_path, temp_dir)
+    visible_images = render_pdf_pages(
+        pdf_path,
+        temp_dir,
+        dpi,
+        total_slides - len(hidden_slides),
+        workers,
+        scale_to_width,
+    )
+
+    placeholder_size = None
+    pending = None  # Visible image read ahead to size hidden-slide placeholders
 
     for slide_num in range(1, total_slides + 1):
         if slide_num in hidden_slides:
+            if placeholder_size is None:
+                pending = next(visible_images, None)
+                placeholder_size = (1920, 1080)
+                if pending is not None:
+                    with Image.open(pending) as img:
+                        placeholder_size = img.size
+
             # Create placeholder image for hidden slide
             placeholder_path = temp_dir / f"hidden-{slide_num:03d}.jpg"
             placeholder_img = create_hidden_slide_placeholder(placeholder_size)
             placeholder_img.save(placeholder_path, "JPEG")
-            all_images.append(placeholder_path)
+            yield placeholder_path
         else:
             # Use the actual visible slide image
-            if visible_idx < len(visible_images):
-                all_images.append(visible_images[visible_idx])
-                visible_idx += 1
+            image_path = pending if pending is not None else next(visible_images, None)
+            pending = None
+            if image_path is None:
+                continue
+            if placeholder_size is None and hidden_slides:
+                with Image.open(image_path) as img:
+                    placeholder_size = img.size
+            yield image_path
+
+
+def cached_slide_images(
+    pptx_path,
+    temp_dir,
+    dpi,
+    hidden_slides,
+    cache,
+    workers=RENDER_WORKERS,
+    scale_to_width=None,
+):
+    """Return one image path per slide, rendering only slides missing from `cache`.
+
+    Changed slides are exported from a copy of the deck in which every other
+    slide is hidden, then stored in the cache under their content hash.
+    """
+    prs = Presentation(str(pptx_path))
+    render_settings = f"w{scale_to_width}" if scale_to_width else f"dpi{dpi}"
+    keys = slide_keys(prs, render_settings)
+
+    cached = {}
+    missing = []
+    for idx, key in enumerate(keys):
+        if idx + 1 in hidden_slides:
+            continue
+        path = cache.get(key)
+        if path is None:
+            missing.append(idx)
+        else:
+            cached[idx] = path
+
+    print(f"Render cache: {len(cached)} hit(s), {len(missing)} slide(s) to render")
+    if missing:
+        render_path = temp_dir / f"{pptx_path.stem}-render.pptx"
+        write_render_deck(prs, missing, render_path)
+        pdf_path = convert_to_pdf(render_path, temp_dir)
+        rendered = render_pdf_pages(
+            pdf_path, temp_dir, dpi, len(missing), workers, scale_to_width
+        )
+        for idx, image_path in zip(missing, rendered):
+            cached[idx] = cache.put(keys[idx], image_path)
+
+    cache.evict(keep=keys)
+
+    # Create full list with placeholders for hidden slides
+    placeholder_size = (1920, 1080)
+    if hidden_slides and cached:
+        with Image.open(cached[min(cached)]) as img:
+            placeholder_size = img.size
+
+    all_images = []
+    for idx in range(len(keys)):
+        if idx + 1 in hidden_slides:
+            placeholder_path = temp_dir / f"hidden-{idx + 1:03d}.jpg"
+            create_hidden_slide_placeholder(placeholder_size).save(
+                placeholder_path, "JPEG"
+            )
+            all_images.append(placeholder_path)
+        elif idx in cached:
+            all_images.append(cached[idx])
 
     return all_images
 
 
+def convert_to_images(
+    pptx_path,
+    temp_dir,
+    dpi,
+    workers=RENDER_WORKERS,
+    scale_to_width=None,
+    cache=None,
+):
+    """Convert PowerPoint to images via PDF, handling hidden slides.
+
+    If `cache` (a SlideRenderCache) is given, unchanged slides are served from it.
+    """
+    total_slides, hidden_slides = analyze_slides(pptx_path)
+    if cache is not None:
+        return cached_slide_images(
+            pptx_path, temp_dir, dpi, hidden_slides, cache, workers, scale_to_width
+        )
+    return list(
+        iter_slide_images(
+            pptx_path,
+            temp_dir,
+            dpi,
+            total_slides,
+            hidden_slides,
+            workers,
+            scale_to_width,
+        )
+    )
+
+
 def create_grids(
     image_paths,
     cols,
@@ -278,8 +539,17 @@ def create_grids(
     output_path,
     placeholder_regions=None,
     slide_dimensions=None,
+    total_images=None,
 ):
-    """Create multiple thumbnail grids from slide images, max cols×(cols+1) images per grid."""
+    """Create multiple thumbnail grids from slide images, max cols×(cols+1) images per grid.
+
+    image_paths may be a lazy iterable (e.g. iter_slide_images) as long as
+    total_images is given; each grid is composed as soon as its images arrive.
+    """
+    if total_images is None:
+        image_paths = list(image_paths)
+        total_images = len(image_paths)
+
     # Maximum images per grid is cols × (cols + 1) for better proportions
     max_images_per_grid = cols * (cols + 1)
     grid_files = []
@@ -288,12 +558,8 @@ def create_grids(
         f"Creating grids with {cols} columns (max {max_images_per_grid} images per grid)"
     )
 
-    # Split images into chunks
-    for chunk_idx, start_idx in enumerate(
-        range(0, len(image_paths), max_images_per_grid)
-    ):
-        end_idx = min(start_idx + max_images_per_grid, len(image_paths))
-        chunk_images = image_paths[start_idx:end_idx]
+    def save_chunk(chunk_idx, chunk_images):
+        start_idx = chunk_idx * max_images_per_grid
 
         # Create grid for this chunk
         grid = create_grid(
@@ -301,7 +567,7 @@ def create_grids(
         )
 
         # Generate output filename
-        if len(image_paths) <= max_images_per_grid:
+        if total_images <= max_images_per_grid:
             # Single grid - use base filename without suffix
             grid_filename = output_path
         else:
@@ -315,6 +581,16 @@ def create_grids(
         grid.save(str(grid_filename), quality=JPEG_QUALITY)
         grid_files.append(str(grid_filename))
 
+    # Split images into chunks as they arrive
+    chunk_images = []
+    for image_path in image_paths:
+        chunk_images.append(image_path)
+        if len(chunk_images) == max_images_per_grid:
+            save_chunk(len(grid_files), chunk_images)
+            chunk_images = []
+    if chunk_images:
+        save_chunk(len(grid_files), chunk_images)
+
     return grid_files
 
 
@@ -375,14 +651,18 @@ def create_grid(
         y_thumbnail = y_base + label_padding + font_size + label_padding
 
         with Image.open(img_path) as img:
-            # Get original dimensions before thumbnail
+            # Get original dimensions before downscaling
             orig_w, orig_h = img.size
 
-            # Apply placeholder outlines if enabled
+            # Let the JPEG decoder downscale by powers of two before resampling
+            img.draft("RGB", (width, height))
+            img.thumbnail((width, height), Image.Resampling.LANCZOS)
+            w, h = img.size
+
+            # Apply placeholder outlines if enabled, drawn on the downscaled image
             if placeholder_regions and (start_slide_num + i) in placeholder_regions:
-                # Convert to RGBA for transparency support
-                if img.mode != "RGBA":
-                    img = img.convert("RGBA")
+                if img.mode != "RGB":
+                    img = img.convert("RGB")
 
                 # Get the regions for this slide
                 regions = placeholder_regions[start_slide_num + i]
@@ -391,43 +671,33 @@ def create_grid(
                 if slide_dimensions:
                     slide_width_inches, slide_height_inches = slide_dimensions
                 else:
-                    # Fallback: estimate from image size at CONVERSION_DPI
-                    slide_width_inches = orig_w / CONVERSION_DPI
-                    slide_height_inches = orig_h / CONVERSION_DPI
+                    # Fallback: the default 10in slide width, height from the
+                    # image aspect (the render DPI differs with --render-at-size)
+                    slide_width_inches = 9144000 / 914400.0
+                    slide_height_inches = slide_width_inches * orig_h / orig_w
 
-                x_scale = orig_w / slide_width_inches
-                y_scale = orig_h / slide_height_inches
+                x_scale = w / slide_width_inches
+                y_scale = h / slide_height_inches
 
-                # Create a highlight overlay
-                overlay = Image.new("RGBA", img.size, (255, 255, 255, 0))
-                overlay_draw = ImageDraw.Draw(overlay)
+                # Stroke proportional to the thumbnail, whatever size it was rendered at
+                stroke_width = max(1, min(w, h) // 150)
+                img_draw = ImageDraw.Draw(img)
 
                 # Highlight each placeholder region
                 for region in regions:
-                    # Convert from inches to pixels in the original image
+                    # Convert from inches to pixels in the thumbnail
                     px_left = int(region["left"] * x_scale)
                     px_top = int(region["top"] * y_scale)
                     px_width = int(region["width"] * x_scale)
                     px_height = int(region["height"] * y_scale)
 
-                    # Draw highlight outline with red color and thick stroke
-                    # Using a bright red outline instead of fill
-                    stroke_width = max(
-                        5, min(orig_w, orig_h) // 150
-                    )  # Thicker proportional stroke width
-                    overlay_draw.rectangle(
+                    # Draw highlight outline with bright red color
+                    img_draw.rectangle(
                         [(px_left, px_top), (px_left + px_width, px_top + px_height)],
-                        outline=(255, 0, 0, 255),  # Bright red, fully opaque
+                        outline=(255, 0, 0),
                         width=stroke_width,
                     )
 
-                # Composite the overlay onto the image using alpha blending
-                img = Image.alpha_composite(img, overlay)
-                # Convert back to RGB for JPEG saving
-                img = img.convert("RGB")
-
-            img.thumbnail((width, height), Image.Resampling.LANCZOS)
-            w, h = img.size
             tx = x + (width - w) // 2
             ty = y_thumbnail + (height - h) // 2
             grid.paste(img, (tx, ty))
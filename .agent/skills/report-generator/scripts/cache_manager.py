@@ -10,6 +10,10 @@ Usage:
     python3 cache_manager.py --update --id CACHE001 --content "...updated content..." --cache-path cache/
     python3 cache_manager.py --delete --id CACHE001 --cache-path cache/
     python3 cache_manager.py --cleanup --days 30 --cache-path cache/
+    python3 cache_manager.py reindex --cache-path cache/
+    python3 cache_manager.py migrate --cache-path cache/
+    python3 cache_manager.py config --max-bytes 500000000 --policy lfu --ttl industry-data=14
+    python3 cache_manager.py stats --cache-path cache/
 
 Examples:
     cache_manager.py --query "GB/T 31084-2014"
@@ -18,24 +22,90 @@ Examples:
     cache_manager.py --cleanup --days 30
 
 Features:
-    - Query cached data by keyword
+    - Query cached data by keyword (ranked with BM25 over a persistent
+      inverted index; Chinese text is indexed as character bigrams)
     - Add new cache entries
     - List cached entries
     - Update existing entries
     - Delete cache entries
-    - Cleanup expired cache
+    - Cleanup expired cache (TTL per category) and evict entries over the
+      byte/entry budget (LRU or LFU)
+    - Track hits on query and report hit ratio and bytes by category
+    - Rebuild the search index
+    - Migrate a legacy cache_index.json
+
+Storage:
+    cache.db holds entry metadata and the search index (SQLite); content is
+    stored once per distinct text in blobs/, named by its SHA-256. Listing
+    and metadata changes never read or rewrite content.
+
+Concurrency:
+    Several processes may share one cache directory. The store runs in
+    SQLite WAL mode, so readers never wait for writers, and every write
+    (including ID allocation) happens in a transaction that holds the write
+    lock from its first statement. Workers can keep one CacheStore open
+    instead of running the CLI per operation:
+        
+        from cache_manager import CacheStore
+        
+        with CacheStore('iteration/cache/') as store:
+            entry, evicted = store.add('风电技术规范', text, 'technical-standards', ['风电'])
+            total, results = store.query('生态修复规范')
 """
 
 import sys
 import argparse
+import hashlib
 import json
+import math
 import os
+import re
+import sqlite3
+import tempfile
+import threading
+import unicodedata
+from collections import Counter
+from contextlib import contextmanager
 from pathlib import Path
+from typing import Dict, List, Optional, Tuple
 from datetime import datetime, timedelta
 
 
-CACHE_FILE = 'cache_index.json'
+CACHE_FILE = 'cache_index.json'  # Legacy single-file layout, see `migrate`
+LEGACY_SEARCH_INDEX_FILE = 'search_index.db'
+STORE_FILE = 'cache.db'
+BLOB_DIR = 'blobs'
 DEFAULT_CACHE_PATH = 'iteration/cache/'
+# Seconds to wait for another process's write transaction to finish
+BUSY_TIMEOUT = 30
+
+# BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Name and tag terms count this many times as much as content terms
+NAME_WEIGHT = 3
+DEFAULT_QUERY_LIMIT = 20
+
+# Runs of CJK characters, or of ASCII letters and digits
+TOKEN_RE = re.compile(r'[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+|[a-z]+|[0-9]+')
+# Bump when tokenize() changes; stores indexed by an older version are reindexed
+INDEX_VERSION = 2
+
+# Default time to live per category, in days from when the content was cached
+# or last updated. Change with `config --ttl CATEGORY=DAYS`.
+CATEGORY_TTL_DAYS = {
+    'engineering-standards': 180,
+    'technical-standards': 180,
+    'industry-data': 30,
+    'case-studies': 90,
+}
+DEFAULT_TTL_DAYS = 30
+EVICTION_POLICIES = ('lru', 'lfu')
+# An entry's LFU score halves for every this many days without hits
+SCORE_HALF_LIFE_DAYS = 30
+
+ENTRY_COLUMNS = ('name', 'category', 'tags', 'cached_date', 'updated_date', 'expiry_date',
+                 'hits', 'score', 'last_access', 'content_hash', 'size')
 
 
 def parse_arguments():
@@ -57,6 +127,8 @@ Examples:
     # Query command
     query_parser = subparsers.add_parser('query', help='Query cache by keyword')
     query_parser.add_argument('keyword', help='Search keyword')
+    query_parser.add_argument('--limit', type=int, default=DEFAULT_QUERY_LIMIT,
+                              help=f'Maximum number of results (default: {DEFAULT_QUERY_LIMIT})')
     query_parser.add_argument('--cache-path', default=DEFAULT_CACHE_PATH, help='Cache directory path')
     
     # Add command
@@ -92,61 +164,788 @@ Examples:
     
     # Cleanup command
     cleanup_parser = subparsers.add_parser('cleanup', help='Cleanup expired cache entries')
-    cleanup_parser.add_argument('--days', type=int, default=30, help='Expiration days (default: 30)')
+    cleanup_parser.add_argument('--days', type=int,
+                                help='Expire entries cached or updated more than this many days ago '
+                                     '(default: per-category TTL, see config)')
+    add_budget_arguments(cleanup_parser, 'for this run')
     cleanup_parser.add_argument('--cache-path', default=DEFAULT_CACHE_PATH, help='Cache directory path')
     
+    # Reindex command
+    reindex_parser = subparsers.add_parser('reindex', help='Rebuild the search index from the cache')
+    reindex_parser.add_argument('--cache-path', default=DEFAULT_CACHE_PATH, help='Cache directory path')
+    
+    # Migrate command
+    migrate_parser = subparsers.add_parser('migrate', help=f'Convert a legacy {CACHE_FILE} to the current layout')
+    migrate_parser.add_argument('--cache-path', default=DEFAULT_CACHE_PATH, help='Cache directory path')
+    
+    # Config command
+    config_parser = subparsers.add_parser('config', help='Show or change the cache budget, eviction policy and TTLs')
+    add_budget_arguments(config_parser, '(0 = unlimited)')
+    config_parser.add_argument('--ttl', action='append', default=[], metavar='CATEGORY=DAYS',
+                               help='Time to live for a category (repeatable)')
+    config_parser.add_argument('--cache-path', default=DEFAULT_CACHE_PATH, help='Cache directory path')
+    
+    # Stats command
+    stats_parser = subparsers.add_parser('stats', help='Show hit ratio and bytes by category')
+    stats_parser.add_argument('--cache-path', default=DEFAULT_CACHE_PATH, help='Cache directory path')
+    
     return parser.parse_args()
 
 
+def add_budget_arguments(parser, note):
+    """Add the --max-bytes/--max-entries/--policy options to a subcommand."""
+    parser.add_argument('--max-bytes', type=int, help=f'Content byte budget {note}')
+    parser.add_argument('--max-entries', type=int, help=f'Entry budget {note}')
+    parser.add_argument('--policy', choices=EVICTION_POLICIES,
+                        help='Evict least recently (lru) or least frequently (lfu) used entries first')
+
+
 def load_cache_index(cache_path):
-    """Load cache index from JSON file."""
+    """Load a legacy cache index from JSON file.
+    
+    Raises ValueError if the file is not a valid cache index, so a corrupt
+    index is never mistaken for an empty one.
+    """
     cache_index_path = Path(cache_path) / CACHE_FILE
     if not cache_index_path.exists():
         return {}
     
     try:
         with open(cache_index_path, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except Exception as e:
-        print(f"❌ Error loading cache index: {e}")
-        return {}
+            cache_index = json.load(f)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"{cache_index_path} is not valid JSON: {e}") from e
+    if not isinstance(cache_index, dict):
+        raise ValueError(f"{cache_index_path} is not a cache index")
+    return cache_index
 
 
-def save_cache_index(cache_path, cache_index):
-    """Save cache index to JSON file."""
-    cache_index_path = Path(cache_path) / CACHE_FILE
+def open_store(cache_path):
+    """Open (creating if needed) the metadata store of a cache directory.
+    
+    The connection is in autocommit mode; group statements with
+    `transaction`. It may be used from several threads if the caller
+    serializes access (CacheStore does).
+    """
+    conn = sqlite3.connect(str(Path(cache_path) / STORE_FILE), timeout=BUSY_TIMEOUT,
+                           isolation_level=None, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.executescript('''
+        CREATE TABLE IF NOT EXISTS entries (
+            entry_id TEXT PRIMARY KEY,
+            name TEXT NOT NULL,
+            category TEXT NOT NULL DEFAULT '',
+            tags TEXT NOT NULL DEFAULT '[]',
+            cached_date TEXT NOT NULL DEFAULT '',
+            updated_date TEXT,
+            expiry_date TEXT NOT NULL DEFAULT '',
+            hits INTEGER NOT NULL DEFAULT 0,
+            score NUMERIC NOT NULL DEFAULT 0,
+            content_hash TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            last_access TEXT
+        );
+        CREATE INDEX IF NOT EXISTS entries_content ON entries (content_hash);
+        CREATE TABLE IF NOT EXISTS settings (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS counters (
+            name TEXT PRIMARY KEY,
+            value INTEGER NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS docs (
+            doc_id INTEGER PRIMARY KEY,
+            entry_id TEXT NOT NULL UNIQUE,
+            length INTEGER NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS postings (
+            term TEXT NOT NULL,
+            doc_id INTEGER NOT NULL,
+            tf INTEGER NOT NULL,
+            PRIMARY KEY (term, doc_id)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS postings_doc ON postings (doc_id);
+    ''')
+    # Stores created before hit tracking lack last_access
+    with transaction(conn):
+        columns = {row['name'] for row in conn.execute('PRAGMA table_info(entries)')}
+        if 'last_access' not in columns:
+            conn.execute('ALTER TABLE entries ADD COLUMN last_access TEXT')
+    return conn
+
+
+@contextmanager
+def transaction(conn, write=True):
+    """Run a block as one transaction, committing unless it raises.
+    
+    Write transactions start with BEGIN IMMEDIATE, which takes the database
+    write lock up front: a read-then-write sequence such as allocating the
+    next entry ID can't interleave with another process's writes. Read
+    transactions see one consistent snapshot.
+    """
+    conn.execute('BEGIN IMMEDIATE' if write else 'BEGIN')
     try:
-        with open(cache_index_path, 'w', encoding='utf-8') as f:
-            json.dump(cache_index, f, ensure_ascii=False, indent=2)
-        return True
-    except Exception as e:
-        print(f"❌ Error saving cache index: {e}")
-        return False
+        yield conn
+    except BaseException:
+        conn.execute('ROLLBACK')
+        raise
+    conn.execute('COMMIT')
 
 
-def query_cache(args):
-    """Query cache by keyword."""
-    cache_index = load_cache_index(args.cache_path)
+def row_to_entry(row):
+    """Convert an `entries` row to an entry dict (without content)."""
+    entry = dict(row)
+    entry['tags'] = json.loads(entry['tags'])
+    return entry
+
+
+def load_entry(conn, entry_id):
+    """Return the metadata of one entry, or None if it doesn't exist."""
+    row = conn.execute('SELECT * FROM entries WHERE entry_id = ?', (entry_id,)).fetchone()
+    return row_to_entry(row) if row else None
+
+
+def insert_entry(conn, entry_id, entry):
+    """Insert an entry's metadata inside a write transaction."""
+    values = dict(entry, tags=json.dumps(entry.get('tags', []), ensure_ascii=False))
+    conn.execute(
+        f"INSERT INTO entries (entry_id, {', '.join(ENTRY_COLUMNS)}) "
+        f"VALUES (?, {', '.join('?' * len(ENTRY_COLUMNS))})",
+        [entry_id] + [values.get(column) for column in ENTRY_COLUMNS])
+
+
+def delete_entries(conn, entry_ids):
+    """Delete entries and their search terms inside a write transaction.
+    Release the entries' blobs once it has committed."""
+    for entry_id in entry_ids:
+        conn.execute('DELETE FROM entries WHERE entry_id = ?', (entry_id,))
+        unindex_entry(conn, entry_id)
+
+
+def next_entry_id(conn):
+    """Allocate the next CACHE### id inside a write transaction.
+    
+    IDs come from a counter rather than the highest existing ID, so the ID
+    of a deleted entry is never handed out again while another worker may
+    still refer to it.
+    """
+    row = conn.execute(
+        "SELECT MAX(CAST(SUBSTR(entry_id, 6) AS INTEGER)) FROM entries WHERE entry_id LIKE 'CACHE%'"
+    ).fetchone()
+    counter = conn.execute("SELECT value FROM counters WHERE name = 'last_entry_id'").fetchone()
+    number = max(row[0] or 0, counter[0] if counter else 0) + 1
+    conn.execute("INSERT OR REPLACE INTO counters (name, value) VALUES ('last_entry_id', ?)", (number,))
+    return f"CACHE{number:03d}"
+
+
+def blob_path(cache_path, content_hash):
+    """Return where the content with `content_hash` is stored."""
+    return Path(cache_path) / BLOB_DIR / content_hash[:2] / f"{content_hash}.txt"
+
+
+def write_blob(cache_path, content):
+    """Store `content` and return (content hash, size in bytes).
+    
+    Blobs are written to a temp file and renamed into place, so readers
+    never see a partial file. Identical content is stored once. A blob
+    written outside a write transaction may be released by a concurrent
+    cleanup until an entry refers to it, so callers write it again (a no-op
+    when it exists) in the transaction that inserts the reference.
+    """
+    data = content.encode('utf-8')
+    content_hash = hashlib.sha256(data).hexdigest()
+    path = blob_path(cache_path, content_hash)
+    if not path.exists():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=str(path.parent), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+    return content_hash, len(data)
+
+
+def read_blob(cache_path, content_hash):
+    """Return the content stored under `content_hash`."""
+    with open(blob_path(cache_path, content_hash), 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+def release_blobs(conn, cache_path, content_hashes):
+    """Delete the blobs in `content_hashes` that no entry refers to anymore.
+    
+    Call after the transaction that dropped the references has committed.
+    Runs under the write lock so no entry can start referring to a blob
+    between the check and the delete.
+    """
+    if not content_hashes:
+        return
+    with transaction(conn):
+        for content_hash in set(content_hashes):
+            if conn.execute('SELECT 1 FROM entries WHERE content_hash = ? LIMIT 1', (content_hash,)).fetchone():
+                continue
+            try:
+                blob_path(cache_path, content_hash).unlink()
+            except FileNotFoundError:
+                pass
+
+
+def load_settings(conn):
+    """Return the cache settings: byte and entry budget (0 = unlimited),
+    eviction policy and TTL days by category."""
+    settings = {'max_bytes': 0, 'max_entries': 0, 'policy': 'lru', 'ttl': dict(CATEGORY_TTL_DAYS)}
+    for key, value in conn.execute('SELECT key, value FROM settings'):
+        if key.startswith('ttl.'):
+            settings['ttl'][key[len('ttl.'):]] = int(value)
+        elif key == 'policy':
+            settings['policy'] = value
+        else:
+            settings[key] = int(value)
+    return settings
+
+
+def save_setting(conn, key, value):
+    """Store one setting inside a write transaction."""
+    conn.execute('INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)', (key, str(value)))
+
+
+def expiry_date_for(settings, category, fresh_date):
+    """Return the expiry date of content of `category` cached or updated at `fresh_date`."""
+    days = settings['ttl'].get(category, DEFAULT_TTL_DAYS)
+    return (fresh_date + timedelta(days=days)).strftime('%Y-%m-%d')
+
+
+def bump_counter(conn, name, amount=1):
+    """Add `amount` to a usage counter inside a write transaction."""
+    conn.execute('INSERT OR IGNORE INTO counters (name, value) VALUES (?, 0)', (name,))
+    conn.execute('UPDATE counters SET value = value + ? WHERE name = ?', (amount, name))
+
+
+def parse_date(value):
+    """Parse a stored timestamp, or return None."""
+    try:
+        return datetime.strptime(value, '%Y-%m-%d %H:%M:%S')
+    except (TypeError, ValueError):
+        return None
+
+
+def decayed_score(entry, now):
+    """Return an entry's LFU score as of `now`.
+    
+    Each hit adds 1 and the score halves every SCORE_HALF_LIFE_DAYS, so
+    entries that were popular long ago don't stay in the cache forever.
+    """
+    score = float(entry.get('score') or 0)
+    last_access = parse_date(entry.get('last_access'))
+    if last_access is None:
+        return score
+    age_days = max(0.0, (now - last_access).total_seconds() / 86400)
+    return score * 0.5 ** (age_days / SCORE_HALF_LIFE_DAYS)
+
+
+def record_hits(conn, hits, queries, hit_queries):
+    """Apply counted hits ({entry_id: count}) and query counters.
+    
+    All updates go into one transaction, so recording costs a single small
+    metadata write however many entries and queries it covers. Scores are
+    read inside the transaction, so concurrent writers don't lose updates.
+    """
+    now = datetime.now()
+    timestamp = now.strftime('%Y-%m-%d %H:%M:%S')
+    with transaction(conn):
+        bump_counter(conn, 'queries', queries)
+        bump_counter(conn, 'hit_queries', hit_queries)
+        for entry_id, count in hits.items():
+            row = conn.execute('SELECT score, last_access FROM entries WHERE entry_id = ?', (entry_id,)).fetchone()
+            if row is None:
+                continue
+            conn.execute('UPDATE entries SET hits = hits + ?, score = ?, last_access = ? WHERE entry_id = ?',
+                         (count, round(decayed_score(dict(row), now) + count, 4), timestamp, entry_id))
+
+
+def eviction_order(entries, policy, now):
+    """Sort entries so the ones to evict first come first."""
+    def last_used(entry):
+        return entry.get('last_access') or entry.get('cached_date') or ''
+    if policy == 'lfu':
+        return sorted(entries, key=lambda entry: (decayed_score(entry, now), last_used(entry)))
+    return sorted(entries, key=last_used)
+
+
+def evict_to_budget(conn, cache_path, settings, keep=()):
+    """Evict entries until the cache fits its byte and entry budget.
+    
+    Entries in `keep` are never evicted. Returns the evicted entries.
+    """
+    max_bytes, max_entries = settings['max_bytes'], settings['max_entries']
+    if not max_bytes and not max_entries:
+        return []
+    
+    evicted = []
+    with transaction(conn):
+        entries = [dict(row) for row in conn.execute(
+            'SELECT entry_id, name, size, score, last_access, cached_date, content_hash FROM entries')]
+        total_bytes = sum(entry['size'] for entry in entries)
+        count = len(entries)
+        for entry in eviction_order(entries, settings['policy'], datetime.now()):
+            if (not max_bytes or total_bytes <= max_bytes) and (not max_entries or count <= max_entries):
+                break
+            if entry['entry_id'] in keep:
+                continue
+            evicted.append(entry)
+            total_bytes -= entry['size']
+            count -= 1
+        if evicted:
+            delete_entries(conn, [entry['entry_id'] for entry in evicted])
+            bump_counter(conn, 'evictions', len(evicted))
+    release_blobs(conn, cache_path, [entry['content_hash'] for entry in evicted])
+    return evicted
+
+
+def read_content_arg(args):
+    """Return the content given with --file or --content, or None if neither."""
+    if args.file:
+        with open(args.file, 'r', encoding='utf-8') as f:
+            return f.read()
+    return args.content
+
+
+def tokenize(text):
+    """Split text into index terms.
+    
+    Text is NFKC-normalized first, so full-width forms such as "ＧＢ／Ｔ ３１０８４"
+    index like their ASCII equivalents. Runs of ASCII letters and runs of
+    digits form separate lowercase terms: "GB50016-2014" gives gb, 50016 and
+    2014, and "2.5MW" gives 2, 5 and mw. Chinese has no word boundaries, so
+    each run of CJK characters becomes its overlapping character bigrams plus
+    the run's last character on its own; every character is then the start of
+    some term, which lets single-character queries match by prefix.
+    """
+    terms = []
+    for run in TOKEN_RE.findall(unicodedata.normalize('NFKC', text).lower()):
+        if run[0].isascii():
+            terms.append(run)
+        else:
+            terms.extend(run[i:i + 2] for i in range(len(run) - 1))
+            terms.append(run[-1])
+    return terms
+
+
+def entry_term_counts(entry_data):
+    """Return (term frequencies, document length) for a cache entry."""
+    counts = Counter(tokenize(entry_data.get('content', '')))
+    for term in tokenize(' '.join([entry_data.get('name', '')] + entry_data.get('tags', []))):
+        counts[term] += NAME_WEIGHT
+    return counts, sum(counts.values())
+
+
+def index_entry(conn, entry_id, term_counts):
+    """Add or replace one entry's postings inside a write transaction.
+    
+    `term_counts` comes from entry_term_counts, which callers run before
+    taking the write lock since tokenizing large content is slow.
+    """
+    unindex_entry(conn, entry_id)
+    counts, length = term_counts
+    doc_id = conn.execute('INSERT INTO docs (entry_id, length) VALUES (?, ?)', (entry_id, length)).lastrowid
+    # Inserting in term order keeps B-tree page writes local
+    conn.executemany('INSERT INTO postings (term, doc_id, tf) VALUES (?, ?, ?)',
+                     ((term, doc_id, tf) for term, tf in sorted(counts.items())))
+
+
+def unindex_entry(conn, entry_id):
+    """Remove one entry's postings inside a write transaction."""
+    row = conn.execute('SELECT doc_id FROM docs WHERE entry_id = ?', (entry_id,)).fetchone()
+    if row:
+        conn.execute('DELETE FROM postings WHERE doc_id = ?', row)
+        conn.execute('DELETE FROM docs WHERE doc_id = ?', row)
+
+
+def search_index(conn, keyword, limit=DEFAULT_QUERY_LIMIT):
+    """Rank entries containing every term of `keyword` with BM25.
+    
+    Returns (number of matches, [(entry_id, score), ...] best first, at most
+    `limit` long).
+    """
+    terms = list(dict.fromkeys(tokenize(keyword)))
+    if not terms:
+        return 0, []
+    
+    doc_count, total_length = conn.execute('SELECT COUNT(*), SUM(length) FROM docs').fetchone()
+    if not doc_count:
+        return 0, []
+    avg_length = total_length / doc_count
+    
+    # term -> {doc_id: tf}; a single CJK character matches every term it starts
+    term_postings = []
+    for term in terms:
+        if len(term) == 1 and not term.isascii():
+            rows = conn.execute(
+                'SELECT doc_id, SUM(tf) FROM postings WHERE term >= ? AND term < ? GROUP BY doc_id',
+                (term, chr(ord(term) + 1)))
+        else:
+            rows = conn.execute('SELECT doc_id, tf FROM postings WHERE term = ?', (term,))
+        postings = dict(rows)
+        if not postings:
+            return 0, []
+        term_postings.append(postings)
+    
+    # Intersect starting from the rarest term
+    term_postings.sort(key=len)
+    candidates = set(term_postings[0])
+    for postings in term_postings[1:]:
+        candidates &= postings.keys()
+        if not candidates:
+            return 0, []
+    
+    docs = {}
+    candidate_list = list(candidates)
+    for start in range(0, len(candidate_list), 500):
+        chunk = candidate_list[start:start + 500]
+        placeholders = ','.join('?' * len(chunk))
+        for doc_id, entry_id, length in conn.execute(
+                f'SELECT doc_id, entry_id, length FROM docs WHERE doc_id IN ({placeholders})', chunk):
+            docs[doc_id] = (entry_id, length)
+    
+    scores = {}
+    for postings in term_postings:
+        df = len(postings)
+        idf = math.log(1 + (doc_count - df + 0.5) / (df + 0.5))
+        for doc_id in candidates:
+            tf = postings[doc_id]
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * docs[doc_id][1] / avg_length)
+            scores[doc_id] = scores.get(doc_id, 0) + idf * tf * (BM25_K1 + 1) / (tf + norm)
+    
+    ranked = sorted(((docs[doc_id][0], score) for doc_id, score in scores.items()),
+                    key=lambda item: (-item[1], item[0]))
+    return len(ranked), ranked[:limit]
+
+
+class CacheStore:
+    """An open cache directory for repeated use by one worker.
+    
+    Keeps one connection and shares it between threads (calls are
+    serialized). Other processes can open the same directory concurrently.
+    With hit_batch_size > 1, query hits are buffered and written together
+    every that many queries, and on flush_hits()/close().
+    """
+    
+    def __init__(self, cache_path=DEFAULT_CACHE_PATH, hit_batch_size: int = 1):
+        self.cache_path = Path(cache_path)
+        self.cache_path.mkdir(parents=True, exist_ok=True)
+        self.hit_batch_size = hit_batch_size
+        self._lock = threading.RLock()
+        self._pending_hits = Counter()
+        self._pending_queries = 0
+        self._pending_hit_queries = 0
+        self.conn = open_store(self.cache_path)
+        row = self.conn.execute("SELECT value FROM counters WHERE name = 'index_version'").fetchone()
+        if (row[0] if row else 0) != INDEX_VERSION:
+            self.reindex()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+    
+    def close(self):
+        """Write buffered hits and close the store."""
+        with self._lock:
+            if self.conn is not None:
+                self.flush_hits()
+                self.conn.close()
+                self.conn = None
+    
+    def get(self, entry_id: str, with_content: bool = False) -> Optional[Dict]:
+        """Return one entry's metadata (and content), or None."""
+        with self._lock:
+            entry = load_entry(self.conn, entry_id)
+        if entry is not None and with_content:
+            entry['content'] = read_blob(self.cache_path, entry['content_hash'])
+        return entry
+    
+    def query(self, keyword: str, limit: int = DEFAULT_QUERY_LIMIT) -> Tuple[int, List[Tuple[Dict, float]]]:
+        """Search entries; returns (number of matches, [(entry, relevance), ...])."""
+        with self._lock:
+            with transaction(self.conn, write=False):
+                total, ranked = search_index(self.conn, keyword, limit)
+                results = [(load_entry(self.conn, entry_id), relevance) for entry_id, relevance in ranked]
+            
+            self._pending_queries += 1
+            if results:
+                self._pending_hit_queries += 1
+            self._pending_hits.update(entry['entry_id'] for entry, _ in results)
+            if self._pending_queries >= self.hit_batch_size:
+                self.flush_hits()
+        return total, results
+    
+    def flush_hits(self):
+        """Write buffered query hits to the store."""
+        with self._lock:
+            if not self._pending_queries:
+                return
+            record_hits(self.conn, self._pending_hits, self._pending_queries, self._pending_hit_queries)
+            self._pending_hits = Counter()
+            self._pending_queries = 0
+            self._pending_hit_queries = 0
+    
+    def list_entries(self, category: Optional[str] = None, tags: Optional[List[str]] = None) -> List[Dict]:
+        """Return entry metadata, newest first, optionally filtered by
+        category and by any of `tags`."""
+        query = 'SELECT * FROM entries'
+        params = []
+        if category:
+            query += ' WHERE category = ?'
+            params.append(category)
+        query += ' ORDER BY cached_date DESC'
+        
+        with self._lock:
+            entries = [row_to_entry(row) for row in self.conn.execute(query, params)]
+        if tags:
+            filter_tags = [tag.strip().lower() for tag in tags]
+            entries = [entry for entry in entries
+                       if any(tag.lower() in filter_tags for tag in entry.get('tags', []))]
+        return entries
     
-    keyword = args.keyword.lower()
-    results = []
+    def add(self, name: str, content: str, category: str, tags=()) -> Tuple[Dict, List[Dict]]:
+        """Add an entry; returns (new entry, entries evicted to stay within budget)."""
+        tags = list(tags)
+        content_hash, size = write_blob(self.cache_path, content)
+        term_counts = entry_term_counts({'name': name, 'tags': tags, 'content': content})
+        
+        with self._lock:
+            settings = load_settings(self.conn)
+            now = datetime.now()
+            entry = {
+                'name': name,
+                'category': category,
+                'tags': tags,
+                'cached_date': now.strftime('%Y-%m-%d %H:%M:%S'),
+                'expiry_date': expiry_date_for(settings, category, now),
+                'hits': 0,
+                'score': 0,
+                'content_hash': content_hash,
+                'size': size
+            }
+            
+            # Allocate the ID and add metadata and search terms in one transaction
+            with transaction(self.conn):
+                write_blob(self.cache_path, content)
+                entry['entry_id'] = next_entry_id(self.conn)
+                insert_entry(self.conn, entry['entry_id'], entry)
+                index_entry(self.conn, entry['entry_id'], term_counts)
+            
+            # Make room within the budget, never by evicting the new entry
+            evicted = evict_to_budget(self.conn, self.cache_path, settings, keep={entry['entry_id']})
+        return entry, evicted
+    
+    def update(self, entry_id: str, content: Optional[str] = None) -> Optional[Dict]:
+        """Replace an entry's content (or just mark it updated if None).
+        
+        Returns the updated entry, or None if it doesn't exist.
+        """
+        with self._lock:
+            entry = load_entry(self.conn, entry_id)
+            if entry is None:
+                return None
+            
+            updated_date = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            if content is None:
+                with transaction(self.conn):
+                    self.conn.execute('UPDATE entries SET updated_date = ? WHERE entry_id = ?',
+                                      (updated_date, entry_id))
+                return load_entry(self.conn, entry_id)
+            
+            # New content starts a new time to live
+            content_hash, size = write_blob(self.cache_path, content)
+            term_counts = entry_term_counts(dict(entry, content=content))
+            expiry_date = expiry_date_for(load_settings(self.conn), entry['category'], datetime.now())
+            with transaction(self.conn):
+                current = load_entry(self.conn, entry_id)
+                if current is None:
+                    return None
+                write_blob(self.cache_path, content)
+                self.conn.execute('UPDATE entries SET content_hash = ?, size = ?, updated_date = ?, expiry_date = ? '
+                                  'WHERE entry_id = ?',
+                                  (content_hash, size, updated_date, expiry_date, entry_id))
+                index_entry(self.conn, entry_id, term_counts)
+            release_blobs(self.conn, self.cache_path, [current['content_hash']])
+            return load_entry(self.conn, entry_id)
+    
+    def delete(self, entry_id: str) -> Optional[Dict]:
+        """Delete an entry; returns it, or None if it doesn't exist."""
+        with self._lock:
+            with transaction(self.conn):
+                entry = load_entry(self.conn, entry_id)
+                if entry is not None:
+                    delete_entries(self.conn, [entry_id])
+            if entry is not None:
+                release_blobs(self.conn, self.cache_path, [entry['content_hash']])
+        return entry
+    
+    def cleanup(self, days: Optional[int] = None, max_bytes: Optional[int] = None,
+                max_entries: Optional[int] = None, policy: Optional[str] = None) -> Tuple[List[str], List[Dict]]:
+        """Remove expired entries, then evict entries over the budget.
+        
+        Entries expire by their category's TTL, or `days` after they were
+        cached or updated if given. Budget arguments override the stored
+        settings for this call. Returns (expired IDs, evicted entries).
+        """
+        current_date = datetime.now().strftime('%Y-%m-%d')
+        with self._lock:
+            settings = load_settings(self.conn)
+            with transaction(self.conn):
+                if days is not None:
+                    cutoff = (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d %H:%M:%S')
+                    expired = self.conn.execute(
+                        "SELECT entry_id, content_hash FROM entries "
+                        "WHERE COALESCE(NULLIF(updated_date, ''), cached_date) < ?", (cutoff,)).fetchall()
+                else:
+                    expired = self.conn.execute('SELECT entry_id, content_hash FROM entries WHERE expiry_date < ?',
+                                                (current_date,)).fetchall()
+                delete_entries(self.conn, [entry_id for entry_id, _ in expired])
+            release_blobs(self.conn, self.cache_path, [content_hash for _, content_hash in expired])
+            
+            for key, value in (('max_bytes', max_bytes), ('max_entries', max_entries), ('policy', policy)):
+                if value is not None:
+                    settings[key] = value
+            evicted = evict_to_budget(self.conn, self.cache_path, settings)
+        return [entry_id for entry_id, _ in expired], evicted
     
-    for entry_id, entry_data in cache_index.items():
-        if keyword in entry_data.get('name', '').lower() or \
-           keyword in entry_data.get('content', '').lower() or \
-           any(keyword in tag.lower() for tag in entry_data.get('tags', [])):
-            results.append((entry_id, entry_data))
+    def configure(self, max_bytes: Optional[int] = None, max_entries: Optional[int] = None,
+                  policy: Optional[str] = None, ttl: Optional[Dict[str, int]] = None) -> Tuple[Dict, List[Dict]]:
+        """Change stored settings (None leaves a setting as is).
+        
+        A TTL change re-dates the category's existing entries; a smaller
+        budget evicts at once. Returns (settings, evicted entries).
+        """
+        with self._lock:
+            with transaction(self.conn):
+                for key, value in (('max_bytes', max_bytes), ('max_entries', max_entries), ('policy', policy)):
+                    if value is not None:
+                        save_setting(self.conn, key, value)
+                for category, days in (ttl or {}).items():
+                    save_setting(self.conn, f"ttl.{category}", days)
+                    # Existing entries of the category expire by the new TTL
+                    self.conn.execute(
+                        "UPDATE entries SET expiry_date = date(COALESCE(NULLIF(updated_date, ''), cached_date), ?) "
+                        "WHERE category = ? AND COALESCE(NULLIF(updated_date, ''), cached_date) != ''",
+                        (f"+{days} days", category))
+            settings = load_settings(self.conn)
+            evicted = evict_to_budget(self.conn, self.cache_path, settings)
+        return settings, evicted
+    
+    def stats(self) -> Dict:
+        """Return usage counters, settings and entries/bytes/hits by category."""
+        self.flush_hits()
+        with self._lock:
+            with transaction(self.conn, write=False):
+                counters = dict(self.conn.execute('SELECT name, value FROM counters').fetchall())
+                categories = self.conn.execute(
+                    'SELECT category, COUNT(*), SUM(size), SUM(hits) FROM entries GROUP BY category ORDER BY category'
+                ).fetchall()
+                stored_bytes = self.conn.execute(
+                    'SELECT SUM(size) FROM (SELECT DISTINCT content_hash, size FROM entries)').fetchone()[0] or 0
+                settings = load_settings(self.conn)
+        return {
+            'queries': counters.get('queries', 0),
+            'hit_queries': counters.get('hit_queries', 0),
+            'evictions': counters.get('evictions', 0),
+            'entries': sum(row[1] for row in categories),
+            'bytes': sum(row[2] or 0 for row in categories),
+            'stored_bytes': stored_bytes,
+            'settings': settings,
+            'categories': {row[0]: {'entries': row[1], 'bytes': row[2] or 0, 'hits': row[3] or 0}
+                           for row in categories},
+        }
+    
+    def reindex(self) -> int:
+        """Rebuild the search index; returns the number of entries indexed."""
+        with self._lock:
+            with transaction(self.conn):
+                self.conn.execute('DELETE FROM postings')
+                self.conn.execute('DELETE FROM docs')
+                entries = [row_to_entry(row) for row in self.conn.execute('SELECT * FROM entries')]
+                for entry in entries:
+                    content = read_blob(self.cache_path, entry['content_hash'])
+                    index_entry(self.conn, entry['entry_id'], entry_term_counts(dict(entry, content=content)))
+                self.conn.execute("INSERT OR REPLACE INTO counters (name, value) VALUES ('index_version', ?)",
+                                  (INDEX_VERSION,))
+        return len(entries)
+    
+    def migrate(self) -> Optional[int]:
+        """Convert a legacy cache_index.json; returns the number of entries
+        migrated, or None if there is nothing to migrate. Raises ValueError,
+        leaving the file in place, if it can't be read."""
+        cache_index_path = self.cache_path / CACHE_FILE
+        if not cache_index_path.exists():
+            return None
+        
+        cache_index = load_cache_index(self.cache_path)
+        migrated = 0
+        with self._lock:
+            # One transaction: either every entry is migrated or none is
+            with transaction(self.conn):
+                existing = {row[0] for row in self.conn.execute('SELECT entry_id FROM entries')}
+                for entry_id, entry_data in cache_index.items():
+                    if entry_id in existing:
+                        continue
+                    content = entry_data.get('content', '')
+                    content_hash, size = write_blob(self.cache_path, content)
+                    entry = {
+                        'name': entry_data.get('name', ''),
+                        'category': entry_data.get('category', ''),
+                        'tags': entry_data.get('tags', []),
+                        'cached_date': entry_data.get('cached_date', ''),
+                        'updated_date': entry_data.get('updated_date'),
+                        'expiry_date': entry_data.get('expiry_date', ''),
+                        'hits': entry_data.get('hits', 0),
+                        'score': entry_data.get('score', 0),
+                        'content_hash': content_hash,
+                        'size': size
+                    }
+                    insert_entry(self.conn, entry_id, entry)
+                    index_entry(self.conn, entry_id, entry_term_counts(dict(entry, content=content)))
+                    migrated += 1
+        
+        # Keep the old file as a backup; the old search index is superseded
+        os.replace(cache_index_path, cache_index_path.with_name(f"{CACHE_FILE}.migrated"))
+        legacy_search_index = self.cache_path / LEGACY_SEARCH_INDEX_FILE
+        if legacy_search_index.exists():
+            legacy_search_index.unlink()
+        return migrated
+
+
+def query_cache(args):
+    """Query cache by keyword."""
+    try:
+        with CacheStore(args.cache_path) as store:
+            total, results = store.query(args.keyword, args.limit)
+    except (OSError, sqlite3.Error) as e:
+        print(f"❌ Error searching cache: {e}")
+        return
     
     if results:
-        print(f"✅ Found {len(results)} matching entries:\n")
-        for entry_id, entry_data in results:
-            print(f"  ID: {entry_id}")
+        if total > len(results):
+            print(f"✅ Found {total} matching entries (showing top {len(results)}):\n")
+        else:
+            print(f"✅ Found {total} matching entries:\n")
+        for entry_data, relevance in results:
+            print(f"  ID: {entry_data['entry_id']}")
             print(f"  Name: {entry_data.get('name', '')}")
             print(f"  Category: {entry_data.get('category', '')}")
             print(f"  Cached: {entry_data.get('cached_date', '')}")
             print(f"  Expires: {entry_data.get('expiry_date', '')}")
             print(f"  Hits: {entry_data.get('hits', 0)}")
             print(f"  Score: {entry_data.get('score', 0)}")
+            print(f"  Relevance: {relevance:.3f}")
             print()
     else:
         print(f"ℹ️  No entries found matching: {args.keyword}")
@@ -154,75 +953,44 @@ def query_cache(args):
 
 def add_cache_entry(args):
     """Add new cache entry."""
-    cache_index = load_cache_index(args.cache_path)
-    
-    # Generate new ID
-    if cache_index:
-        max_id = max(int(k.replace('CACHE', '')) for k in cache_index.keys() if k.startswith('CACHE'))
-        new_id = f"CACHE{max_id + 1:03d}"
-    else:
-        new_id = "CACHE001"
-    
     # Read content from file or use provided content
-    if args.file:
-        try:
-            with open(args.file, 'r', encoding='utf-8') as f:
-                content = f.read()
-        except Exception as e:
-            print(f"❌ Error reading file: {e}")
-            return
-    else:
-        content = args.content if args.content else ""
+    try:
+        content = read_content_arg(args) or ""
+    except Exception as e:
+        print(f"❌ Error reading file: {e}")
+        return
     
     # Parse tags
     tags = [tag.strip() for tag in args.tags.split(',')] if args.tags else []
     
-    # Calculate expiry date (default 30 days)
-    expiry_date = (datetime.now() + timedelta(days=30)).strftime('%Y-%m-%d')
-    
-    # Create entry
-    entry = {
-        'name': args.name,
-        'content': content,
-        'category': args.category,
-        'tags': tags,
-        'cached_date': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-        'expiry_date': expiry_date,
-        'hits': 0,
-        'score': 0
-    }
-    
-    # Add to index
-    cache_index[new_id] = entry
+    try:
+        with CacheStore(args.cache_path) as store:
+            entry, evicted = store.add(args.name, content, args.category, tags)
+    except (OSError, sqlite3.Error) as e:
+        print(f"❌ Error saving cache entry: {e}")
+        return
     
-    # Save index
-    if save_cache_index(args.cache_path, cache_index):
-        print(f"✅ Cache entry added: {new_id}")
-        print(f"  Name: {entry['name']}")
-        print(f"  Category: {entry['category']}")
-        print(f"  Expiry: {entry['expiry_date']}")
+    print(f"✅ Cache entry added: {entry['entry_id']}")
+    print(f"  Name: {entry['name']}")
+    print(f"  Category: {entry['category']}")
+    print(f"  Expiry: {entry['expiry_date']}")
+    if evicted:
+        print(f"  Evicted to stay within budget: {', '.join(e['entry_id'] for e in evicted)}")
 
 
 def list_cache_entries(args):
     """List cache entries."""
-    cache_index = load_cache_index(args.cache_path)
-    
-    # Filter by category and tags if specified
-    results = []
-    for entry_id, entry_data in cache_index.items():
-        if args.category and entry_data.get('category') != args.category:
-            continue
-        if args.tags:
-            filter_tags = [tag.strip().lower() for tag in args.tags.split(',')]
-            entry_tags = [tag.lower() for tag in entry_data.get('tags', [])]
-            if not any(tag in entry_tags for tag in filter_tags):
-                continue
-        results.append((entry_id, entry_data))
+    try:
+        with CacheStore(args.cache_path) as store:
+            results = store.list_entries(args.category, args.tags.split(',') if args.tags else None)
+    except (OSError, sqlite3.Error) as e:
+        print(f"❌ Error loading cache entries: {e}")
+        return
     
     if results:
         print(f"✅ Found {len(results)} entries:\n")
-        for entry_id, entry_data in sorted(results, key=lambda x: x[1].get('cached_date', ''), reverse=True):
-            print(f"  ID: {entry_id}")
+        for entry_data in results:
+            print(f"  ID: {entry_data['entry_id']}")
             print(f"  Name: {entry_data.get('name', '')}")
             print(f"  Category: {entry_data.get('category', '')}")
             print(f"  Tags: {', '.join(entry_data.get('tags', []))}")
@@ -230,6 +998,7 @@ def list_cache_entries(args):
             print(f"  Expires: {entry_data.get('expiry_date', '')}")
             print(f"  Hits: {entry_data.get('hits', 0)}")
             print(f"  Score: {entry_data.get('score', 0)}")
+            print(f"  Last access: {entry_data.get('last_access') or 'never'}")
             print()
     else:
         print("ℹ️  No cache entries found matching criteria")
@@ -237,72 +1006,147 @@ def list_cache_entries(args):
 
 def update_cache_entry(args):
     """Update existing cache entry."""
-    cache_index = load_cache_index(args.cache_path)
+    # Read content from file or use provided content
+    try:
+        content = read_content_arg(args)
+    except Exception as e:
+        print(f"❌ Error reading file: {e}")
+        return
     
-    if args.id not in cache_index:
-        print(f"❌ Error: Entry ID not found: {args.id}")
+    try:
+        with CacheStore(args.cache_path) as store:
+            entry = store.update(args.id, content)
+    except (OSError, sqlite3.Error) as e:
+        print(f"❌ Error updating cache entry: {e}")
         return
     
-    # Read content from file or use provided content
-    if args.file:
-        try:
-            with open(args.file, 'r', encoding='utf-8') as f:
-                content = f.read()
-        except Exception as e:
-            print(f"❌ Error reading file: {e}")
-            return
+    if entry is None:
+        print(f"❌ Error: Entry ID not found: {args.id}")
     else:
-        content = args.content if args.content else cache_index[args.id].get('content', '')
-    
-    # Update entry
-    cache_index[args.id]['content'] = content
-    cache_index[args.id]['updated_date'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    
-    # Save index
-    if save_cache_index(args.cache_path, cache_index):
         print(f"✅ Cache entry updated: {args.id}")
 
 
 def delete_cache_entry(args):
     """Delete cache entry."""
-    cache_index = load_cache_index(args.cache_path)
+    try:
+        with CacheStore(args.cache_path) as store:
+            entry = store.delete(args.id)
+    except (OSError, sqlite3.Error) as e:
+        print(f"❌ Error deleting cache entry: {e}")
+        return
     
-    if args.id not in cache_index:
+    if entry is None:
         print(f"❌ Error: Entry ID not found: {args.id}")
+    else:
+        print(f"✅ Cache entry deleted: {args.id} ({entry['name']})")
+
+
+def cleanup_expired_cache(args):
+    """Cleanup expired cache entries, then evict entries over the budget."""
+    current_date = datetime.now().strftime('%Y-%m-%d')
+    threshold = f"{args.days} days" if args.days is not None else "per-category TTL"
+    
+    try:
+        with CacheStore(args.cache_path) as store:
+            # Command line budget options apply to this run only
+            expired, evicted = store.cleanup(args.days, args.max_bytes, args.max_entries, args.policy)
+            policy = args.policy or load_settings(store.conn)['policy']
+    except (OSError, sqlite3.Error) as e:
+        print(f"❌ Error cleaning up cache: {e}")
         return
     
-    # Delete entry
-    entry_name = cache_index[args.id].get('name', '')
-    del cache_index[args.id]
+    if expired:
+        print(f"✅ Cleaned up {len(expired)} expired entries")
+        print(f"   Expiration threshold: {threshold}")
+        print(f"   Cleanup date: {current_date}")
+    else:
+        print(f"ℹ️  No expired entries (threshold: {threshold})")
+    if evicted:
+        print(f"✅ Evicted {len(evicted)} entries over budget ({policy.upper()})")
+        for entry in evicted:
+            print(f"   {entry['entry_id']} ({entry['name']})")
+
+
+def reindex_cache(args):
+    """Rebuild the search index."""
+    try:
+        with CacheStore(args.cache_path) as store:
+            count = store.reindex()
+    except (OSError, sqlite3.Error) as e:
+        print(f"❌ Error rebuilding search index: {e}")
+        return
     
-    # Save index
-    if save_cache_index(args.cache_path, cache_index):
-        print(f"✅ Cache entry deleted: {args.id} ({entry_name})")
+    print(f"✅ Search index rebuilt: {count} entries")
 
 
-def cleanup_expired_cache(args):
-    """Cleanup expired cache entries."""
-    cache_index = load_cache_index(args.cache_path)
+def migrate_cache(args):
+    """Convert a legacy cache_index.json to the metadata store and blobs."""
+    try:
+        with CacheStore(args.cache_path) as store:
+            migrated = store.migrate()
+    except (OSError, ValueError, sqlite3.Error) as e:
+        print(f"❌ Error migrating cache: {e}")
+        return
     
-    # Find expired entries
-    expired_ids = []
-    current_date = datetime.now().strftime('%Y-%m-%d')
+    if migrated is None:
+        print(f"ℹ️  Nothing to migrate: {Path(args.cache_path) / CACHE_FILE} not found")
+        return
+    print(f"✅ Migrated {migrated} entries to {STORE_FILE}")
+    print(f"   Backup: {Path(args.cache_path) / (CACHE_FILE + '.migrated')}")
+
+
+def configure_cache(args):
+    """Show or change the cache budget, eviction policy and TTLs."""
+    ttl_changes = {}
+    for item in args.ttl:
+        category, _, days = item.partition('=')
+        if category not in CATEGORY_TTL_DAYS or not days.isdigit():
+            print(f"❌ Error: Invalid --ttl {item!r}; expected CATEGORY=DAYS with one of: "
+                  f"{', '.join(CATEGORY_TTL_DAYS)}")
+            return
+        ttl_changes[category] = int(days)
     
-    for entry_id, entry_data in cache_index.items():
-        expiry_date = entry_data.get('expiry_date', '')
-        if expiry_date < current_date:
-            expired_ids.append(entry_id)
+    try:
+        with CacheStore(args.cache_path) as store:
+            settings, evicted = store.configure(args.max_bytes, args.max_entries, args.policy, ttl_changes)
+    except (OSError, sqlite3.Error) as e:
+        print(f"❌ Error updating cache settings: {e}")
+        return
     
-    if expired_ids:
-        for entry_id in expired_ids:
-            del cache_index[entry_id]
-        
-        if save_cache_index(args.cache_path, cache_index):
-            print(f"✅ Cleaned up {len(expired_ids)} expired entries")
-            print(f"   Expiration threshold: {args.days} days")
-            print(f"   Cleanup date: {current_date}")
-    else:
-        print(f"ℹ️  No expired entries (threshold: {args.days} days)")
+    print("✅ Cache settings:")
+    print(f"  Max bytes: {settings['max_bytes'] or 'unlimited'}")
+    print(f"  Max entries: {settings['max_entries'] or 'unlimited'}")
+    print(f"  Eviction policy: {settings['policy'].upper()}")
+    for category, days in sorted(settings['ttl'].items()):
+        print(f"  TTL {category}: {days} days")
+    if evicted:
+        print(f"  Evicted to fit the budget: {', '.join(e['entry_id'] for e in evicted)}")
+
+
+def show_cache_stats(args):
+    """Show hit ratio and bytes by category."""
+    try:
+        with CacheStore(args.cache_path) as store:
+            stats = store.stats()
+    except (OSError, sqlite3.Error) as e:
+        print(f"❌ Error reading cache stats: {e}")
+        return
+    
+    settings = stats['settings']
+    print("✅ Cache statistics:\n")
+    print(f"  Entries: {stats['entries']}")
+    print(f"  Content bytes: {stats['bytes']} ({stats['stored_bytes']} stored after deduplication)")
+    if settings['max_bytes'] or settings['max_entries']:
+        print(f"  Budget: {settings['max_bytes'] or 'unlimited'} bytes, "
+              f"{settings['max_entries'] or 'unlimited'} entries ({settings['policy'].upper()})")
+    print(f"  Queries: {stats['queries']}")
+    if stats['queries']:
+        print(f"  Hit ratio: {stats['hit_queries'] / stats['queries']:.1%} "
+              f"({stats['hit_queries']} queries with results)")
+    print(f"  Evictions: {stats['evictions']}")
+    print()
+    for category, usage in stats['categories'].items():
+        print(f"  {category}: {usage['entries']} entries, {usage['bytes']} bytes, {usage['hits']} hits")
 
 
 def main():
@@ -319,6 +1163,12 @@ def main():
             print(f"❌ Error creating cache directory: {e}")
             sys.exit(1)
     
+    # Don't split a cache between the old and new layouts
+    if args.command != 'migrate' and (cache_dir / CACHE_FILE).exists():
+        print(f"❌ Error: {cache_dir / CACHE_FILE} uses the old cache layout. "
+              f"Run: cache_manager.py migrate --cache-path {args.cache_path}")
+        sys.exit(1)
+    
     # Execute command
     if args.command == 'query':
         query_cache(args)
@@ -332,6 +1182,14 @@ def main():
         delete_cache_entry(args)
     elif args.command == 'cleanup':
         cleanup_expired_cache(args)
+    elif args.command == 'reindex':
+        reindex_cache(args)
+    elif args.command == 'migrate':
+        migrate_cache(args)
+    elif args.command == 'config':
+        configure_cache(args)
+    elif args.command == 'stats':
+        show_cache_stats(args)
     else:
         print("❌ Error: No command specified. Use --help for usage.")
 
@@ -0,0 +1,70 @@
+import os
+import tempfile
+import unittest
+from cache_manager import CACHE_FILE, CacheStore, tokenize
+
+
+# Currently this is not run automatically in CI; it's just for documentation and manual checking.
+class TestTokenize(unittest.TestCase):
+
+    def test_splits_letters_from_digits(self):
+        """Standard numbers index their code and number separately"""
+        self.assertEqual(tokenize("GB50016-2014"), ["gb", "50016", "2014"])
+        self.assertEqual(tokenize("2.5MW"), ["2", "5", "mw"])
+
+    def test_full_width_text(self):
+        """Full-width letters and digits index like ASCII"""
+        self.assertEqual(tokenize("ＧＢ／Ｔ ３１０８４"), tokenize("GB/T 31084"))
+        self.assertEqual(tokenize("ＧＢ／Ｔ ３１０８４"), ["gb", "t", "31084"])
+
+    def test_cjk_bigrams(self):
+        """Chinese runs become bigrams plus the last character"""
+        self.assertEqual(tokenize("风电规范"), ["风电", "电规", "规范", "范"])
+
+
+class TestQuery(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = CacheStore(self.tmp.name)
+        self.store.add("建筑设计防火规范", "GB50016-2014 建筑设计防火规范", "engineering-standards")
+        self.store.add("风电场设计规范", "单机容量 2.5MW 的风电机组", "engineering-standards")
+        self.store.add("风电技术标准", "ＧＢ／Ｔ ３１０８４ 风电技术标准", "technical-standards")
+
+    def tearDown(self):
+        self.store.close()
+        self.tmp.cleanup()
+
+    def names(self, keyword):
+        _, results = self.store.query(keyword)
+        return [entry["name"] for entry, _ in results]
+
+    def test_standard_number(self):
+        """A standard is found by its number, with or without its code"""
+        for keyword in ("50016", "GB 50016", "GB50016", "ＧＢ５００１６"):
+            self.assertEqual(self.names(keyword), ["建筑设计防火规范"], keyword)
+
+    def test_unit(self):
+        """Units attached to a number are found on their own"""
+        self.assertEqual(self.names("MW"), ["风电场设计规范"])
+
+    def test_full_width_content(self):
+        """Full-width content is found by an ASCII query"""
+        self.assertEqual(self.names("GB/T 31084"), ["风电技术标准"])
+
+
+class TestMigrate(unittest.TestCase):
+
+    def test_corrupt_index_is_kept(self):
+        """A corrupt legacy index raises and stays in place"""
+        with tempfile.TemporaryDirectory() as tmp:
+            with open(os.path.join(tmp, CACHE_FILE), "w", encoding="utf-8") as f:
+                f.write('{"CACHE001": {"name": ')
+            with CacheStore(tmp) as store:
+                with self.assertRaises(ValueError):
+                    store.migrate()
+            self.assertTrue(os.path.exists(os.path.join(tmp, CACHE_FILE)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,1232 @@
+#!/usr/bin/env python3
+"""
+Pure-Python formula engine for incremental recalculation of xlsx workbooks
+
+Parses every <f> cell of a workbook (including shared formulas, cross-sheet
+references and defined names) into a dependency graph. Library callers that
+report their edits through set_value() get only the dirty cone evaluated:
+formula cells without a cached value, the changed cells, and everything
+downstream of them; cached values elsewhere are trusted and left untouched.
+A file on its own says nothing about which inputs changed since its values
+were cached, so recalculate_file() and the command line evaluate every formula.
+
+Supported: numbers, strings, booleans, error values, cell and range references
+(including whole columns/rows), the operators + - * / ^ & % = <> < > <= >=,
+and the functions in FUNCTIONS (SUM, AVERAGE, MIN, MAX, COUNT, COUNTA, IF,
+IFERROR, AND, OR, NOT, ABS, ROUND, CONCATENATE, VLOOKUP, INDEX, MATCH).
+
+Anything else among the formulas evaluated - an unsupported function, array formula,
+structured reference, external link or circular reference - raises
+UnsupportedFormula before the file is touched; recalc.py then falls back to
+LibreOffice.
+
+Usage:
+    python formula_engine.py <excel_file> [output_file]
+
+Library use:
+    book = FormulaWorkbook('model.xlsx')
+    book.set_value('Inputs', 'B2', 1250)
+    book.recalculate()
+    book.save()
+"""
+
+import json
+import math
+import os
+import re
+import sys
+import tempfile
+import xml.etree.ElementTree as ET
+import zipfile
+from collections import defaultdict, deque
+from decimal import ROUND_HALF_UP, Decimal
+from pathlib import Path
+from xml.dom import minidom
+
+SPREADSHEET_NS = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+REL_NS = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+PKG_REL_NS = 'http://schemas.openxmlformats.org/package/2006/relationships'
+XML_NS = 'http://www.w3.org/XML/1998/namespace'
+
+S = f'{{{SPREADSHEET_NS}}}'
+
+
+class UnsupportedFormula(Exception):
+    """Raised when a formula to recalculate needs something this engine cannot evaluate"""
+
+
+class ExcelError(str):
+    """An Excel error value such as #DIV/0! (distinct from plain strings)"""
+
+
+ERRORS = {e: ExcelError(e) for e in ['#NULL!', '#DIV/0!', '#VALUE!', '#REF!', '#NAME?', '#NUM!', '#N/A']}
+DIV0 = ERRORS['#DIV/0!']
+VALUE = ERRORS['#VALUE!']
+REF = ERRORS['#REF!']
+NUM = ERRORS['#NUM!']
+NA = ERRORS['#N/A']
+
+MAX_ROW = 1048576
+MAX_COL = 16384
+
+
+class _ErrorResult(Exception):
+    """Internal: propagates an error value out of a nested evaluation"""
+
+    def __init__(self, error):
+        super().__init__(error)
+        self.error = error
+
+
+def column_index(letters):
+    """Convert column letters to a 1-based index (A -> 1, AA -> 27)"""
+    index = 0
+    for ch in letters.upper():
+        index = index * 26 + (ord(ch) - 64)
+    return index
+
+
+def column_letter(index):
+    """Convert a 1-based column index to letters (1 -> A, 27 -> AA)"""
+    letters = ''
+    while index:
+        index, rem = divmod(index - 1, 26)
+        letters = chr(65 + rem) + letters
+    return letters
+
+
+_COORD_RE = re.compile(r'^\$?([A-Za-z]{1,3})\$?(\d+)$')
+
+
+def parse_coordinate(coordinate):
+    """Split an A1-style coordinate into (row, col)"""
+    match = _COORD_RE.match(coordinate)
+    if not match:
+        raise ValueError(f'Invalid cell coordinate: {coordinate}')
+    return int(match.group(2)), column_index(match.group(1))
+
+
+# --- Formula parsing -------------------------------------------------------
+
+_SHEET_PREFIX = r"(?:'(?:[^']|'')+'|[^\W\d][\w.]*)!"
+_CELL = r'\$?[A-Za-z]{1,3}\$?\d+'
+_TOKEN_RE = re.compile(rf'''
+    (?P<ws>\s+)
+  | (?P<str>"(?:[^"]|"")*")
+  | (?P<err>\#(?:NULL!|DIV/0!|VALUE!|REF!|NAME\?|NUM!|N/A))
+  | (?P<func>[A-Za-z_][\w.]*(?=\())
+  | (?P<ref>(?:{_SHEET_PREFIX})?(?:{_CELL}(?::{_CELL})?|\$?[A-Za-z]{{1,3}}:\$?[A-Za-z]{{1,3}}|\$?\d+:\$?\d+)(?![\w.(!]))
+  | (?P<num>(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)
+  | (?P<name>[A-Za-z_\\][\w.]*)
+  | (?P<op><>|<=|>=|[-+*/^&=<>%])
+  | (?P<lparen>\()
+  | (?P<rparen>\))
+  | (?P<comma>,)
+''', re.X)
+
+# Binary operator precedence (higher binds tighter); all are left-associative
+_BINARY_OPS = {
+    '=': 1, '<>': 1, '<': 1, '>': 1, '<=': 1, '>=': 1,
+    '&': 2,
+    '+': 3, '-': 3,
+    '*': 4, '/': 4,
+    '^': 5,
+}
+
+
+def tokenize(text):
+    """Split formula text (without the leading '=') into (kind, value) tokens"""
+    tokens = []
+    pos = 0
+    while pos < len(text):
+        match = _TOKEN_RE.match(text, pos)
+        if not match:
+            raise UnsupportedFormula(f'Cannot parse formula near {text[pos:pos + 20]!r}')
+        pos = match.end()
+        if match.lastgroup != 'ws':
+            tokens.append((match.lastgroup, match.group()))
+    return tokens
+
+
+def _split_sheet(ref):
+    """Split 'Sheet 1'!A1:B2 into ('Sheet 1', 'A1:B2'); sheet is None if absent"""
+    if '!' not in ref:
+        return None, ref
+    sheet, _, area = ref.rpartition('!')
+    if sheet.startswith("'"):
+        sheet = sheet[1:-1].replace("''", "'")
+    return sheet, area
+
+
+def _parse_endpoint(text):
+    """Parse one side of a reference into (row, col, row_abs, col_abs); row or col may be None"""
+    match = re.match(r'^(\$?)([A-Za-z]{1,3})?(\$?)(\d+)?$', text)
+    col_abs, letters, row_abs, digits = match.groups()
+    if letters is None:
+        # Whole-row endpoint like $3: the '$' is captured as col_abs
+        return int(digits), None, bool(col_abs), False
+    if digits is None:
+        return None, column_index(letters), False, bool(col_abs)
+    return int(digits), column_index(letters), bool(row_abs), bool(col_abs)
+
+
+def parse_reference(ref, default_sheet, sheet_names=None):
+    """Parse a reference token into a ('cell', ...) or ('area', ...) node
+
+    sheet_names maps casefolded sheet names to their spelling in the workbook
+    (sheet names are case-insensitive in formulas).
+    """
+    sheet, area = _split_sheet(ref)
+    if sheet is None:
+        sheet = default_sheet
+    elif sheet_names:
+        sheet = sheet_names.get(sheet.casefold(), sheet)
+    if ':' not in area:
+        row, col, row_abs, col_abs = _parse_endpoint(area)
+        return ('cell', sheet, row, col, row_abs, col_abs)
+    first, last = area.split(':')
+    r1, c1, r1_abs, c1_abs = _parse_endpoint(first)
+    r2, c2, r2_abs, c2_abs = _parse_endpoint(last)
+    if r1 is not None and r2 is not None:
+        r1, r2 = min(r1, r2), max(r1, r2)
+    if c1 is not None and c2 is not None:
+        c1, c2 = min(c1, c2), max(c1, c2)
+    return ('area', sheet, r1, c1, r2, c2, (r1_abs, c1_abs, r2_abs, c2_abs))
+
+
+class _Parser:
+    """Precedence-climbing parser producing a tuple-based AST"""
+
+    def __init__(self, text, sheet, names, sheet_names):
+        self.tokens = tokenize(text)
+        self.pos = 0
+        self.sheet = sheet
+        self.names = names
+        self.sheet_names = sheet_names
+
+    def parse(self):
+        node = self.expression(0)
+        if self.pos != len(self.tokens):
+            raise UnsupportedFormula(f'Unexpected token {self.tokens[self.pos][1]!r}')
+        return node
+
+    def peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else (None, None)
+
+    def take(self):
+        token = self.peek()
+        self.pos += 1
+        return token
+
+    def expression(self, min_prec):
+        left = self.unary()
+        while True:
+            kind, value = self.peek()
+            prec = _BINARY_OPS.get(value) if kind == 'op' else None
+            if prec is None or prec < min_prec:
+                return left
+            self.take()
+            left = ('bin', value, left, self.expression(prec + 1))
+
+    def unary(self):
+        kind, value = self.peek()
+        if kind == 'op' and value in '+-':
+            self.take()
+            operand = self.unary()
+            return ('neg', operand) if value == '-' else operand
+        node = self.primary()
+        while self.peek() == ('op', '%'):
+            self.take()
+            node = ('pct', node)
+        return node
+
+    def primary(self):
+        kind, value = self.take()
+        if kind == 'num':
+            return ('num', float(value))
+        if kind == 'str':
+            return ('str', value[1:-1].replace('""', '"'))
+        if kind == 'err':
+            return ('err', ERRORS[value])
+        if kind == 'ref':
+            return parse_reference(value, self.sheet, self.sheet_names)
+        if kind == 'name':
+            return self.name(value)
+        if kind == 'func':
+            return self.call(value.upper())
+        if kind == 'lparen':
+            node = self.expression(0)
+            if self.take()[0] != 'rparen':
+                raise UnsupportedFormula('Unbalanced parentheses')
+            return node
+        raise UnsupportedFormula(f'Unexpected token {value!r}')
+
+    def name(self, value):
+        upper = value.upper()
+        if upper in ('TRUE', 'FALSE'):
+            return ('bool', upper == 'TRUE')
+        target = self.names.get((self.sheet, upper)) or self.names.get((None, upper))
+        if target is None:
+            raise UnsupportedFormula(f'Unknown name {value}')
+        node = _Parser(target, self.sheet, {}, self.sheet_names).parse()
+        if node[0] not in ('cell', 'area'):
+            raise UnsupportedFormula(f'Defined name {value} is not a plain reference')
+        return node
+
+    def call(self, name):
+        self.take()  # '('
+        args = []
+        if self.peek()[0] == 'rparen':
+            self.take()
+            return ('call', name, tuple(args))
+        while True:
+            if self.peek()[0] in ('comma', 'rparen'):
+                args.append(('blank',))
+            else:
+                args.append(self.expression(0))
+            kind, _ = self.take()
+            if kind == 'rparen':
+                return ('call', name, tuple(args))
+            if kind != 'comma':
+                raise UnsupportedFormula(f'Malformed arguments to {name}')
+
+
+def parse_formula(text, sheet, names=None, sheet_names=None):
+    """Parse formula text (without '=') on `sheet` into an AST
+
+    names maps (scope_sheet_or_None, NAME) to defined-name formula text.
+    """
+    return _Parser(text, sheet, names or {}, sheet_names).parse()
+
+
+def shift_formula(node, d_row, d_col):
+    """Translate the relative references in an AST, as for a shared formula"""
+    kind = node[0]
+    if kind == 'cell':
+        _, sheet, row, col, row_abs, col_abs = node
+        row = row if row_abs else row + d_row
+        col = col if col_abs else col + d_col
+        if not (1 <= row <= MAX_ROW and 1 <= col <= MAX_COL):
+            return ('err', REF)
+        return ('cell', sheet, row, col, row_abs, col_abs)
+    if kind == 'area':
+        _, sheet, r1, c1, r2, c2, absolute = node
+        r1_abs, c1_abs, r2_abs, c2_abs = absolute
+        if r1 is not None:
+            r1 = r1 if r1_abs else r1 + d_row
+            r2 = r2 if r2_abs else r2 + d_row
+            if not (1 <= r1 <= MAX_ROW and 1 <= r2 <= MAX_ROW):
+                return ('err', REF)
+        if c1 is not None:
+            c1 = c1 if c1_abs else c1 + d_col
+            c2 = c2 if c2_abs else c2 + d_col
+            if not (1 <= c1 <= MAX_COL and 1 <= c2 <= MAX_COL):
+                return ('err', REF)
+        return ('area', sheet, r1, c1, r2, c2, absolute)
+    if kind == 'call':
+        return ('call', node[1], tuple(shift_formula(arg, d_row, d_col) for arg in node[2]))
+    if kind == 'bin':
+        return ('bin', node[1], shift_formula(node[2], d_row, d_col), shift_formula(node[3], d_row, d_col))
+    if kind in ('neg', 'pct'):
+        return (kind, shift_formula(node[1], d_row, d_col))
+    return node
+
+
+def iter_nodes(node):
+    """Yield every node of an AST"""
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        yield node
+        kind = node[0]
+        if kind == 'call':
+            stack.extend(node[2])
+        elif kind == 'bin':
+            stack.extend(node[2:])
+        elif kind in ('neg', 'pct', 'array'):
+            stack.append(node[1])
+
+
+# --- Values and coercion ---------------------------------------------------
+
+class Range:
+    """A rectangular block of cells, clipped to the sheet's used area"""
+
+    __slots__ = ('book', 'sheet', 'r1', 'c1', 'r2', 'c2')
+
+    def __init__(self, book, sheet, r1, c1, r2, c2):
+        self.book = book
+        self.sheet = sheet
+        self.r1, self.c1, self.r2, self.c2 = r1, c1, r2, c2
+
+    @property
+    def height(self):
+        return max(0, self.r2 - self.r1 + 1)
+
+    @property
+    def width(self):
+        return max(0, self.c2 - self.c1 + 1)
+
+    def cell(self, i, j):
+        """Value at 0-based offset (i, j) within the range"""
+        return self.book.value(self.sheet, self.r1 + i, self.c1 + j)
+
+    def values(self):
+        """All values, row by row"""
+        for row in range(self.r1, self.r2 + 1):
+            for col in range(self.c1, self.c2 + 1):
+                yield self.book.value(self.sheet, row, col)
+
+    def vector(self):
+        """Values of a single-row or single-column range, in order"""
+        if self.height != 1 and self.width != 1:
+            raise _ErrorResult(NA)
+        return list(self.values())
+
+
+def _raise_error(value):
+    if isinstance(value, ExcelError):
+        raise _ErrorResult(value)
+    return value
+
+
+def to_scalar(value):
+    """Dereference a single-cell range
+
+    A multi-cell range in a scalar context needs implicit intersection (or
+    dynamic-array spilling), which is left to LibreOffice.
+    """
+    if isinstance(value, Range):
+        if value.height == 1 and value.width == 1:
+            return value.cell(0, 0)
+        raise UnsupportedFormula('Range used where a single value is expected')
+    return value
+
+
+def to_number(value):
+    value = _raise_error(to_scalar(value))
+    if value is None:
+        return 0.0
+    if isinstance(value, bool):
+        return 1.0 if value else 0.0
+    if isinstance(value, float):
+        return value
+    try:
+        return float(value.strip())
+    except ValueError:
+        raise _ErrorResult(VALUE)
+
+
+def to_text(value):
+    value = _raise_error(to_scalar(value))
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 'TRUE' if value else 'FALSE'
+    if isinstance(value, float):
+        return format_number(value)
+    return value
+
+
+def to_bool(value):
+    value = _raise_error(to_scalar(value))
+    if value is None:
+        return False
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, float):
+        return value != 0
+    upper = value.strip().upper()
+    if upper in ('TRUE', 'FALSE'):
+        return upper == 'TRUE'
+    raise _ErrorResult(VALUE)
+
+
+def format_number(value):
+    """Render a number the way Excel shows it in General format"""
+    if value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return ('%.15g' % value).upper()
+
+
+def _type_rank(value):
+    if isinstance(value, bool):
+        return 2
+    if isinstance(value, str):
+        return 1
+    return 0
+
+
+def compare(a, b):
+    """Excel ordering: numbers < text < booleans; text compares case-insensitively"""
+    a = _raise_error(to_scalar(a))
+    b = _raise_error(to_scalar(b))
+    if a is None:
+        a = '' if isinstance(b, str) else (False if isinstance(b, bool) else 0.0)
+    if b is None:
+        b = '' if isinstance(a, str) else (False if isinstance(a, bool) else 0.0)
+    rank_a, rank_b = _type_rank(a), _type_rank(b)
+    if rank_a != rank_b:
+        return -1 if rank_a < rank_b else 1
+    if rank_a == 1:
+        a, b = a.casefold(), b.casefold()
+    return (a > b) - (a < b)
+
+
+def _numbers(args):
+    """Numeric values of function arguments: ranges contribute only their numbers"""
+    for arg in args:
+        if isinstance(arg, Range):
+            for value in arg.values():
+                _raise_error(value)
+                if isinstance(value, float):
+                    yield value
+        elif arg is not None:
+            yield to_number(arg)
+
+
+def _wildcard_matcher(pattern):
+    """Case-insensitive matcher honouring Excel's * ? and ~ wildcards"""
+    if not isinstance(pattern, str) or not any(ch in pattern for ch in '*?'):
+        return lambda value: compare(value, pattern) == 0 if value is not None else False
+    regex = ''
+    chars = iter(pattern)
+    for ch in chars:
+        if ch == '~':
+            regex += re.escape(next(chars, '~'))
+        elif ch == '*':
+            regex += '.*'
+        elif ch == '?':
+            regex += '.'
+        else:
+            regex += re.escape(ch)
+    compiled = re.compile(regex, re.I | re.S)
+    return lambda value: isinstance(value, str) and compiled.fullmatch(value) is not None
+
+
+def _exact_position(lookup, values):
+    matches = _wildcard_matcher(lookup)
+    for i, value in enumerate(values):
+        if not isinstance(value, ExcelError) and matches(value):
+            return i
+    raise _ErrorResult(NA)
+
+
+def _approximate_position(lookup, values, descending=False):
+    """Last position whose value is <= lookup (>= when descending), among same-type values"""
+    found = None
+    for i, value in enumerate(values):
+        if value is None or isinstance(value, ExcelError) or _type_rank(value) != _type_rank(lookup):
+            continue
+        order = compare(value, lookup)
+        if (order >= 0) if descending else (order <= 0):
+            found = i
+        else:
+            break
+    if found is None:
+        raise _ErrorResult(NA)
+    return found
+
+
+# --- Functions -------------------------------------------------------------
+
+def fn_sum(*args):
+    return math.fsum(_numbers(args))
+
+
+def fn_average(*args):
+    values = list(_numbers(args))
+    if not values:
+        return DIV0
+    return math.fsum(values) / len(values)
+
+
+def fn_min(*args):
+    return min(_numbers(args), default=0.0)
+
+
+def fn_max(*args):
+    return max(_numbers(args), default=0.0)
+
+
+def fn_count(*args):
+    count = 0
+    for arg in args:
+        if isinstance(arg, Range):
+            count += sum(1 for v in arg.values() if isinstance(v, float))
+        else:
+            try:
+                to_number(arg)
+                count += 1
+            except _ErrorResult:
+                pass
+    return float(count)
+
+
+def fn_counta(*args):
+    count = 0
+    for arg in args:
+        if isinstance(arg, Range):
+            count += sum(1 for v in arg.values() if v is not None)
+        elif arg is not None:
+            count += 1
+    return float(count)
+
+
+def fn_and(*args):
+    return all(_logicals(args, 'AND'))
+
+
+def fn_or(*args):
+    return any(_logicals(args, 'OR'))
+
+
+def _logicals(args, name):
+    values = []
+    for arg in args:
+        if isinstance(arg, Range):
+            for value in arg.values():
+                _raise_error(value)
+                if isinstance(value, (bool, float)):
+                    values.append(bool(value))
+        elif arg is not None:
+            values.append(to_bool(arg))
+    if not values:
+        raise _ErrorResult(VALUE)
+    return values
+
+
+def fn_not(value):
+    return not to_bool(value)
+
+
+def fn_abs(value):
+    return abs(to_number(value))
+
+
+def fn_round(value, digits):
+    value = to_number(value)
+    digits = int(to_number(digits))
+    if digits > 15:
+        return value  # Beyond double precision: nothing to round
+    quantum = Decimal(1).scaleb(-digits)
+    return float(Decimal(repr(value)).quantize(quantum, rounding=ROUND_HALF_UP))
+
+
+def fn_concatenate(*args):
+    return ''.join(to_text(arg) for arg in args)
+
+
+def fn_vlookup(lookup, table, col_index, approximate=True):
+    lookup = _raise_error(to_scalar(lookup))
+    if not isinstance(table, Range):
+        return VALUE
+    col = int(to_number(col_index))
+    if col < 1:
+        return VALUE
+    if col > table.width:
+        return REF
+    first_column = [table.cell(i, 0) for i in range(table.height)]
+    if approximate is None or to_bool(approximate):
+        row = _approximate_position(lookup, first_column)
+    else:
+        row = _exact_position(lookup, first_column)
+    return table.cell(row, col - 1)
+
+
+def fn_match(lookup, array, match_type=1.0):
+    lookup = _raise_error(to_scalar(lookup))
+    if not isinstance(array, Range):
+        return NA
+    values = array.vector()
+    match_type = to_number(match_type) if match_type is not None else 1.0
+    if match_type == 0:
+        return float(_exact_position(lookup, values) + 1)
+    return float(_approximate_position(lookup, values, descending=match_type < 0) + 1)
+
+
+def fn_index(array, row_num, col_num=None):
+    if not isinstance(array, Range):
+        return VALUE
+    row = int(to_number(row_num))
+    col = int(to_number(col_num)) if col_num is not None else None
+    if col is None:
+        if array.height == 1:
+            row, col = 1, row
+        else:
+            col = 1 if array.width == 1 else 0
+    if row < 0 or col < 0 or row > array.height or col > array.width:
+        return REF
+    r1, r2 = (array.r1, array.r2) if row == 0 else (array.r1 + row - 1,) * 2
+    c1, c2 = (array.c1, array.c2) if col == 0 else (array.c1 + col - 1,) * 2
+    return Range(array.book, array.sheet, r1, c1, r2, c2)
+
+
+FUNCTIONS = {
+    'SUM': fn_sum,
+    'AVERAGE': fn_average,
+    'MIN': fn_min,
+    'MAX': fn_max,
+    'COUNT': fn_count,
+    'COUNTA': fn_counta,
+    'AND': fn_and,
+    'OR': fn_or,
+    'NOT': fn_not,
+    'ABS': fn_abs,
+    'ROUND': fn_round,
+    'CONCATENATE': fn_concatenate,
+    'VLOOKUP': fn_vlookup,
+    'MATCH': fn_match,
+    'INDEX': fn_index,
+}
+LAZY_FUNCTIONS = {'IF', 'IFERROR'}
+
+
+def _arithmetic(op, a, b):
+    x, y = to_number(a), to_number(b)
+    if op == '+':
+        return x + y
+    if op == '-':
+        return x - y
+    if op == '*':
+        return x * y
+    if op == '/':
+        if y == 0:
+            return DIV0
+        return x / y
+    # '^'
+    if x == 0 and y < 0:
+        return DIV0
+    try:
+        result = x ** y
+    except OverflowError:
+        return NUM
+    if isinstance(result, complex):
+        return NUM
+    return result
+
+
+def _finite(value):
+    if isinstance(value, float) and (math.isnan(value) or math.isinf(value)):
+        return NUM
+    return value
+
+
+_COMPARISONS = {
+    '=': lambda c: c == 0,
+    '<>': lambda c: c != 0,
+    '<': lambda c: c < 0,
+    '>': lambda c: c > 0,
+    '<=': lambda c: c <= 0,
+    '>=': lambda c: c >= 0,
+}
+
+
+# --- Workbook --------------------------------------------------------------
+
+class _Sheet:
+    __slots__ = ('name', 'part', 'max_row', 'max_col')
+
+    def __init__(self, name, part):
+        self.name = name
+        self.part = part
+        self.max_row = 0
+        self.max_col = 0
+
+
+class FormulaWorkbook:
+    """
+    Formula cells and values of an xlsx file, with an incremental evaluator
+
+    Cells are keyed by (sheet_name, row, col). `values` holds cached/input
+    values (float, str, bool, ExcelError, or None for formula cells without a
+    cached value); `formulas` holds the parsed AST of every formula cell.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.sheets = {}
+        self.values = {}
+        self.formulas = {}
+        self.unparsed = {}  # key -> reason, for formulas outside the supported grammar
+        self.changed = set()  # input cells changed through set_value()
+        self.computed = {}  # key -> value from the last recalculate()
+        self._dependents = None
+        self._sheet_names = {}  # casefolded name -> name
+        with zipfile.ZipFile(self.path) as zf:
+            shared_strings = self._read_shared_strings(zf)
+            names = self._read_workbook(zf)
+            for sheet in self.sheets.values():
+                with zf.open(sheet.part) as stream:
+                    self._read_sheet(sheet, stream, shared_strings, names)
+
+    # Loading
+
+    def _read_workbook(self, zf):
+        with zf.open('xl/_rels/workbook.xml.rels') as f:
+            rels = {rel.get('Id'): rel for rel in ET.parse(f).getroot().iter(f'{{{PKG_REL_NS}}}Relationship')}
+        with zf.open('xl/workbook.xml') as f:
+            root = ET.parse(f).getroot()
+
+        sheet_names = []
+        for sheet in root.iter(f'{S}sheet'):
+            name = sheet.get('name')
+            sheet_names.append(name)
+            self._sheet_names[name.casefold()] = name
+            rel = rels.get(sheet.get(f'{{{REL_NS}}}id'))
+            if rel is None or not rel.get('Type', '').endswith('/worksheet'):
+                continue
+            target = rel.get('Target')
+            part = target.lstrip('/') if target.startswith('/') else f'xl/{target}'
+            self.sheets[name] = _Sheet(name, part)
+
+        names = {}
+        for defined in root.iter(f'{S}definedName'):
+            local = defined.get('localSheetId')
+            scope = sheet_names[int(local)] if local is not None else None
+            names[(scope, defined.get('name').upper())] = (defined.text or '').strip()
+        return names
+
+    @staticmethod
+    def _read_shared_strings(zf):
+        try:
+            stream = zf.open('xl/sharedStrings.xml')
+        except KeyError:
+            return []
+        strings = []
+        with stream:
+            for _, elem in ET.iterparse(stream):
+                if elem.tag == f'{S}si':
+                    # Plain <t>, or rich text runs <r><t>; phonetic <rPh> text is skipped
+                    texts = [elem.find(f'{S}t')] + [r.find(f'{S}t') for r in elem.findall(f'{S}r')]
+                    strings.append(''.join(t.text or '' for t in texts if t is not None))
+                    elem.clear()
+        return strings
+
+    def _read_sheet(self, sheet, stream, shared_strings, names):
+        shared_masters = {}
+        shared_children = []
+        row_idx = 0
+        col_idx = 0
+        for event, elem in ET.iterparse(stream, events=('start', 'end')):
+            if event == 'start':
+                if elem.tag == f'{S}row':
+                    row_idx = int(elem.get('r', row_idx + 1))
+                    col_idx = 0
+                continue
+            if elem.tag == f'{S}row':
+                elem.clear()
+                continue
+            if elem.tag != f'{S}c':
+                continue
+
+            coordinate = elem.get('r')
+            if coordinate:
+                row_idx, col_idx = parse_coordinate(coordinate)
+            else:
+                col_idx += 1
+            key = (sheet.name, row_idx, col_idx)
+            sheet.max_row = max(sheet.max_row, row_idx)
+            sheet.max_col = max(sheet.max_col, col_idx)
+
+            self.values[key] = self._cell_value(elem, shared_strings)
+            f = elem.find(f'{S}f')
+            if f is not None:
+                kind = f.get('t', 'normal')
+                if kind == 'shared' and not (f.text or '').strip():
+                    shared_children.append((key, f.get('si')))
+                elif kind in ('normal', 'shared', 'array'):
+                    try:
+                        formula = parse_formula(f.text or '', sheet.name, names, self._sheet_names)
+                    except UnsupportedFormula as e:
+                        self.unparsed[key] = str(e)
+                    else:
+                        # Array formulas are graphed (their precedents are known) but not evaluated
+                        self.formulas[key] = ('array', formula) if kind == 'array' else formula
+                    if kind == 'shared':
+                        shared_masters[f.get('si')] = key
+                else:
+                    self.unparsed[key] = f'{kind} formulas are not supported'
+            elem.clear()
+
+        for key, si in shared_children:
+            master = shared_masters.get(si)
+            if master is None or master in self.unparsed:
+                self.unparsed[key] = f'shared formula {si} is not supported'
+                continue
+            self.formulas[key] = shift_formula(self.formulas[master], key[1] - master[1], key[2] - master[2])
+
+    @staticmethod
+    def _cell_value(elem, shared_strings):
+        cell_type = elem.get('t', 'n')
+        if cell_type == 'inlineStr':
+            inline = elem.find(f'{S}is')
+            return ''.join(t.text or '' for t in inline.iter(f'{S}t')) if inline is not None else ''
+        v = elem.find(f'{S}v')
+        if v is None or v.text is None:
+            return None
+        text = v.text
+        if cell_type == 's':
+            return shared_strings[int(text)]
+        if cell_type == 'str':
+            return text
+        if cell_type == 'b':
+            return text.strip() == '1'
+        if cell_type == 'e':
+            return ERRORS.get(text, ExcelError(text))
+        if cell_type == 'n':
+            return float(text)
+        return None  # ISO dates (t="d") are treated as missing, forcing recalculation
+
+    # Dependency graph
+
+    def _build_dependents(self):
+        """Index formula cells by the cells and ranges they read"""
+        cell_index = defaultdict(set)
+        range_index = defaultdict(list)  # (sheet, col) -> [(r1, r2, dependent)]
+        for key, formula in self.formulas.items():
+            for node in iter_nodes(formula):
+                if node[0] == 'cell':
+                    cell_index[(node[1], node[2], node[3])].add(key)
+                elif node[0] == 'area':
+                    _, sheet, r1, c1, r2, c2, _ = node
+                    if sheet not in self.sheets:
+                        continue
+                    if r1 is None:
+                        r1, r2 = 1, MAX_ROW
+                    if c1 is None:
+                        c1, c2 = 1, MAX_COL
+                    for col in range(c1, min(c2, max(self.sheets[sheet].max_col, c1)) + 1):
+                        range_index[(sheet, col)].append((r1, r2, key))
+        self._dependents = (cell_index, range_index)
+
+    def dependents(self, key):
+        """Formula cells that read `key` directly"""
+        if self._dependents is None:
+            self._build_dependents()
+        cell_index, range_index = self._dependents
+        sheet, row, col = key
+        result = set(cell_index.get(key, ()))
+        for r1, r2, dependent in range_index.get((sheet, col), ()):
+            if r1 <= row <= r2:
+                result.add(dependent)
+        return result
+
+    def dirty_cone(self, seeds=None):
+        """
+        Return (order, cone): formula cells to evaluate in dependency order
+
+        Seeds default to the formula cells without a cached value plus the
+        inputs changed through set_value(). Raises UnsupportedFormula for
+        circular references within the cone.
+        """
+        if seeds is None:
+            seeds = set(self.changed)
+            seeds.update(key for key in self.formulas if self.values.get(key) is None)
+            seeds.update(key for key in self.unparsed if self.values.get(key) is None)
+        cone = set(seeds)
+        edges = defaultdict(set)
+        queue = deque(seeds)
+        while queue:
+            key = queue.popleft()
+            for dependent in self.dependents(key):
+                edges[key].add(dependent)
+                if dependent not in cone:
+                    cone.add(dependent)
+                    queue.append(dependent)
+
+        if cone and self.unparsed:
+            # An unparsed formula's precedents are unknown, so it may be stale too
+            key, reason = next(iter(self.unparsed.items()))
+            raise UnsupportedFormula(f'{key[0]}!{column_letter(key[2])}{key[1]}: {reason}')
+
+        formulas = {key for key in cone if key in self.formulas}
+        indegree = dict.fromkeys(formulas, 0)
+        for key, targets in edges.items():
+            if key not in formulas:
+                continue
+            for target in targets:
+                if target != key:
+                    indegree[target] += 1
+                else:
+                    raise UnsupportedFormula(f'Circular reference at {key[0]}!{column_letter(key[2])}{key[1]}')
+        ready = deque(key for key, degree in indegree.items() if degree == 0)
+        order = []
+        while ready:
+            key = ready.popleft()
+            order.append(key)
+            for target in edges.get(key, ()):
+                if target in indegree:
+                    indegree[target] -= 1
+                    if indegree[target] == 0:
+                        ready.append(target)
+        if len(order) != len(formulas):
+            raise UnsupportedFormula('Circular reference in the dirty cone')
+        return order, cone
+
+    # Evaluation
+
+    def value(self, sheet, row, col):
+        key = (sheet, row, col)
+        if key in self.computed:
+            return self.computed[key]
+        return self.values.get(key)
+
+    def set_value(self, sheet, coordinate, value):
+        """Change an input cell; int/float, str, bool or None (blank)"""
+        if sheet not in self.sheets:
+            raise KeyError(f'No worksheet named {sheet!r}')
+        row, col = parse_coordinate(coordinate)
+        key = (sheet, row, col)
+        if key in self.formulas or key in self.unparsed:
+            raise ValueError(f'{sheet}!{coordinate} contains a formula')
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            value = float(value)
+        self.values[key] = value
+        self.changed.add(key)
+        self.sheets[sheet].max_row = max(self.sheets[sheet].max_row, row)
+        self.sheets[sheet].max_col = max(self.sheets[sheet].max_col, col)
+        self._dependents = None
+
+    def recalculate(self, full=False):
+        """
+        Evaluate the dirty cone; returns the number of formula cells recomputed
+
+        With full=True every formula cell is evaluated, for workbooks whose
+        inputs may have changed without going through set_value().
+        """
+        seeds = set(self.formulas) | set(self.unparsed) if full else None
+        order, _ = self.dirty_cone(seeds)
+        for key in order:
+            self.computed[key] = self.evaluate_cell(key)
+        return len(order)
+
+    def evaluate_cell(self, key):
+        try:
+            result = self.evaluate(self.formulas[key])
+            if isinstance(result, Range):
+                if result.height != 1 or result.width != 1:
+                    raise UnsupportedFormula(f'{key[0]}!{column_letter(key[2])}{key[1]} returns a range')
+                result = result.cell(0, 0)
+        except _ErrorResult as e:
+            return e.error
+        if result is None:
+            return 0.0
+        return _finite(result)
+
+    def evaluate(self, node):
+        kind = node[0]
+        if kind in ('num', 'str', 'bool', 'err'):
+            return node[1]
+        if kind == 'blank':
+            return None
+        if kind == 'cell':
+            if node[1] not in self.sheets:
+                raise UnsupportedFormula(f'Reference to unknown sheet {node[1]!r}')
+            return self.value(node[1], node[2], node[3])
+        if kind == 'area':
+            return self._range(node)
+        if kind == 'neg':
+            return -to_number(self.evaluate(node[1]))
+        if kind == 'pct':
+            return to_number(self.evaluate(node[1])) / 100
+        if kind == 'bin':
+            op = node[1]
+            a = self.evaluate(node[2])
+            b = self.evaluate(node[3])
+            if op == '&':
+                return to_text(a) + to_text(b)
+            if op in _COMPARISONS:
+                return _COMPARISONS[op](compare(a, b))
+            return _finite(_arithmetic(op, a, b))
+        if kind == 'call':
+            return self._call(node[1], node[2])
+        raise UnsupportedFormula(f'{kind} formulas are not supported')
+
+    def _range(self, node):
+        _, sheet, r1, c1, r2, c2, _ = node
+        info = self.sheets.get(sheet)
+        if info is None:
+            raise UnsupportedFormula(f'Reference to unknown sheet {sheet!r}')
+        if r1 is None:
+            r1, r2 = 1, info.max_row
+        if c1 is None:
+            c1, c2 = 1, info.max_col
+        return Range(self, sheet, r1, c1, r2, c2)
+
+    def _call(self, name, args):
+        if name == 'IF':
+            if not 1 <= len(args) <= 3:
+                raise UnsupportedFormula('IF takes 1 to 3 arguments')
+            if to_bool(self.evaluate(args[0])):
+                return self.evaluate(args[1]) if len(args) > 1 else True
+            return self.evaluate(args[2]) if len(args) > 2 else False
+        if name == 'IFERROR':
+            if len(args) != 2:
+                raise UnsupportedFormula('IFERROR takes 2 arguments')
+            try:
+                result = _raise_error(to_scalar(self.evaluate(args[0])))
+            except _ErrorResult:
+                return self.evaluate(args[1])
+            return result
+        function = FUNCTIONS.get(name)
+        if function is None:
+            raise UnsupportedFormula(f'Unsupported function {name}')
+        values = [self.evaluate(arg) for arg in args]
+        try:
+            return function(*values)
+        except TypeError:
+            raise UnsupportedFormula(f'Wrong number of arguments to {name}')
+
+    # Saving
+
+    def save(self, path=None):
+        """Write computed values (and changed inputs) back; other parts are copied verbatim"""
+        path = Path(path or self.path)
+        updates = defaultdict(dict)
+        for key, value in self.computed.items():
+            updates[key[0]][(key[1], key[2])] = value
+        for key in self.changed:
+            updates[key[0]][(key[1], key[2])] = self.values[key]
+
+        parts = {self.sheets[name].part: cells for name, cells in updates.items()}
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.xlsx.tmp')
+        os.close(fd)
+        try:
+            with zipfile.ZipFile(self.path) as src, zipfile.ZipFile(tmp_path, 'w', zipfile.ZIP_DEFLATED) as dst:
+                for item in src.infolist():
+                    data = src.read(item.filename)
+                    if item.filename in parts:
+                        data = _write_sheet_values(data, parts[item.filename])
+                    dst.writestr(item, data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        self.path = path
+        for key, value in self.computed.items():
+            self.values[key] = value
+        self.computed = {}
+        self.changed = set()
+
+
+def _write_sheet_values(data, cells):
+    """Set <v>/t on the given (row, col) cells of a worksheet part, creating cells if needed"""
+    doc = minidom.parseString(data)
+    sheet_data = doc.getElementsByTagNameNS(SPREADSHEET_NS, 'sheetData')[0]
+    prefix = sheet_data.prefix + ':' if sheet_data.prefix else ''
+    pending = dict(cells)
+
+    rows = {}
+    row_idx = 0
+    for row in [n for n in sheet_data.childNodes if n.nodeType == n.ELEMENT_NODE]:
+        row_idx = int(row.getAttribute('r') or row_idx + 1)
+        rows[row_idx] = row
+        col_idx = 0
+        for cell in [n for n in row.childNodes if n.nodeType == n.ELEMENT_NODE and n.localName == 'c']:
+            if cell.getAttribute('r'):
+                _, col_idx = parse_coordinate(cell.getAttribute('r'))
+            else:
+                col_idx += 1
+            if (row_idx, col_idx) in pending:
+                _set_cell_value(doc, cell, pending.pop((row_idx, col_idx)), prefix)
+
+    # Input cells that did not exist yet
+    for (row_idx, col_idx), value in sorted(pending.items()):
+        row = rows.get(row_idx)
+        if row is None:
+            row = doc.createElementNS(SPREADSHEET_NS, prefix + 'row')
+            row.setAttribute('r', str(row_idx))
+            following = [r for i, r in rows.items() if i > row_idx]
+            sheet_data.insertBefore(row, min(following, key=lambda r: int(r.getAttribute('r'))) if following else None)
+            rows[row_idx] = row
+        cell = doc.createElementNS(SPREADSHEET_NS, prefix + 'c')
+        cell.setAttribute('r', f'{column_letter(col_idx)}{row_idx}')
+        following = [
+            c for c in row.childNodes
+            if c.nodeType == c.ELEMENT_NODE and c.getAttribute('r')
+            and parse_coordinate(c.getAttribute('r'))[1] > col_idx
+        ]
+        row.insertBefore(cell, following[0] if following else None)
+        _set_cell_value(doc, cell, value, prefix)
+
+    return doc.toxml(encoding='UTF-8')
+
+
+def _set_cell_value(doc, cell, value, prefix):
+    for child in list(cell.childNodes):
+        if child.nodeType == child.ELEMENT_NODE and child.localName in ('v', 'is'):
+            cell.removeChild(child)
+
+    if value is None:
+        if cell.hasAttribute('t'):
+            cell.removeAttribute('t')
+        return
+
+    is_formula = any(c.nodeType == c.ELEMENT_NODE and c.localName == 'f' for c in cell.childNodes)
+    if isinstance(value, ExcelError):
+        cell_type, text = 'e', str(value)
+    elif isinstance(value, bool):
+        cell_type, text = 'b', '1' if value else '0'
+    elif isinstance(value, float):
+        cell_type, text = None, str(int(value)) if value.is_integer() and abs(value) < 1e15 else repr(value)
+    elif is_formula:
+        cell_type, text = 'str', value
+    else:
+        # Plain text input: inline string, so sharedStrings.xml stays untouched
+        cell.setAttribute('t', 'inlineStr')
+        inline = doc.createElementNS(SPREADSHEET_NS, prefix + 'is')
+        t = doc.createElementNS(SPREADSHEET_NS, prefix + 't')
+        t.setAttributeNS(XML_NS, 'xml:space', 'preserve')
+        t.appendChild(doc.createTextNode(value))
+        inline.appendChild(t)
+        cell.appendChild(inline)
+        return
+
+    if cell_type:
+        cell.setAttribute('t', cell_type)
+    elif cell.hasAttribute('t'):
+        cell.removeAttribute('t')
+    v = doc.createElementNS(SPREADSHEET_NS, prefix + 'v')
+    v.appendChild(doc.createTextNode(text))
+    # CT_Cell order is f, v, is, extLst: place <v> straight after <f>
+    following = [c for c in cell.childNodes if c.nodeType == c.ELEMENT_NODE and c.localName == 'extLst']
+    cell.insertBefore(v, following[0] if following else None)
+
+
+def recalculate_file(filename, output=None):
+    """
+    Recalculate every formula of a workbook in pure Python and save it
+
+    All formulas are evaluated, since cached values may be stale from inputs
+    edited after they were computed. Raises UnsupportedFormula (without
+    modifying the file) when a formula needs a function or construct the
+    engine does not evaluate.
+
+    Returns:
+        dict with the number of formulas in the workbook and cells recomputed
+    """
+    book = FormulaWorkbook(filename)
+    recomputed = book.recalculate(full=True)
+    if recomputed or output:
+        book.save(output)
+    return {'total_formulas': len(book.formulas), 'recalculated': recomputed}
+
+
+def main():
+    if len(sys.argv) < 2:
+        print('Usage: python formula_engine.py <excel_file> [output_file]')
+        print('\nRecalculates all formulas in pure Python')
+        print('Exits with status 2 if the workbook needs LibreOffice (use recalc.py)')
+        sys.exit(1)
+
+    try:
+        result = recalculate_file(sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else None)
+    except UnsupportedFormula as e:
+        print(json.dumps({'status': 'unsupported', 'reason': str(e)}, indent=2))
+        sys.exit(2)
+    print(json.dumps({'status': 'success', **result}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
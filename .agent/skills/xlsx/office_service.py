@@ -0,0 +1,553 @@
+#!/usr/bin/env python3
+"""
+Shared pool of warm headless LibreOffice instances.
+
+Starting soffice dominates the cost of converting, recalculating or validating a
+single document. This module keeps several LibreOffice processes running, each
+with its own user profile so they can work in parallel, and runs jobs on them
+over UNO with timeouts, queueing and automatic restart of crashed instances.
+
+In-process pool (library use):
+    with OfficePool(instances=4) as pool:
+        pool.convert("deck.pptx", "deck.pdf")
+        pool.recalc("model.xlsx")
+
+Shared daemon (across processes and tools):
+    python office_service.py serve --instances 4 [--state-dir DIR]
+    export OFFICE_SERVICE_DIR=DIR
+    # thumbnail.py, pack.py and recalc.py now run their jobs on the daemon
+
+    python office_service.py status
+    python office_service.py convert deck.pptx deck.pdf
+
+Requires LibreOffice's Python-UNO bridge (`import uno`). When it is missing,
+shared_service() returns None and callers fall back to one-shot soffice runs.
+
+This file is kept identical in pptx/ooxml/scripts, docx/ooxml/scripts and xlsx.
+"""
+
+import abc
+import argparse
+import hashlib
+import json
+import os
+import queue
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows: only the in-process pool is available
+    fcntl = None
+
+DEFAULT_STATE_DIR = Path(tempfile.gettempdir()) / "office-service"
+STATE_FILE = "service.json"
+STARTUP_TIMEOUT = 60  # Seconds to wait for a new instance to accept connections
+DEFAULT_TIMEOUT = 120  # Seconds per job before the instance is killed
+
+PDF_FILTERS = {
+    ".doc": "writer_pdf_Export",
+    ".docx": "writer_pdf_Export",
+    ".odt": "writer_pdf_Export",
+    ".ppt": "impress_pdf_Export",
+    ".pptx": "impress_pdf_Export",
+    ".odp": "impress_pdf_Export",
+    ".xls": "calc_pdf_Export",
+    ".xlsx": "calc_pdf_Export",
+    ".ods": "calc_pdf_Export",
+}
+HTML_FILTERS = {
+    ".docx": "HTML",
+    ".pptx": "impress_html_Export",
+    ".xlsx": "HTML (StarCalc)",
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Run or use a pool of warm headless LibreOffice instances."
+    )
+    parser.add_argument(
+        "--state-dir",
+        default=os.environ.get("OFFICE_SERVICE_DIR", str(DEFAULT_STATE_DIR)),
+        help=f"Directory for profiles, locks and state (default: $OFFICE_SERVICE_DIR or {DEFAULT_STATE_DIR})",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = subparsers.add_parser("serve", help="Start and supervise instances")
+    serve_parser.add_argument(
+        "--instances", type=int, default=2, help="Number of LibreOffice instances"
+    )
+    subparsers.add_parser("status", help="Show running instances")
+    convert_parser = subparsers.add_parser("convert", help="Convert a document")
+    convert_parser.add_argument("source")
+    convert_parser.add_argument("dest")
+    convert_parser.add_argument("--filter", help="LibreOffice export filter name")
+    recalc_parser = subparsers.add_parser("recalc", help="Recalculate and save a workbook")
+    recalc_parser.add_argument("file")
+    validate_parser = subparsers.add_parser("validate", help="Check a document opens")
+    validate_parser.add_argument("file")
+
+    args = parser.parse_args()
+    state_dir = Path(args.state_dir)
+
+    try:
+        if args.command == "serve":
+            serve(state_dir, args.instances)
+        elif args.command == "status":
+            print(json.dumps(read_state(state_dir), indent=2))
+        else:
+            client = OfficeClient(state_dir)
+            if args.command == "convert":
+                print(client.convert(args.source, args.dest, args.filter))
+            elif args.command == "recalc":
+                client.recalc(args.file)
+                print(f"Recalculated {args.file}")
+            elif args.command == "validate":
+                valid = client.validate(args.file)
+                print("valid" if valid else "invalid")
+                sys.exit(0 if valid else 1)
+    except OfficeError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+class OfficeError(RuntimeError):
+    """Raised when a LibreOffice instance or job fails or times out."""
+
+
+def _import_uno():
+    try:
+        import uno  # noqa: F401
+
+        return uno
+    except ImportError:
+        return None
+
+
+def _require_uno():
+    uno = _import_uno()
+    if uno is None:
+        raise OfficeError("LibreOffice Python-UNO bridge (uno) is not available")
+    return uno
+
+
+def _props(**kwargs):
+    """Build a tuple of UNO PropertyValues from keyword arguments."""
+    _require_uno()
+    from com.sun.star.beans import PropertyValue
+
+    props = []
+    for name, value in kwargs.items():
+        prop = PropertyValue()
+        prop.Name = name
+        prop.Value = value
+        props.append(prop)
+    return tuple(props)
+
+
+def _pipe_name(profile_dir):
+    """Pipe name for the instance using `profile_dir`.
+
+    Derived from the resolved profile path, so instances of different services
+    or pools on one host never bind or connect to each other's pipes.
+    """
+    digest = hashlib.sha1(str(Path(profile_dir).resolve()).encode()).hexdigest()
+    return f"office-{digest[:16]}"
+
+
+class OfficeInstance:
+    """One soffice process with its own user profile, reachable over a named pipe."""
+
+    def __init__(self, name, profile_dir, pid=None):
+        self.name = name
+        self.profile_dir = Path(profile_dir)
+        self.pid = pid
+        self.process = None
+        self._desktop = None
+
+    def start(self, timeout=STARTUP_TIMEOUT):
+        """Launch soffice and wait until it accepts UNO connections."""
+        self.profile_dir.mkdir(parents=True, exist_ok=True)
+        self.process = subprocess.Popen(
+            [
+                "soffice",
+                "--headless",
+                "--invisible",
+                "--nologo",
+                "--norestore",
+                "--nodefault",
+                "--nolockcheck",
+                f"-env:UserInstallation={self.profile_dir.resolve().as_uri()}",
+                f"--accept=pipe,name={self.name};urp;StarOffice.ComponentContext",
+            ],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        self.pid = self.process.pid
+        self.connect(timeout)
+
+    def connect(self, timeout=STARTUP_TIMEOUT):
+        """Connect to the instance's pipe, retrying while it starts up."""
+        uno = _require_uno()
+        local = uno.getComponentContext()
+        resolver = local.ServiceManager.createInstanceWithContext(
+            "com.sun.star.bridge.UnoUrlResolver", local
+        )
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                ctx = resolver.resolve(
+                    f"uno:pipe,name={self.name};urp;StarOffice.ComponentContext"
+                )
+                break
+            except Exception:
+                if self.process is not None and self.process.poll() is not None:
+                    raise OfficeError(f"soffice instance {self.name} exited during startup")
+                if time.monotonic() > deadline:
+                    raise OfficeError(f"Timed out connecting to soffice instance {self.name}")
+                time.sleep(0.25)
+        self._desktop = ctx.ServiceManager.createInstanceWithContext(
+            "com.sun.star.frame.Desktop", ctx
+        )
+
+    @property
+    def desktop(self):
+        if self._desktop is None:
+            self.connect()
+        return self._desktop
+
+    def alive(self):
+        """Check if the soffice process is still running."""
+        if self.process is not None:
+            return self.process.poll() is None
+        if self.pid is None:
+            return False
+        try:
+            os.kill(self.pid, 0)
+            return True
+        except OSError:
+            return False
+
+    def kill(self):
+        """Forcefully stop the process (used for timeouts and crash recovery)."""
+        self._desktop = None
+        if self.process is not None:
+            self.process.kill()
+            self.process.wait()
+        elif self.pid is not None:
+            try:
+                os.kill(self.pid, signal.SIGKILL)
+            except OSError:
+                pass
+
+    def stop(self):
+        """Terminate LibreOffice cleanly, killing it if it does not exit."""
+        try:
+            if self._desktop is not None:
+                self._desktop.terminate()
+        except Exception:
+            pass
+        self._desktop = None
+        if self.process is not None:
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.kill()
+
+
+def _load(desktop, path):
+    uno = _require_uno()
+    url = uno.systemPathToFileUrl(str(Path(path).resolve()))
+    doc = desktop.loadComponentFromURL(url, "_blank", 0, _props(Hidden=True))
+    if doc is None:
+        raise OfficeError(f"LibreOffice could not open {path}")
+    return doc
+
+
+def convert_job(desktop, source, dest, filter_name=None):
+    """Export `source` to `dest`; the filter defaults to PDF for the source type."""
+    uno = _require_uno()
+    source, dest = Path(source), Path(dest)
+    filter_name = filter_name or PDF_FILTERS.get(source.suffix.lower())
+    if filter_name is None:
+        raise OfficeError(f"No default export filter for {source.suffix} files")
+    doc = _load(desktop, source)
+    try:
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        url = uno.systemPathToFileUrl(str(dest.resolve()))
+        doc.storeToURL(url, _props(FilterName=filter_name))
+    finally:
+        doc.close(True)
+    return dest
+
+
+def recalc_job(desktop, path):
+    """Recalculate every formula in a spreadsheet and save it in place."""
+    doc = _load(desktop, path)
+    try:
+        doc.calculateAll()
+        doc.store()
+    finally:
+        doc.close(True)
+    return Path(path)
+
+
+def validate_job(desktop, path):
+    """Check that LibreOffice can open and export a document to HTML."""
+    path = Path(path)
+    filter_name = HTML_FILTERS.get(path.suffix.lower())
+    if filter_name is None:
+        raise OfficeError(f"Cannot validate {path.suffix} files")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        dest = Path(temp_dir) / f"{path.stem}.html"
+        try:
+            convert_job(desktop, path, dest, filter_name)
+        except Exception:
+            return False
+        return dest.exists()
+
+
+def _run_with_timeout(instance, job, args, timeout):
+    """Run job(desktop, *args) on `instance`, killing the instance on timeout."""
+    result = {}
+
+    def target():
+        try:
+            result["value"] = job(instance.desktop, *args)
+        except BaseException as e:
+            result["error"] = e
+
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    if thread.is_alive():
+        instance.kill()  # Unblocks the pending UNO call
+        thread.join(5)
+        raise OfficeError(f"Job timed out after {timeout}s on instance {instance.name}")
+    if "error" in result:
+        error = result["error"]
+        if isinstance(error, OfficeError):
+            raise error
+        raise OfficeError(f"{type(error).__name__}: {error}") from error
+    return result["value"]
+
+
+class _JobMethods(abc.ABC):
+    """convert/recalc/validate helpers shared by OfficePool and OfficeClient."""
+
+    @abc.abstractmethod
+    def run(self, job, *args, timeout=None):
+        """Run job(desktop, *args) on a LibreOffice instance and return its result."""
+
+    def convert(self, source, dest, filter_name=None, timeout=None):
+        """Convert `source` to `dest` (PDF by default). Returns the output path."""
+        return self.run(convert_job, source, dest, filter_name, timeout=timeout)
+
+    def recalc(self, path, timeout=None):
+        """Recalculate all formulas in a workbook and save it in place."""
+        return self.run(recalc_job, path, timeout=timeout)
+
+    def validate(self, path, timeout=None):
+        """Return True if LibreOffice can open and export the document."""
+        return self.run(validate_job, path, timeout=timeout)
+
+
+class OfficePool(_JobMethods):
+    """In-process pool of warm LibreOffice instances.
+
+    Jobs queue until an instance is free. An instance that crashes or times out
+    is restarted before it takes the next job.
+    """
+
+    def __init__(self, instances=2, profile_root=None, timeout=DEFAULT_TIMEOUT):
+        _require_uno()
+        self.timeout = timeout
+        self._owns_root = profile_root is None
+        self._profile_root = Path(
+            profile_root or tempfile.mkdtemp(prefix="office-pool-")
+        )
+        self._idle = queue.Queue()
+        self._executor = ThreadPoolExecutor(max_workers=instances)
+        profiles = [self._profile_root / f"profile-{i}" for i in range(instances)]
+        self._instances = [
+            OfficeInstance(_pipe_name(profile), profile) for profile in profiles
+        ]
+        try:
+            # Start all instances in parallel
+            list(self._executor.map(lambda inst: inst.start(), self._instances))
+        except Exception:
+            self.close()
+            raise
+        for instance in self._instances:
+            self._idle.put(instance)
+
+    def submit(self, job, *args, timeout=None):
+        """Queue job(desktop, *args) and return a Future for its result."""
+        return self._executor.submit(self._run, job, args, timeout or self.timeout)
+
+    def run(self, job, *args, timeout=None):
+        return self.submit(job, *args, timeout=timeout).result()
+
+    def _run(self, job, args, timeout):
+        instance = self._idle.get()
+        try:
+            return _run_with_timeout(instance, job, args, timeout)
+        finally:
+            if not instance.alive():
+                instance.kill()
+                try:
+                    instance.start()
+                except OfficeError as e:
+                    print(f"Warning: restart of {instance.name} failed: {e}", file=sys.stderr)
+            self._idle.put(instance)
+
+    def close(self):
+        """Stop all instances and remove their profiles."""
+        self._executor.shutdown(wait=True)
+        for instance in self._instances:
+            instance.stop()
+        if self._owns_root:
+            shutil.rmtree(self._profile_root, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def read_state(state_dir):
+    """Return the daemon's state (pid and instances), or raise OfficeError."""
+    try:
+        with open(Path(state_dir) / STATE_FILE, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        raise OfficeError(f"No office service running in {state_dir}")
+
+
+def _write_state(state_dir, instances):
+    state = {
+        "pid": os.getpid(),
+        "instances": [
+            {"name": inst.name, "pid": inst.pid, "profile": str(inst.profile_dir)}
+            for inst in instances
+        ],
+    }
+    tmp_path = Path(state_dir) / f"{STATE_FILE}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, Path(state_dir) / STATE_FILE)
+
+
+def serve(state_dir=DEFAULT_STATE_DIR, instances=2, poll_interval=1.0):
+    """Start `instances` LibreOffice processes and restart any that die.
+
+    Runs until SIGINT/SIGTERM. Clients find the instances through the state
+    file in `state_dir`.
+    """
+    _require_uno()
+    state_dir = Path(state_dir)
+    state_dir.mkdir(parents=True, exist_ok=True)
+    profiles = [state_dir / f"profile-{i}" for i in range(instances)]
+    pool = [OfficeInstance(_pipe_name(profile), profile) for profile in profiles]
+    with ThreadPoolExecutor(max_workers=instances) as executor:
+        list(executor.map(lambda inst: inst.start(), pool))
+    _write_state(state_dir, pool)
+    print(f"Office service running with {instances} instance(s) in {state_dir}")
+
+    stopping = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stopping.set())
+    signal.signal(signal.SIGINT, lambda *_: stopping.set())
+
+    try:
+        while not stopping.wait(poll_interval):
+            restarted = False
+            for instance in pool:
+                if not instance.alive():
+                    print(f"Restarting crashed instance {instance.name}")
+                    instance.kill()
+                    try:
+                        instance.start()
+                        restarted = True
+                    except OfficeError as e:
+                        print(f"Warning: {e}", file=sys.stderr)
+            if restarted:
+                _write_state(state_dir, pool)
+    finally:
+        for instance in pool:
+            instance.stop()
+        (state_dir / STATE_FILE).unlink(missing_ok=True)
+
+
+class OfficeClient(_JobMethods):
+    """Run jobs on the instances of a running `office_service.py serve` daemon.
+
+    Each job takes an exclusive lock on one instance; when all are busy the
+    caller waits, so many processes can share the daemon safely.
+    """
+
+    def __init__(self, state_dir=DEFAULT_STATE_DIR, timeout=DEFAULT_TIMEOUT):
+        if fcntl is None:
+            raise OfficeError("The shared office service requires fcntl (Unix)")
+        _require_uno()
+        self.state_dir = Path(state_dir)
+        self.timeout = timeout
+        self._connections = {}  # instance name -> connected OfficeInstance
+        read_state(self.state_dir)
+
+    def _acquire(self):
+        """Lock a free instance, waiting while all of them are busy."""
+        while True:
+            for entry in read_state(self.state_dir)["instances"]:
+                lock_file = open(self.state_dir / f"{entry['name']}.lock", "w")
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    lock_file.close()
+                    continue
+                return entry, lock_file
+            time.sleep(0.1)
+
+    def run(self, job, *args, timeout=None):
+        entry, lock_file = self._acquire()
+        try:
+            instance = self._connections.get(entry["name"])
+            if instance is None or instance.pid != entry["pid"]:
+                instance = OfficeInstance(entry["name"], entry["profile"], entry["pid"])
+                self._connections[entry["name"]] = instance
+            try:
+                return _run_with_timeout(instance, job, args, timeout or self.timeout)
+            except OfficeError:
+                # Reconnect next time; the daemon restarts dead instances
+                self._connections.pop(entry["name"], None)
+                raise
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+            lock_file.close()
+
+
+def shared_service():
+    """Return an OfficeClient for the daemon in $OFFICE_SERVICE_DIR, or None.
+
+    Entry points call this to opt into the shared service; None means fall back
+    to launching soffice directly.
+    """
+    state_dir = os.environ.get("OFFICE_SERVICE_DIR")
+    if not state_dir or fcntl is None or _import_uno() is None:
+        return None
+    try:
+        return OfficeClient(Path(state_dir))
+    except OfficeError:
+        return None
+
+
+if __name__ == "__main__":
+    main()
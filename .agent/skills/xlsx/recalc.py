@@ -1,21 +1,40 @@
 #!/usr/bin/env python3
 """
 Excel Formula Recalculation Script
-Recalculates all formulas in an Excel file using LibreOffice
+Recalculates all formulas in an Excel file, in pure Python (formula_engine.py)
+when every formula is supported, otherwise using LibreOffice
 """
 
+import argparse
 import json
 import sys
 import subprocess
 import os
 import platform
+import queue
+import shutil
+import tempfile
+import threading
+import xml.etree.ElementTree as ET
+import zipfile
+from array import array
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-from openpyxl import load_workbook
 
+from formula_engine import column_letter, parse_coordinate, recalculate_file
+from office_service import OfficeError, OfficePool, shared_service
 
-def setup_libreoffice_macro():
-    """Setup LibreOffice macro for recalculation if not already configured"""
-    if platform.system() == 'Darwin':
+
+def setup_libreoffice_macro(profile_dir=None):
+    """Setup LibreOffice macro for recalculation if not already configured
+    
+    Args:
+        profile_dir: Optional isolated LibreOffice user profile (UserInstallation)
+            directory; defaults to the user's normal profile
+    """
+    if profile_dir:
+        macro_dir = os.path.join(profile_dir, 'user', 'basic', 'Standard')
+    elif platform.system() == 'Darwin':
         macro_dir = os.path.expanduser('~/Library/Application Support/LibreOffice/4/user/basic/Standard')
     else:
         macro_dir = os.path.expanduser('~/.config/libreoffice/4/user/basic/Standard')
@@ -28,7 +47,7 @@ def setup_libreoffice_macro():
                 return True
     
     if not os.path.exists(macro_dir):
-        subprocess.run(['soffice', '--headless', '--terminate_after_init'], 
+        subprocess.run(['soffice', '--headless', '--terminate_after_init'] + _profile_args(profile_dir),
                       capture_output=True, timeout=10)
         os.makedirs(macro_dir, exist_ok=True)
     
@@ -50,13 +69,25 @@ def setup_libreoffice_macro():
         return False
 
 
-def recalc(filename, timeout=30):
+def _profile_args(profile_dir):
+    """soffice arguments selecting an isolated user profile, if any"""
+    if not profile_dir:
+        return []
+    return [f'-env:UserInstallation={Path(profile_dir).resolve().as_uri()}']
+
+
+def recalc(filename, timeout=30, service=None, engine=True, index_path=None):
     """
     Recalculate formulas in Excel file and report any errors
     
     Args:
         filename: Path to Excel file
         timeout: Maximum time to wait for recalculation (seconds)
+        service: Optional office_service OfficePool/OfficeClient; defaults to the
+            shared daemon from $OFFICE_SERVICE_DIR when one is running
+        engine: Try the pure-Python formula engine first, falling back to
+            LibreOffice only when it meets an unsupported formula
+        index_path: Optional path for a JSON sidecar with every error location
     
     Returns:
         dict with error locations and counts
@@ -66,11 +97,41 @@ def recalc(filename, timeout=30):
     
     abs_path = str(Path(filename).absolute())
     
-    if not setup_libreoffice_macro():
+    if engine and _recalc_with_engine(abs_path):
+        return scan_workbook(filename, index_path)
+    
+    service = service or shared_service()
+    if service is not None:
+        try:
+            service.recalc(abs_path, timeout=timeout)
+        except OfficeError as e:
+            return {'error': str(e)}
+    else:
+        error = _recalc_with_soffice(abs_path, timeout)
+        if error:
+            return error
+    
+    return scan_workbook(filename, index_path)
+
+
+def _recalc_with_engine(abs_path):
+    """Recalculate with formula_engine.py; returns False if LibreOffice is needed"""
+    try:
+        recalculate_file(abs_path)
+    except Exception:
+        # UnsupportedFormula, or anything the engine cannot read: the file is
+        # untouched, so LibreOffice gets the original workbook
+        return False
+    return True
+
+
+def _recalc_with_soffice(abs_path, timeout, profile_dir=None, macro_ready=False):
+    """Run the RecalculateAndSave macro in a one-shot soffice; returns an error dict or None"""
+    if not macro_ready and not setup_libreoffice_macro(profile_dir):
         return {'error': 'Failed to setup LibreOffice macro'}
     
     cmd = [
-        'soffice', '--headless', '--norestore',
+        'soffice', '--headless', '--norestore'] + _profile_args(profile_dir) + [
         'vnd.sun.star.script:Standard.Module1.RecalculateAndSave?language=Basic&location=application',
         abs_path
     ]
@@ -98,28 +159,237 @@ def recalc(filename, timeout=30):
         else:
             return {'error': error_msg}
     
+    return None
+
+
+EXCEL_ERRORS = ['#VALUE!', '#DIV/0!', '#REF!', '#NAME?', '#NULL!', '#NUM!', '#N/A']
+
+SPREADSHEET_NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+REL_NS = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+PKG_REL_NS = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+
+
+def iter_worksheet_parts(zf):
+    """Yield (sheet_name, part_name) for each worksheet in workbook order"""
+    with zf.open('xl/_rels/workbook.xml.rels') as f:
+        rels = {
+            rel.get('Id'): rel
+            for rel in ET.parse(f).getroot().iter(f'{PKG_REL_NS}Relationship')
+        }
+    with zf.open('xl/workbook.xml') as f:
+        sheets = list(ET.parse(f).getroot().iter(f'{SPREADSHEET_NS}sheet'))
+    
+    for sheet in sheets:
+        rel = rels.get(sheet.get(f'{REL_NS}id'))
+        if rel is None or not rel.get('Type', '').endswith('/worksheet'):
+            continue  # Chartsheets and dialog sheets have no cells
+        target = rel.get('Target')
+        part_name = target.lstrip('/') if target.startswith('/') else f'xl/{target}'
+        yield sheet.get('name'), part_name
+
+
+def iter_sheet_cells(stream):
+    """Stream (row, col, cell_type, value, has_formula) for every cell in a sheet part
+    
+    Elements are cleared as soon as they are read, so memory stays flat
+    regardless of sheet size.
+    """
+    row_idx = 0
+    col_idx = 0
+    for event, elem in ET.iterparse(stream, events=('start', 'end')):
+        tag = elem.tag
+        if event == 'start':
+            if tag == f'{SPREADSHEET_NS}row':
+                row_idx = int(elem.get('r', row_idx + 1))
+                col_idx = 0
+            continue
+        if tag == f'{SPREADSHEET_NS}c':
+            coordinate = elem.get('r')
+            if coordinate is None:
+                col_idx += 1
+            else:
+                row_idx, col_idx = parse_coordinate(coordinate)
+            v = elem.find(f'{SPREADSHEET_NS}v')
+            yield (
+                row_idx,
+                col_idx,
+                elem.get('t', 'n'),
+                v.text if v is not None else None,
+                elem.find(f'{SPREADSHEET_NS}f') is not None,
+            )
+            elem.clear()
+        elif tag == f'{SPREADSHEET_NS}row':
+            elem.clear()
+
+
+class ErrorIndex:
+    """
+    Locations of every error cell in a workbook, by sheet and error type
+    
+    Rows and columns are kept in packed arrays (4 and 2 bytes per cell) rather
+    than as coordinate strings, and are rendered on demand either as single
+    cells or compressed into rectangular ranges (A1:B20).
+    
+    Usage:
+        index = ErrorIndex.load('model.errors.json')
+        index.ranges('#REF!')          # ['Data!C2:C40', 'Summary!B7']
+        index.cells(sheet='Data')      # ['Data!C2', 'Data!C3', ...]
+    """
+    
+    def __init__(self):
+        self._cells = {}  # (sheet, error) -> (rows, cols)
+    
+    def add(self, sheet, error, row, col):
+        rows, cols = self._cells.setdefault((sheet, error), (array('I'), array('H')))
+        rows.append(row)
+        cols.append(col)
+    
+    def _select(self, error=None, sheet=None):
+        for (sheet_name, err), (rows, cols) in self._cells.items():
+            if (error is None or err == error) and (sheet is None or sheet_name == sheet):
+                yield sheet_name, err, rows, cols
+    
+    def count(self, error=None, sheet=None):
+        """Number of error cells, optionally only of one type and/or sheet"""
+        return sum(len(rows) for _, _, rows, _ in self._select(error, sheet))
+    
+    def errors(self):
+        """Error types present, in EXCEL_ERRORS order"""
+        present = {err for _, err in self._cells}
+        return [err for err in EXCEL_ERRORS if err in present] + sorted(present - set(EXCEL_ERRORS))
+    
+    def sheets(self):
+        """Sheets containing errors, in scan order"""
+        return list(dict.fromkeys(sheet for sheet, _ in self._cells))
+    
+    def cells(self, error=None, sheet=None):
+        """Every matching cell as Sheet!A1, in scan order"""
+        return [
+            f'{sheet_name}!{column_letter(col)}{row}'
+            for sheet_name, _, rows, cols in self._select(error, sheet)
+            for row, col in zip(rows, cols)
+        ]
+    
+    def ranges(self, error=None, sheet=None):
+        """Matching cells compressed into rectangular Sheet!A1:B20 ranges"""
+        return [
+            f'{sheet_name}!{area}'
+            for sheet_name, _, rows, cols in self._select(error, sheet)
+            for area in compress_cells(rows, cols)
+        ]
+    
+    def to_dict(self):
+        """{sheet: {error: [ranges]}}, the sidecar file layout"""
+        result = {}
+        for (sheet, err), (rows, cols) in self._cells.items():
+            result.setdefault(sheet, {})[err] = compress_cells(rows, cols)
+        return result
+    
+    def save(self, path, filename=None):
+        """Write the full index as a JSON sidecar file"""
+        data = {
+            'file': str(filename) if filename else None,
+            'total_errors': self.count(),
+            'sheets': self.to_dict(),
+        }
+        with open(path, 'w') as f:
+            json.dump(data, f, indent=2)
+    
+    @classmethod
+    def load(cls, path):
+        """Read a sidecar file written by save()"""
+        with open(path, 'r') as f:
+            data = json.load(f)
+        index = cls()
+        for sheet, errors in data['sheets'].items():
+            for err, areas in errors.items():
+                for area in areas:
+                    first, _, last = area.partition(':')
+                    r1, c1 = parse_coordinate(first)
+                    r2, c2 = parse_coordinate(last) if last else (r1, c1)
+                    for row in range(r1, r2 + 1):
+                        for col in range(c1, c2 + 1):
+                            index.add(sheet, err, row, col)
+        return index
+
+
+def compress_cells(rows, cols):
+    """
+    Collapse cells into rectangular A1-style ranges
+    
+    Each column's cells are first merged into vertical runs; runs covering the
+    same rows in adjacent columns are then merged into one rectangle.
+    """
+    runs = {}  # col -> [(first_row, last_row)]
+    for col, row in sorted(zip(cols, rows)):
+        col_runs = runs.setdefault(col, [])
+        if col_runs and col_runs[-1][1] >= row - 1:
+            col_runs[-1] = (col_runs[-1][0], max(col_runs[-1][1], row))
+        else:
+            col_runs.append((row, row))
+    
+    open_areas = {}  # (first_row, last_row) -> [first_col, last_col]
+    areas = []
+    for col in sorted(runs):
+        for run in runs[col]:
+            area = open_areas.get(run)
+            if area and area[1] == col - 1:
+                area[1] = col
+            else:
+                if area:
+                    areas.append((run, area))
+                open_areas[run] = [col, col]
+    areas.extend(open_areas.items())
+    
+    result = []
+    for (r1, r2), (c1, c2) in sorted(areas, key=lambda a: (a[1][0], a[0][0])):
+        first = f'{column_letter(c1)}{r1}'
+        last = f'{column_letter(c2)}{r2}'
+        result.append(first if first == last else f'{first}:{last}')
+    return result
+
+
+def index_workbook(filename):
+    """
+    Scan a workbook's cached values in a single streaming pass
+    
+    Reads each worksheet's XML straight from the zip, collecting error values
+    (cells with t="e") and counting <f> formula elements together.
+    
+    Returns:
+        (ErrorIndex, formula_count)
+    """
+    index = ErrorIndex()
+    formula_count = 0
+    known_errors = set(EXCEL_ERRORS)
+    with zipfile.ZipFile(filename) as zf:
+        for sheet_name, part_name in iter_worksheet_parts(zf):
+            with zf.open(part_name) as stream:
+                for row, col, cell_type, value, has_formula in iter_sheet_cells(stream):
+                    if has_formula:
+                        formula_count += 1
+                    if cell_type == 'e' and value in known_errors:
+                        index.add(sheet_name, value, row, col)
+    return index, formula_count
+
+
+def sidecar_path(filename):
+    """Default location of a workbook's error index: model.xlsx -> model.errors.json"""
+    return Path(filename).with_suffix('.errors.json')
+
+
+def scan_workbook(filename, index_path=None):
+    """Scan a recalculated workbook for Excel errors and count its formulas
+    
+    Args:
+        filename: Path to Excel file
+        index_path: Optional path for a JSON sidecar with the full error index
+            (see ErrorIndex); the result then includes it as 'error_index'
+    """
     # Check for Excel errors in the recalculated file - scan ALL cells
     try:
-        wb = load_workbook(filename, data_only=True)
-        
-        excel_errors = ['#VALUE!', '#DIV/0!', '#REF!', '#NAME?', '#NULL!', '#NUM!', '#N/A']
-        error_details = {err: [] for err in excel_errors}
-        total_errors = 0
-        
-        for sheet_name in wb.sheetnames:
-            ws = wb[sheet_name]
-            # Check ALL rows and columns - no limits
-            for row in ws.iter_rows():
-                for cell in row:
-                    if cell.value is not None and isinstance(cell.value, str):
-                        for err in excel_errors:
-                            if err in cell.value:
-                                location = f"{sheet_name}!{cell.coordinate}"
-                                error_details[err].append(location)
-                                total_errors += 1
-                                break
-        
-        wb.close()
+        index, formula_count = index_workbook(filename)
+        total_errors = index.count()
         
         # Build result summary
         result = {
@@ -129,48 +399,171 @@ def recalc(filename, timeout=30):
         }
         
         # Add non-empty error categories
-        for err_type, locations in error_details.items():
-            if locations:
-                result['error_summary'][err_type] = {
-                    'count': len(locations),
-                    'locations': locations[:20]  # Show up to 20 locations
-                }
-        
-        # Add formula count for context - also check ALL cells
-        wb_formulas = load_workbook(filename, data_only=False)
-        formula_count = 0
-        for sheet_name in wb_formulas.sheetnames:
-            ws = wb_formulas[sheet_name]
-            for row in ws.iter_rows():
-                for cell in row:
-                    if cell.value and isinstance(cell.value, str) and cell.value.startswith('='):
-                        formula_count += 1
-        wb_formulas.close()
+        for err_type in index.errors():
+            result['error_summary'][err_type] = {
+                'count': index.count(err_type),
+                'locations': index.cells(err_type)[:20],  # Show up to 20 locations
+                'ranges': index.ranges(err_type)  # Every location, compressed
+            }
         
+        # Add formula count for context
         result['total_formulas'] = formula_count
         
+        if index_path:
+            index.save(index_path, filename)
+            result['error_index'] = str(index_path)
+        
         return result
         
     except Exception as e:
         return {'error': str(e)}
 
 
+def recalc_many(paths, workers=4, timeout=30, write_index=False):
+    """
+    Recalculate many workbooks concurrently, yielding results as each completes
+    
+    With the LibreOffice Python-UNO bridge available, jobs run on a pool of
+    `workers` persistent LibreOffice instances (see office_service.py), or on
+    the shared daemon from $OFFICE_SERVICE_DIR. Otherwise each worker thread
+    runs one-shot soffice processes in its own profile directory, with the
+    macro installed once per profile. LibreOffice is only started once the
+    first workbook the formula engine can't handle needs it; if it can't be
+    started, those workbooks get an error result.
+    
+    Args:
+        paths: Iterable of Excel file paths
+        workers: Number of concurrent LibreOffice instances
+        timeout: Maximum time per workbook (seconds)
+        write_index: Write each workbook's full error index next to it
+            (see sidecar_path)
+    
+    Yields:
+        (path, result) tuples in completion order; result is the recalc() dict
+    """
+    paths = [str(p) for p in paths]
+    lock = threading.Lock()
+    office = {}  # service, pool, profile_root, free_profiles, error
+    
+    def start_office():
+        # LibreOffice is only started once a workbook actually needs it, so a
+        # batch the engine handles on its own runs without it. A failed start is
+        # remembered and reported for every workbook that needed it.
+        with lock:
+            if office:
+                return office
+            office.update(service=shared_service(), pool=None, profile_root=None)
+            try:
+                if office['service'] is None:
+                    try:
+                        office['service'] = office['pool'] = OfficePool(instances=workers, timeout=timeout)
+                    except OfficeError:
+                        pass
+                if office['service'] is None:
+                    # Fallback: isolated profiles so one-shot soffice runs don't collide
+                    office['profile_root'] = tempfile.mkdtemp(prefix='recalc-profiles-')
+                    office['free_profiles'] = queue.Queue()
+                    for i in range(workers):
+                        profile_dir = os.path.join(office['profile_root'], f'profile-{i}')
+                        if not setup_libreoffice_macro(profile_dir):
+                            raise RuntimeError('Failed to setup LibreOffice macro')
+                        office['free_profiles'].put(profile_dir)
+            except (OSError, RuntimeError, subprocess.SubprocessError) as e:
+                office['error'] = f'LibreOffice unavailable: {e}'
+            return office
+    
+    def run_one(path):
+        if not Path(path).exists():
+            return {'error': f'File {path} does not exist'}
+        index_path = sidecar_path(path) if write_index else None
+        if _recalc_with_engine(str(Path(path).absolute())):
+            return scan_workbook(path, index_path)
+        state = start_office()
+        if 'error' in state:
+            return {'error': state['error']}
+        if state['service'] is not None:
+            return recalc(path, timeout, state['service'], engine=False, index_path=index_path)
+        free_profiles = state['free_profiles']
+        profile_dir = free_profiles.get()
+        try:
+            error = _recalc_with_soffice(str(Path(path).absolute()), timeout, profile_dir, macro_ready=True)
+        finally:
+            free_profiles.put(profile_dir)
+        return error or scan_workbook(path, index_path)
+    
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(run_one, path): path for path in paths}
+            for future in as_completed(futures):
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = {'error': str(e)}
+                yield futures[future], result
+    finally:
+        if office.get('pool') is not None:
+            office['pool'].close()
+        if office.get('profile_root') is not None:
+            shutil.rmtree(office['profile_root'], ignore_errors=True)
+
+
+def batch_main(argv):
+    """CLI for recalc_many: prints one JSON line per workbook as it completes"""
+    parser = argparse.ArgumentParser(
+        prog='recalc.py --batch',
+        description='Recalculate many Excel files concurrently in persistent LibreOffice instances'
+    )
+    parser.add_argument('files', nargs='*', help='Excel files to recalculate')
+    parser.add_argument('--list', help='File containing one Excel path per line')
+    parser.add_argument('--workers', type=int, default=4, help='Concurrent LibreOffice instances (default: 4)')
+    parser.add_argument('--timeout', type=int, default=30, help='Seconds per workbook (default: 30)')
+    parser.add_argument('--index', action='store_true', help='Write each full error index to <file>.errors.json')
+    args = parser.parse_args(argv)
+    
+    paths = list(args.files)
+    if args.list:
+        with open(args.list, 'r') as f:
+            paths.extend(line.strip() for line in f if line.strip())
+    if not paths:
+        parser.error('no Excel files given')
+    
+    failed = 0
+    for path, result in recalc_many(paths, args.workers, args.timeout, args.index):
+        if 'error' in result:
+            failed += 1
+        print(json.dumps({'file': path, **result}), flush=True)
+    
+    sys.exit(1 if failed else 0)
+
+
 def main():
-    if len(sys.argv) < 2:
-        print("Usage: python recalc.py <excel_file> [timeout_seconds]")
-        print("\nRecalculates all formulas in an Excel file using LibreOffice")
+    if len(sys.argv) > 1 and sys.argv[1] == '--batch':
+        batch_main(sys.argv[2:])
+        return
+    
+    engine = '--office' not in sys.argv
+    write_index = '--index' in sys.argv
+    argv = [arg for arg in sys.argv if arg not in ('--office', '--index')]
+    
+    if len(argv) < 2:
+        print("Usage: python recalc.py <excel_file> [timeout_seconds] [--office] [--index]")
+        print("       python recalc.py --batch [--workers N] [--timeout T] [--list FILE] [--index] <excel_file>...")
+        print("\nRecalculates all formulas in an Excel file, in pure Python when possible")
+        print("and otherwise using LibreOffice (--office always uses LibreOffice)")
         print("\nReturns JSON with error details:")
         print("  - status: 'success' or 'errors_found'")
         print("  - total_errors: Total number of Excel errors found")
         print("  - total_formulas: Number of formulas in the file")
         print("  - error_summary: Breakdown by error type with locations")
         print("    - #VALUE!, #DIV/0!, #REF!, #NAME?, #NULL!, #NUM!, #N/A")
+        print("\n--index also writes every error location to <file>.errors.json")
         sys.exit(1)
     
-    filename = sys.argv[1]
-    timeout = int(sys.argv[2]) if len(sys.argv) > 2 else 30
+    filename = argv[1]
+    timeout = int(argv[2]) if len(argv) > 2 else 30
     
-    result = recalc(filename, timeout)
+    index_path = sidecar_path(filename) if write_index else None
+    result = recalc(filename, timeout, engine=engine, index_path=index_path)
     print(json.dumps(result, indent=2))
 
 